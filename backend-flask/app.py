@@ -1,47 +1,292 @@
-from flask import Flask, jsonify
-from models.impact import NEO
-from models.deflection import estimate_deflection
-from models.tsunami import is_water_at_location, estimate_tsunami_from_impact
-from flask import request
+from flask import Blueprint, Flask, Response, jsonify
+from models.impact import merge_neos, split_date_range
+from models.neo_index import RANGE_FILTERS, SORT_KEYS
+from models.deflection import (
+    required_delta_v_to_shift,
+    estimate_deflection,
+    estimate_deflection_batch,
+    deflection_parameter_grid,
+    iter_deflection_grid,
+    DEFLECTION_BATCH_PARAMS,
+)
+from models.tsunami import (
+    is_water_at_location,
+    estimate_tsunami_from_impact,
+    estimate_tsunami_array,
+    get_bathymetry_raster,
+    memo_stats as tsunami_memo_stats,
+)
+from models.propagation import tsunami_field
+from models.montecarlo import run_monte_carlo, diameter_from_neo
+from models.campaign import optimize_campaign
+from models.orbit import (
+    UNIX_EPOCH_JD,
+    bplane_shift,
+    deflection_sensitivity,
+    elements_from_neows,
+    encounter_states,
+    unit_direction,
+)
+from models.geocache import get_water_cache
+from models import effects, metrics, outbound, providers
+from models.providers import feed_refresher, neo_model
+from models.streaming import (
+    NDJSON_MIMETYPE,
+    gzip_chunks,
+    ndjson_chunks,
+    ndjson_column_chunks,
+    wants_gzip,
+    wants_ndjson,
+)
+from flask import g, request
 from dotenv import load_dotenv
 from flask_cors import CORS
+import base64
+import gzip
+import json
 import os
+import time
+
+import numpy as np
+import requests
 
 # Load environment variables from .env file in the parent directory
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
 if os.path.exists(dotenv_path):
     load_dotenv(dotenv_path=dotenv_path)
 
-app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "http://localhost:3000"}}, supports_credentials=True)
-neo_model = NEO()
+# Routes live on a blueprint; create_app() builds the Flask app around it. Besides reading .env,
+# importing this module has no side effects: the NEO client, feed refresher and datasets are created on first use
+# (models/providers.py), and the module attribute `app` is built on first access.
+api = Blueprint('api', __name__)
+
+
+def create_app(start_background=None):
+    """Build the Flask app.
+
+    start_background starts this process's background threads (the feed refresher); it defaults to
+    FEED_REFRESH_ENABLED, which is off unless set (the serving entry points turn it on). A
+    preforking server passes False and starts them in each worker after the fork instead (see
+    gunicorn.conf.py).
+    """
+    app = Flask(__name__)
+    CORS(app, resources={r"/*": {"origins": "http://localhost:3000"}}, supports_credentials=True)
+    app.register_blueprint(api)
+    if start_background is None:
+        start_background = providers.background_enabled()
+    if start_background:
+        feed_refresher().start()
+    return app
+
+
+_app = None
 
-@app.after_request
+
+def __getattr__(name):
+    # `from app import app` (asgi.py, the benchmarks, flask run) builds the default app once
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@api.after_app_request
 def add_cors_headers(response):
     response.headers.add("Access-Control-Allow-Origin", "http://localhost:3000")
     response.headers.add("Access-Control-Allow-Headers", "Content-Type,Authorization")
     response.headers.add("Access-Control-Allow-Methods", "GET,POST,OPTIONS")
     response.headers.add("Access-Control-Allow-Credentials", "true")
+    response.headers.add("Access-Control-Expose-Headers",
+                         "X-Total-Count,X-Grid-Axes,X-Grid-Shape,X-Snapshot-Age,Server-Timing")
+    return response
+
+@api.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if metrics.wants_server_timing(request.args, request.headers.get('X-Server-Timing')):
+        g.server_timing_token = metrics.start_collecting()
+
+@api.after_app_request
+def record_request_timing(response):
+    # Streaming responses are timed until the generator is handed to the server, not to the last byte
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.observe_request(rule, request.method, response.status_code, elapsed)
+    token = g.pop('server_timing_token', None)
+    if token is not None:
+        response.headers['Server-Timing'] = metrics.server_timing_header(metrics.stop_collecting(token), elapsed)
+        response.headers['Timing-Allow-Origin'] = 'http://localhost:3000'
     return response
 
-@app.route('/')
+@api.teardown_app_request
+def stop_request_timer(exc=None):
+    token = g.pop('server_timing_token', None)
+    if token is not None:
+        metrics.stop_collecting(token)
+
+@api.route('/')
 def index():
     """A simple index route to show the service is running."""
     return jsonify({"message": "Welcome to the NASA NEO API proxy! Try the /neo endpoint."})
 
-@app.route('/neo')
+@api.route('/neo')
 def get_neo_data():
     """
     Fetches Near Earth Object data from NASA's API.
+
+    Optional query parameters start_date and end_date (YYYY-MM-DD) select the window; ranges
+    longer than 7 days are fetched concurrently in feed-sized chunks.
+
+    Any of the index parameters below switches the response to a filtered, sorted page answered
+    from the precomputed NEOIndex: {"total", "offset", "limit", "items"}, where each item carries
+    a "derived" block (energy_megatons, launches_required, estimated_cost_usd, ...).
+    - range filters: min_/max_diameter_m, min_/max_velocity_kps, min_/max_miss_distance_km,
+      min_/max_magnitude, min_/max_energy_megatons, approach_from, approach_to
+    - sort (energy, miss_distance, diameter, velocity, magnitude, date, launches, cost), order (asc/desc)
+    - limit (default 50, max 1000), offset
+
+    With "Accept: application/x-ndjson" or format=ndjson the records (or index page items) are
+    streamed one JSON object per line as feed windows complete, gzip-compressed when the client
+    accepts it. Index pages report the match count in the X-Total-Count header.
+
+    The default window (and the next day's) is kept in memory by the background feed refresher;
+    responses served from it carry X-Snapshot-Age, the snapshot's age in seconds.
     """
-    neos = neo_model.get_neos()
+    args = request.args
+    try:
+        streaming = wants_ndjson(request.headers.get('Accept'), args)
+        snapshot = feed_refresher().get(args.get('start_date'), args.get('end_date'))
+        headers = snapshot_headers(snapshot)
+        if wants_neo_index(args):
+            if snapshot:
+                index = snapshot.index
+            else:
+                index = neo_model().get_index(args.get('start_date'), args.get('end_date'))
+            if index is None:
+                return jsonify({"error": "Failed to retrieve data from NASA API."}), 500
+            page = query_neo_index(index, args)
+            if streaming:
+                return ndjson_response(ndjson_chunks(page['items']),
+                                       headers={**headers, 'X-Total-Count': str(page['total'])})
+            return jsonify(page), 200, headers
+        if streaming:
+            if snapshot:
+                return ndjson_response(ndjson_chunks(snapshot.neos), headers=headers)
+            start_date, end_date = neo_model().resolve_range(args.get('start_date'), args.get('end_date'))
+            split_date_range(start_date, end_date)
+            return ndjson_response(ndjson_chunks(neo_model().iter_neos(start_date, end_date)))
+        if snapshot:
+            return Response(snapshot.body, mimetype='application/json', headers=headers)
+        neos = neo_model().get_neos(args.get('start_date'), args.get('end_date'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     if neos is not None:
         return jsonify(neos)
     else:
         return jsonify({"error": "Failed to retrieve data from NASA API."}), 500
 
 
-@app.route('/deflect', methods=['POST'])
+def snapshot_headers(snapshot):
+    """X-Snapshot-Age (whole seconds) when a response is served from a feed refresher snapshot."""
+    return {'X-Snapshot-Age': f'{snapshot.age_s:.0f}'} if snapshot else {}
+
+
+def ndjson_response(chunks, headers=None):
+    """Stream NDJSON byte chunks (see models/streaming.py), gzipped if the client accepts it."""
+    headers = dict(headers or {})
+    if wants_gzip(request.headers.get('Accept-Encoding'), request.args):
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    headers['Vary'] = 'Accept, Accept-Encoding'
+    headers['Cache-Control'] = 'no-cache'
+    return Response(chunks, mimetype=NDJSON_MIMETYPE, headers=headers)
+
+
+NEO_INDEX_PARAMS = set(RANGE_FILTERS) | {'approach_from', 'approach_to', 'sort', 'order', 'limit', 'offset'}
+
+
+def wants_neo_index(args):
+    """True when /neo should answer from the NEOIndex. Raises ValueError for an unknown sort key."""
+    if not NEO_INDEX_PARAMS & set(args):
+        return False
+    if args.get('sort') and args['sort'] not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key: {args['sort']}")
+    return True
+
+
+def query_neo_index(index, args):
+    return index.query(
+        sort=args.get('sort'),
+        order=args.get('order'),
+        limit=args.get('limit', 50),
+        offset=args.get('offset', 0),
+        approach_from=args.get('approach_from'),
+        approach_to=args.get('approach_to'),
+        **{name: args.get(name) for name in RANGE_FILTERS},
+    )
+
+
+@api.route('/neo/stream')
+def stream_neo_data():
+    """Same as /neo, but streamed as server-sent events.
+
+    Emits one "progress" event per completed 7-day chunk ({"done", "total", "start_date",
+    "end_date"}), then a single "result" event with the merged list, or an "error" event.
+    """
+    try:
+        start_date, end_date = neo_model().resolve_range(request.args.get('start_date'), request.args.get('end_date'))
+        split_date_range(start_date, end_date)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def event(name, payload):
+        return f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+
+    def generate():
+        chunks = {}
+        try:
+            for chunk_start, chunk_end, neos, total in neo_model().iter_neo_chunks(start_date, end_date):
+                chunks[chunk_start] = neos
+                yield event('progress', {
+                    'done': len(chunks),
+                    'total': total,
+                    'start_date': chunk_start,
+                    'end_date': chunk_end,
+                })
+        except Exception as e:
+            yield event('error', {'error': f"Failed to retrieve data from NASA API: {e}"})
+            return
+        yield event('result', merge_neos(chunks[k] for k in sorted(chunks)))
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+@api.route('/neo/snapshot', methods=['GET', 'POST'])
+def neo_snapshot_route():
+    """Feed refresher status: windows held in memory with their record counts and ages.
+
+    POST refreshes the snapshots now (502 if the feed cannot be fetched).
+    """
+    if request.method == 'POST':
+        try:
+            feed_refresher().refresh()
+        except Exception as e:
+            return jsonify({"error": f"Failed to refresh NEO feed: {e}"}), 502
+    return jsonify(feed_refresher().status())
+
+
+@api.route('/neo/cache')
+def get_neo_cache_stats():
+    """Report hit/miss counters for the NeoWs feed cache."""
+    return jsonify(neo_model().cache_stats())
+
+
+@api.route('/deflect', methods=['POST'])
 def deflect():
     """Estimate the required kinetic impactor parameters and cost to deflect an asteroid.
 
@@ -80,23 +325,301 @@ def deflect():
         return jsonify({"error": str(e)}), 400
 
 
-@app.route('/deflect_orbit', methods=['POST'])
+# Defaults for /deflect/batch match the scalar /deflect endpoint
+DEFLECT_BATCH_DEFAULTS = {
+    'diameter_m': 0.0,
+    'relative_velocity_m_s': 0.0,
+    'lead_time_days': 1.0,
+    'distance_shift_m': 6400000.0,
+    'density_kg_m3': 2700.0,
+    'impactor_velocity_m_s': 10000.0,
+    'beta': 1.0,
+    'cost_per_launch_usd': 50_000_000.0,
+    'payload_per_launch_kg': 22800.0,
+}
+# Inputs where a non-positive value makes launches and cost infinite (the scalar /deflect raises)
+DEFLECT_BATCH_POSITIVE = ('impactor_velocity_m_s', 'beta', 'payload_per_launch_kg')
+# Combinations per non-streamed /deflect/batch request; NDJSON streams are evaluated in slices
+DEFLECT_BATCH_MAX = 1_000_000
+
+
+def _json_column(values):
+    """Flatten a result array to a list for JSON, with null for non-finite values."""
+    values = np.asarray(values).ravel()
+    if np.isfinite(values).all():
+        return values.tolist()
+    return [v if np.isfinite(v) else None for v in values.tolist()]
+
+
+@api.route('/deflect/batch', methods=['POST'])
+def deflect_batch():
+    """Vectorized /deflect over many parameter combinations in one request.
+
+    Expected JSON body (use either "columns" or "grid"):
+    {
+      "columns": {"diameter_m": [...], "lead_time_days": [...], ...},  # equal-length arrays
+      "grid": {"diameter_m": [...], "beta": [...], ...},               # Cartesian product of axes
+      "beta": float, ...                                               # optional scalar defaults
+    }
+
+    Returns columnar results: {"count": n, "results": {"launches_required": [...], ...}}. For
+    grid requests "axes" and "shape" describe the row-major (C order) layout of the results, which
+    are capped at DEFLECT_BATCH_MAX combinations; non-finite results (overflow) are null.
+    impactor_velocity_m_s, beta and payload_per_launch_kg must be positive.
+
+    With "Accept: application/x-ndjson" or ?format=ndjson the results are instead streamed as one
+    row per line ({"index", <varying inputs>, <results>}), evaluated in slices so large sweeps run
+    in constant memory. X-Total-Count (and X-Grid-Axes / X-Grid-Shape for grids) describe the rows.
+    """
+    data = request.get_json() or {}
+    try:
+        columns = data.get('columns')
+        grid = data.get('grid')
+        if columns and grid:
+            raise ValueError("Provide either 'columns' or 'grid', not both")
+        varying = columns or grid or {}
+        scalars = {k: v for k, v in data.items() if k not in ('columns', 'grid')}
+
+        unknown = (set(varying) | set(scalars)) - set(DEFLECTION_BATCH_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+
+        params = {k: float(scalars.get(k, DEFLECT_BATCH_DEFAULTS[k])) for k in DEFLECTION_BATCH_PARAMS}
+        for name in DEFLECT_BATCH_POSITIVE:
+            if np.any(np.asarray(varying.get(name, params[name]), dtype=np.float64) <= 0):
+                raise ValueError(f"'{name}' must be positive")
+        if wants_ndjson(request.headers.get('Accept'), request.args):
+            return _stream_deflect_batch(params, columns, grid)
+        if grid:
+            count = int(np.prod([np.size(v) for v in grid.values()]))
+        else:
+            count = max((np.size(v) for v in varying.values()), default=1)
+        if count > DEFLECT_BATCH_MAX:
+            raise ValueError(f"At most {DEFLECT_BATCH_MAX} combinations per request; "
+                             "use Accept: application/x-ndjson to stream larger sweeps")
+
+        response = {}
+        if grid:
+            expanded, shape = deflection_parameter_grid(**grid)
+            params.update(expanded)
+            response['axes'] = list(grid)
+            response['shape'] = list(shape)
+        else:
+            params.update(varying)
+
+        results = estimate_deflection_batch(**params)
+        response['count'] = int(results['launches_required'].size)
+        response['results'] = {k: _json_column(v) for k, v in results.items()}
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@api.route('/deflect/optimize', methods=['POST'])
+def deflect_optimize():
+    """Pareto-optimal multi-impactor campaigns: cost vs launches vs achieved miss distance.
+
+    Expected JSON body:
+    {
+      "diameter_m": float,                 # required
+      "warning_time_days": float,          # required, days until the predicted impact
+      "density_kg_m3": float, "beta": float, "distance_shift_m": float, "cruise_days": float,
+      "vehicles": ["falcon_9", ...] or {"name": {"payload_kg", "cost_per_launch_usd", "ready_days"}},  # max 32
+      "max_launches": int,                 # default 50, max 200
+      "launch_days": [...] or {"start", "stop", "num"},
+      "impactor_velocity_m_s": [...] or {"start", "stop", "num"}
+    }
+    Returns {"pareto_front": [...], "cheapest_deflection", "candidates_evaluated", ...}; each campaign
+    gives vehicle, launches, launch_day, impactor_velocity_m_s, lead_time_days, miss_distance_m,
+    estimated_cost_usd and whether it reaches distance_shift_m ("deflects"). Large searches run on
+    the server's shared process pool (PROCESS_POOL_WORKERS); a "workers" field is ignored.
+    """
+    data = request.get_json() or {}
+    try:
+        if 'diameter_m' not in data or 'warning_time_days' not in data:
+            raise ValueError("Missing required parameters: diameter_m, warning_time_days")
+        optional = ('density_kg_m3', 'beta', 'distance_shift_m', 'cruise_days', 'vehicles', 'max_launches',
+                    'launch_days', 'impactor_velocity_m_s', 'workers')
+        unknown = set(data) - set(optional) - {'diameter_m', 'warning_time_days'}
+        if unknown:
+            raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+        kwargs = {k: data[k] for k in optional if k != 'workers' and data.get(k) is not None}
+        result = optimize_campaign(float(data['diameter_m']), float(data['warning_time_days']),
+                                   pool=providers.process_pool(), **kwargs)
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+DEFLECT_STREAM_CHUNK = 8192
+
+
+def _stream_deflect_batch(params, columns, grid):
+    if grid:
+        slices = iter_deflection_grid(grid, chunk_size=DEFLECT_STREAM_CHUNK)
+        shape = [len(np.atleast_1d(grid[name])) for name in grid]
+        total = int(np.prod(shape))
+        headers = {'X-Grid-Axes': ','.join(grid), 'X-Grid-Shape': ','.join(map(str, shape))}
+    else:
+        arrays = {k: np.asarray(v, dtype=np.float64) for k, v in (columns or {}).items()}
+        shape = np.broadcast_shapes(*(a.shape for a in arrays.values())) if arrays else ()
+        if len(shape) > 1:
+            raise ValueError("columns must be one-dimensional")
+        total = int(shape[0]) if shape else 1
+        arrays = {k: np.broadcast_to(a, (total,)) for k, a in arrays.items()}
+        slices = ((start, {k: a[start:start + DEFLECT_STREAM_CHUNK] for k, a in arrays.items()})
+                  for start in range(0, total, DEFLECT_STREAM_CHUNK))
+        headers = {}
+    headers['X-Total-Count'] = str(total)
+
+    def evaluated():
+        for start, varying in slices:
+            results = estimate_deflection_batch(**{**params, **varying})
+            n = len(next(iter(varying.values()))) if varying else 1
+            yield start, {**varying, **{k: np.broadcast_to(v, (n,)) for k, v in results.items()}}
+
+    return ndjson_response(ndjson_column_chunks(evaluated()), headers=headers)
+
+
+def _next_earth_approach_jd(close_approach_data, now_ms):
+    """Julian date of the next Earth close approach (or the latest past one) from NeoWs data."""
+    epochs = [float(c['epoch_date_close_approach']) for c in close_approach_data
+              if c.get('orbiting_body', 'Earth') == 'Earth' and c.get('epoch_date_close_approach') is not None]
+    if not epochs:
+        return None
+    upcoming = [e for e in epochs if e >= now_ms]
+    epoch_ms = min(upcoming) if upcoming else max(epochs)
+    return epoch_ms / 86400000.0 + UNIX_EPOCH_JD
+
+
+@api.route('/deflect_orbit', methods=['POST'])
 def deflect_orbit():
-    """Placeholder for orbit-propagation based deflection estimation.
+    """Orbit-propagation based deflection estimate (two-body, b-plane miss distance shift).
 
-    Returns 501 Not Implemented. Future implementation notes:
-    - Accept orbital elements or NEO id and propagation epoch
-    - Use a library such as poliastro or SPICE to propagate orbital states
-    - Compute required delta-v vector and mission delta-v for intercept
-    - Return detailed mission mass and cost estimates
+    Expected JSON body:
+    {
+      "neo_id": str,                     # NeoWs id, or
+      "elements": {...} | [{...}, ...],  # a_au, e, i_deg, raan_deg, argp_deg, M_deg, epoch_jd
+      "encounter_jd": float,             # optional; default next Earth approach (neo_id) or epoch
+      "lead_time_days": float,           # optional, default 3650
+      "delta_v_m_s": float | [float],    # optional candidate kicks, default [0.001, 0.01, 0.1]
+      "direction": [t, n, w],            # optional kick direction in the local frame, default along-track
+      "distance_shift_m": float,         # optional target miss shift, default 6.4e6
+      "diameter_m": float, ...           # optional; with it, /deflect-style mission estimates are added
+    }
+
+    Returns per element set: miss_shift_m and timing_shift_s for every candidate, the
+    sensitivity (m of miss per m/s), and the delta-v required for distance_shift_m next to the
+    linear distance / lead_time approximation. Values that are not finite (e.g. the required
+    delta-v when a direction does not move the miss distance) are null. direction must be three
+    finite numbers, not all zero, and encounters slower than MIN_ENCOUNTER_SPEED_M_S relative
+    to Earth are rejected.
     """
-    return jsonify({
-        "error": "High-fidelity orbit propagation not implemented yet. This endpoint is a stub.",
-        "notes": "To implement: add orbital propagator (poliastro/orekit), accept orbital elements, compute delta-v and impact point shift."
-    }), 501
+    data = request.get_json() or {}
+    try:
+        encounter_jd = data.get('encounter_jd')
+        if data.get('neo_id') is not None:
+            neo_id = str(data['neo_id'])
+            if not neo_id.isdigit():
+                raise ValueError("neo_id must be numeric")
+            try:
+                details = neo_model().get_neo_details(neo_id)
+            except (requests.exceptions.RequestException, outbound.OutboundError) as e:
+                return jsonify({"error": f"Failed to retrieve NEO {neo_id} from NASA API: {e}"}), 502
+            if not details.get('orbital_data'):
+                raise ValueError(f"No orbital data for NEO {neo_id}")
+            elements = [elements_from_neows(details['orbital_data'])]
+            if encounter_jd is None:
+                encounter_jd = _next_earth_approach_jd(details['close_approach_data'], time.time() * 1000.0)
+        elif data.get('elements'):
+            elements = data['elements'] if isinstance(data['elements'], list) else [data['elements']]
+        else:
+            raise ValueError("Provide neo_id or elements")
+        if len(elements) > 1000:
+            raise ValueError("At most 1000 element sets per request")
+
+        lead_days = float(data.get('lead_time_days', 3650))
+        if not np.isfinite(lead_days):
+            raise ValueError("lead_time_days must be finite")
+        lead_s = max(lead_days * 24 * 3600.0, 1.0)
+        dv_candidates = np.atleast_1d(np.asarray(data.get('delta_v_m_s', [0.001, 0.01, 0.1]), dtype=float))
+        direction = unit_direction(data.get('direction', [1.0, 0.0, 0.0]))
+        distance_shift_m = float(data.get('distance_shift_m', 6400000))
+
+        r_enc, v_enc = encounter_states(elements, None if encounter_jd is None else float(encounter_jd))
+        shift = bplane_shift(r_enc, v_enc, lead_s, dv_candidates, direction)
+        sensitivity = deflection_sensitivity(r_enc, v_enc, lead_s, direction)
+        with np.errstate(divide='ignore'):
+            required_dv = np.where(sensitivity > 0, distance_shift_m / sensitivity, np.inf)
+
+        result = {
+            'count': len(elements),
+            'encounter_jd': encounter_jd,
+            'lead_time_days': lead_days,
+            'delta_v_m_s': dv_candidates.tolist(),
+            'miss_shift_m': [_json_column(row) for row in shift['miss_shift_m']],
+            'timing_shift_s': [_json_column(row) for row in shift['timing_shift_s']],
+            'sensitivity_m_per_m_s': _json_column(sensitivity),
+            'required_delta_v_m_s': _json_column(required_dv),
+            'linear_required_delta_v_m_s': required_delta_v_to_shift(distance_shift_m, lead_s),
+        }
+
+        if data.get('diameter_m') is not None:
+            mission = estimate_deflection_batch(
+                diameter_m=float(data['diameter_m']),
+                relative_velocity_m_s=float(data.get('relative_velocity_m_s', 0)),
+                lead_time_days=lead_days,
+                density_kg_m3=float(data.get('density_kg_m3', 2700)),
+                impactor_velocity_m_s=float(data.get('impactor_velocity_m_s', 10000)),
+                beta=float(data.get('beta', 1.0)),
+                cost_per_launch_usd=float(data.get('cost_per_launch_usd', 50_000_000)),
+                payload_per_launch_kg=float(data.get('payload_per_launch_kg', 22800)),
+                required_delta_v_m_s=required_dv,
+            )
+            result['mission'] = {k: _json_column(v) for k, v in mission.items()}
+
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
 
-@app.route('/tsunami', methods=['POST'])
+@api.route('/montecarlo', methods=['POST'])
+def montecarlo():
+    """Monte Carlo uncertainty estimate for deflection launches/cost and tsunami shore wave height.
+
+    Expected JSON body (all optional):
+    {
+      "n_samples": int,                 # default 100000, max 5000000
+      "seed": int,                      # default 0; same seed -> same result
+      "estimated_diameter_km": {...},   # NeoWs block; samples diameter uniformly between min/max
+      "params": {                       # number or distribution per input, e.g.
+        "density_kg_m3": {"dist": "uniform", "low": 1500, "high": 3500},
+        "beta": {"dist": "lognormal", "median": 2, "sigma": 0.35},
+        "lead_time_days": 3650, ...
+      }
+    }
+    Returns percentiles and histograms for launches_required, estimated_cost_usd,
+    shore_wave_height_m and energy_megatons, plus damage level probabilities. Large runs are
+    evaluated on the server's shared process pool (PROCESS_POOL_WORKERS); a "workers" field in
+    the request is ignored.
+    """
+    data = request.get_json() or {}
+    try:
+        params = dict(data.get('params') or {})
+        if data.get('estimated_diameter_km'):
+            params['diameter_m'] = diameter_from_neo(data['estimated_diameter_km'])
+        result = run_monte_carlo(
+            n_samples=int(data.get('n_samples', 100_000)),
+            seed=int(data.get('seed', 0)),
+            params=params,
+            pool=providers.process_pool(),
+        )
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@api.route('/tsunami', methods=['POST'])
 def tsunami():
     """Estimate whether an impact at lat/lon would produce a tsunami.
 
@@ -105,16 +628,23 @@ def tsunami():
     """
     data = request.get_json() or {}
     try:
-        lat = float(data.get('lat'))
-        lon = float(data.get('lon'))
-        energy_megatons = float(data.get('energy_megatons', 0.0))
+        lat, lon, energy_megatons = parse_tsunami_request(data)
     except Exception as e:
         return jsonify({"error": "Invalid input: must provide lat, lon, energy_megatons"}), 400
 
     # Use env key if available
     google_key = os.getenv('GOOGLE_ELEVATION_API_KEY')
     is_water, elevation = is_water_at_location(lat, lon, api_key=google_key)
+    return jsonify(tsunami_result(lat, lon, energy_megatons, is_water, elevation))
+
 
+def parse_tsunami_request(data):
+    """(lat, lon, energy_megatons) from a /tsunami JSON body; raises on missing or invalid values."""
+    return float(data.get('lat')), float(data.get('lon')), float(data.get('energy_megatons', 0.0))
+
+
+def tsunami_result(lat, lon, energy_megatons, is_water, elevation):
+    """Build the /tsunami response body from a water/land classification."""
     result = {
         'lat': lat,
         'lon': lon,
@@ -134,8 +664,295 @@ def tsunami():
         result['tsunami'] = None
         result['note'] = 'Water/land unknown (no elevation data available)'
 
-    return jsonify(result)
+    return result
+
+
+# Inputs of /tsunami/batch and their defaults (as in estimate_tsunami_from_impact)
+TSUNAMI_BATCH_DEFAULTS = {'energy_megatons': None, 'water_depth_m': None, 'coupling_efficiency': 0.05}
+TSUNAMI_BATCH_MAX = 4_000_000
+
+
+@api.route('/tsunami/batch', methods=['POST'])
+def tsunami_batch():
+    """Vectorized tsunami estimate (estimate_tsunami_from_impact) for many energy/depth combinations.
+
+    Expected JSON body (use either "columns" or "grid"):
+    {
+      "columns": {"energy_megatons": [...], "water_depth_m": [...]},   # equal-length arrays
+      "grid": {"energy_megatons": [...], "water_depth_m": [...]},      # Cartesian product of axes
+      "coupling_efficiency": float, ...                                # optional scalar inputs
+    }
+
+    Returns columnar results: {"count": n, "results": {"shore_wave_height_m": [...], "damage_level": [...],
+    ...}}. For grid requests "axes" and "shape" describe the row-major (C order) layout; the grid is
+    evaluated by broadcasting the axes, so it costs one power evaluation per axis value, not per cell.
+    """
+    data = request.get_json() or {}
+    try:
+        columns = data.get('columns')
+        grid = data.get('grid')
+        if columns and grid:
+            raise ValueError("Provide either 'columns' or 'grid', not both")
+        varying = columns or grid or {}
+        scalars = {k: v for k, v in data.items() if k not in ('columns', 'grid')}
+
+        unknown = (set(varying) | set(scalars)) - set(TSUNAMI_BATCH_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+
+        params = {}
+        for name, default in TSUNAMI_BATCH_DEFAULTS.items():
+            if name in varying:
+                params[name] = np.asarray(varying[name], dtype=float)
+            elif scalars.get(name, default) is None:
+                raise ValueError(f"Missing '{name}'")
+            else:
+                params[name] = float(scalars.get(name, default))
+        for name, values in params.items():
+            if np.any(values < 0):
+                raise ValueError(f"'{name}' must be non-negative")
+
+        response = {}
+        if grid:
+            # one open axis per grid parameter, broadcast together by the kernel
+            axes = list(grid)
+            shape = tuple(params[name].size for name in axes)
+            for k, name in enumerate(axes):
+                params[name] = params[name].reshape([-1 if j == k else 1 for j in range(len(axes))])
+            response['axes'] = axes
+            response['shape'] = list(shape)
+        else:
+            shape = np.broadcast_shapes(*(np.shape(v) for v in params.values()))
+        if int(np.prod(shape)) > TSUNAMI_BATCH_MAX:
+            raise ValueError(f"At most {TSUNAMI_BATCH_MAX} combinations per request")
+
+        results = estimate_tsunami_array(**params)
+        results = {k: np.broadcast_to(v, shape) for k, v in results.items()}
+        response['count'] = int(np.prod(shape))
+        response['results'] = {k: v.ravel().tolist() for k, v in results.items()}
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+
+# Grid size limits for /tsunami/field (the 'swe' solver is O(cells * steps) and also stops at
+# models.propagation.SWE_MAX_STEPS)
+FIELD_MAX_SIDE = {'ray': 2000, 'swe': 500}
+FIELD_MAX_HALF_WIDTH_KM = 5000.0
+
+
+@api.route('/tsunami/field', methods=['POST'])
+def tsunami_field_route():
+    """Propagate a tsunami over the regional bathymetry grid around an impact point.
+
+    Expected JSON body:
+    {
+      "lat": float, "lon": float, "energy_megatons": float,
+      "half_width_km": float,       # optional, default 500, at most FIELD_MAX_HALF_WIDTH_KM
+      "rows": int, "cols": int,     # optional, default 200 x 200
+      "method": "ray" | "swe",      # optional, default "ray"
+      "depth_m": float,             # optional, ocean depth where no bathymetry raster is available
+      "encoding": "base64" | "list" # optional, default "base64"
+    }
+
+    Returns grid bounds and shape plus 'arrival_time_s' and 'max_amplitude_m' rasters (row 0 =
+    south, NaN on land/unreached cells). With base64 encoding each raster is little-endian
+    float32 bytes; with list encoding it is nested lists with null for NaN.
+    """
+    data = request.get_json() or {}
+    try:
+        lat = float(data.get('lat'))
+        lon = float(data.get('lon'))
+        energy_megatons = float(data.get('energy_megatons', 0.0))
+        half_width_km = float(data.get('half_width_km', 500.0))
+        rows = int(data.get('rows', 200))
+        cols = int(data.get('cols', 200))
+        method = data.get('method', 'ray')
+        depth_m = float(data.get('depth_m', 4000.0))
+        encoding = data.get('encoding', 'base64')
+    except Exception:
+        return jsonify({"error": "Invalid input: must provide lat, lon, energy_megatons"}), 400
+
+    if method not in FIELD_MAX_SIDE or encoding not in ('base64', 'list'):
+        return jsonify({"error": "method must be 'ray' or 'swe'; encoding must be 'base64' or 'list'"}), 400
+    if max(rows, cols) > FIELD_MAX_SIDE[method]:
+        return jsonify({"error": f"Grid too large for method '{method}' (max {FIELD_MAX_SIDE[method]} per side)"}), 400
+    if not 0 < half_width_km <= FIELD_MAX_HALF_WIDTH_KM:
+        return jsonify({"error": f"half_width_km must be in (0, {FIELD_MAX_HALF_WIDTH_KM:g}]"}), 400
+
+    try:
+        field = tsunami_field(lat, lon, energy_megatons, half_width_km=half_width_km, rows=rows, cols=cols,
+                              raster=get_bathymetry_raster(), depth_m=depth_m, method=method)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    for key in ('arrival_time_s', 'max_amplitude_m'):
+        values = field[key].astype('<f4')
+        if encoding == 'base64':
+            field[key] = base64.b64encode(values.tobytes()).decode('ascii')
+        else:
+            field[key] = [[None if v != v else v for v in row] for row in values.tolist()]
+    field['encoding'] = 'base64-float32-le' if encoding == 'base64' else 'list'
+    return jsonify(field)
+
+
+IMPACT_SCENARIO_PARAMS = ('velocity_m_s', 'diameter_m', 'density_kg_m3', 'target_density_kg_m3', 'angle_deg')
+IMPACT_FIELD_MAX_SIDE = 2048
+
+
+def parse_impact_scenario(data):
+    """effects.scenario() from request args or a JSON body (lat, lon, energy_megatons + optional impactor)."""
+    for name in ('lat', 'lon', 'energy_megatons'):
+        if data.get(name) in (None, ''):
+            raise ValueError("Invalid input: must provide lat, lon, energy_megatons")
+    optional = {k: float(data[k]) for k in IMPACT_SCENARIO_PARAMS if data.get(k) not in (None, '')}
+    return effects.scenario(float(data['energy_megatons']), float(data['lat']), float(data['lon']), **optional)
+
+
+@api.route('/impact/field', methods=['POST'])
+def impact_field():
+    """Impact effect rasters (overpressure, thermal fluence, crater/ejecta) over a bounding box.
+
+    Expected JSON body:
+    {
+      "lat": float, "lon": float, "energy_megatons": float,
+      "velocity_m_s", "diameter_m", "density_kg_m3", "target_density_kg_m3", "angle_deg": optional,
+      "layers": ["overpressure", "thermal", "crater"],      # optional, default all
+      "bounds": {"lat_min", "lat_max", "lon_min", "lon_max"}, # optional, default fits the effects
+      "zoom": int,                   # optional, Web Mercator zoom level setting the resolution,
+      "rows": int, "cols": int,      # or an explicit grid size (default 256 x 256, max 2048)
+      "encoding": "png" | "uint8" | "float32"              # optional, default "png"
+    }
+
+    Returns bounds, shape, the derived scenario, legend ring radii (m) and per-layer base64 data
+    with its decode scale (row 0 = north). Results are cached, so repeating a request is cheap.
+    For interactive maps use the tile endpoint below instead.
+    """
+    data = request.get_json() or {}
+    try:
+        s = parse_impact_scenario(data)
+        layers = effects.check_layers(data.get('layers') or list(effects.LAYERS))
+        bounds = data.get('bounds') or effects.default_bounds(s, layers)
+        bounds = {k: float(bounds[k]) for k in ('lat_min', 'lat_max', 'lon_min', 'lon_max')}
+        if bounds['lat_min'] >= bounds['lat_max'] or bounds['lon_min'] >= bounds['lon_max']:
+            raise ValueError("bounds must have lat_min < lat_max and lon_min < lon_max")
+        if data.get('zoom') is not None:
+            rows, cols = effects.grid_shape_for_zoom(bounds, int(data['zoom']))
+        else:
+            rows, cols = int(data.get('rows', 256)), int(data.get('cols', 256))
+        if not (2 <= rows <= IMPACT_FIELD_MAX_SIDE and 2 <= cols <= IMPACT_FIELD_MAX_SIDE):
+            raise ValueError(f"Grid must be between 2 and {IMPACT_FIELD_MAX_SIDE} cells per side "
+                             f"(requested {rows} x {cols}); use a lower zoom or the tile endpoint")
+        return jsonify(effects.get_field(s, layers, bounds, rows, cols, data.get('encoding', 'png')))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@api.route('/impact/field/<int:z>/<int:x>/<int:y>.<fmt>')
+def impact_field_tile(z, x, y, fmt):
+    """
+    One 256 x 256 XYZ (Web Mercator) tile of an impact effect layer, for Leaflet TileLayer URLs.
+
+    Query parameters: lat, lon, energy_megatons (required), layer (overpressure | thermal | crater,
+    default overpressure) and the optional impactor parameters of POST /impact/field.
+    .png returns a palette PNG (transparent where the effect is below the layer's visible floor);
+    .u8 returns the raw uint8 codes (row 0 = north; decode with the scale from POST /impact/field),
+    gzip-compressed when the client accepts it. Tiles are cached server-side and are immutable for
+    a given query, so clients may cache them too.
+    """
+    try:
+        s = parse_impact_scenario(request.args)
+        data = effects.get_tile(s, request.args.get('layer', 'overpressure'), z, x, y, fmt)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    if fmt == 'png':
+        response = Response(data, mimetype='image/png')
+    else:
+        response = Response(data, mimetype='application/octet-stream')
+        if wants_gzip(request.headers.get('Accept-Encoding'), request.args):
+            response.set_data(gzip.compress(data, compresslevel=6))
+            response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'public, max-age=86400, immutable'
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@api.route('/impact/cache')
+def get_impact_cache_stats():
+    """Entry counts of the impact tile and bounding-box field caches."""
+    return jsonify(effects.tile_cache_stats())
+
+
+@api.route('/tsunami/cache')
+def get_tsunami_cache_stats():
+    """Report hit/miss counters for the geohash water/land cache and the tsunami estimate memo."""
+    return jsonify({**get_water_cache().stats(), 'estimate_memo': tsunami_memo_stats()})
+
+
+@api.route('/outbound')
+def get_outbound_stats():
+    """Per-host rate limit, circuit breaker and queueing delay metrics for third-party calls."""
+    return jsonify(outbound.stats())
+
+
+@api.route('/metrics')
+def get_metrics():
+    """Prometheus text exposition: request and span latency histograms, cache lookups, outbound queueing.
+
+    Spans cover every outbound call (outbound.<provider>, labelled with provider and outcome) and the
+    model functions behind the routes; cache lookups are counted per cache and result.
+    """
+    return Response(metrics.render_prometheus(outbound.prometheus_lines()),
+                    mimetype='text/plain; version=0.0.4')
+
+
+@api.route('/profiler', methods=['GET', 'POST'])
+def profiler_route():
+    """
+    Sampling profiler control; 404 unless PROFILER_ROUTE_ENABLED is set (the stacks expose code paths).
+
+    GET returns the aggregated stacks in collapsed format (one "frame;frame;... count" line per
+    stack, ready for flamegraph.pl or speedscope); ?limit=N keeps the N most frequent stacks and
+    ?format=json returns the profiler status instead.
+
+    POST JSON body (all optional):
+    - enabled: true starts sampling, false stops it
+    - interval_ms: sampling interval, at least 1 (default 10, from PROFILER_INTERVAL_MS)
+    - reset: true discards the samples collected so far
+
+    The profiler lives in the worker process: under gunicorn each request reaches (and toggles or
+    reads) only the worker that handled it. Set PROFILER_ENABLED to sample in every worker.
+    """
+    if not metrics.profiler_route_enabled():
+        return jsonify({"error": "Not found"}), 404
+    profiler = metrics.profiler
+    if request.method == 'GET':
+        if request.args.get('format') == 'json':
+            return jsonify(profiler.status())
+        try:
+            limit = int(request.args['limit']) if 'limit' in request.args else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return Response(profiler.collapsed(limit), mimetype='text/plain')
+
+    data = request.get_json(silent=True) or {}
+    try:
+        interval_ms = data.get('interval_ms')
+        interval_s = float(interval_ms) / 1000.0 if interval_ms is not None else None
+        if interval_s is not None and not interval_s >= metrics.MIN_PROFILER_INTERVAL_S:
+            raise ValueError(f"interval_ms must be at least {metrics.MIN_PROFILER_INTERVAL_S * 1000:g}")
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    if data.get('reset'):
+        profiler.reset()
+    if data.get('enabled') is True:
+        profiler.start(interval_s)
+    elif data.get('enabled') is False:
+        profiler.stop()
+    return jsonify(profiler.status())
 
 if __name__ == '__main__':
     # Runs the app in debug mode for development.
-    app.run(debug=True)
+    os.environ.setdefault('FEED_REFRESH_ENABLED', '1')
+    create_app().run(debug=True)
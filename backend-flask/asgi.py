@@ -0,0 +1,193 @@
+"""ASGI entry point: async handlers for the I/O-bound routes, Flask for everything else.
+
+Run with an ASGI server, e.g.  uvicorn asgi:application --port 5000
+
+GET /neo and POST /tsunami spend almost all their time waiting on NASA, Google, Nominatim and
+Overpass. Here they are served by coroutines on one event loop (models.aio, models.tsunami_async),
+so hundreds of slow lookups can be in flight without a thread each. Flask async views would not
+help: under WSGI each request still occupies a worker thread until its view returns. All other
+routes, including CORS preflight requests, are passed to the Flask app unchanged.
+"""
+import json
+import os
+import time
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import (
+    create_app,
+    feed_refresher,
+    neo_model,
+    parse_tsunami_request,
+    query_neo_index,
+    snapshot_headers,
+    tsunami_result,
+    wants_neo_index,
+)
+from models import aio, metrics, tsunami_async
+from models.impact import split_date_range
+from models.streaming import NDJSON_MIMETYPE, NDJSONEncoder, wants_gzip, wants_ndjson
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'http://localhost:3000'),
+    (b'access-control-allow-headers', b'Content-Type,Authorization'),
+    (b'access-control-allow-methods', b'GET,POST,OPTIONS'),
+    (b'access-control-allow-credentials', b'true'),
+    (b'access-control-expose-headers', b'X-Total-Count,X-Grid-Axes,X-Grid-Shape,X-Snapshot-Age,Server-Timing'),
+]
+
+# serving entry point: keep the default feed windows refreshed unless FEED_REFRESH_ENABLED=0
+os.environ.setdefault('FEED_REFRESH_ENABLED', '1')
+flask_app = WsgiToAsgi(create_app())
+
+
+async def _send_json(send, body, status=200, headers=()):
+    await _send_encoded(send, json.dumps(body).encode('utf-8'), status, headers)
+
+
+async def _send_encoded(send, payload, status=200, headers=()):
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode())] + list(headers)
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers + CORS_HEADERS})
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+def _header(scope, name):
+    for key, value in scope.get('headers', []):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def _aiter(records):
+    for record in records:
+        yield record
+
+
+async def _stream_ndjson(scope, send, records, headers=()):
+    """Send an (async) iterable of records as NDJSON, mirroring app.ndjson_response."""
+    args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+    gzip = wants_gzip(_header(scope, b'accept-encoding'), args)
+    encoder = NDJSONEncoder(gzip=gzip)
+    start_headers = [(b'content-type', NDJSON_MIMETYPE.encode()), (b'cache-control', b'no-cache'),
+                     (b'vary', b'Accept, Accept-Encoding')] + list(headers) + CORS_HEADERS
+    if gzip:
+        start_headers.append((b'content-encoding', b'gzip'))
+    await send({'type': 'http.response.start', 'status': 200, 'headers': start_headers})
+    if not hasattr(records, '__aiter__'):
+        records = _aiter(records)
+    try:
+        async for record in records:
+            data = encoder.add(record)
+            if data:
+                await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+    except Exception as e:
+        encoder.add({'error': str(e)})
+    await send({'type': 'http.response.body', 'body': encoder.close()})
+
+
+async def get_neo(scope, receive, send):
+    args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+    try:
+        streaming = wants_ndjson(_header(scope, b'accept'), args)
+        snapshot = feed_refresher().get(args.get('start_date'), args.get('end_date'))
+        headers = [(k.lower().encode(), v.encode()) for k, v in snapshot_headers(snapshot).items()]
+        if wants_neo_index(args):
+            if snapshot:
+                index = snapshot.index
+            else:
+                index = await neo_model().aget_index(args.get('start_date'), args.get('end_date'))
+            if index is None:
+                return await _send_json(send, {"error": "Failed to retrieve data from NASA API."}, 500)
+            page = query_neo_index(index, args)
+            if streaming:
+                total = (b'x-total-count', str(page['total']).encode())
+                return await _stream_ndjson(scope, send, page['items'], headers=headers + [total])
+            return await _send_json(send, page, headers=headers)
+        if streaming:
+            if snapshot:
+                return await _stream_ndjson(scope, send, snapshot.neos, headers=headers)
+            start_date, end_date = neo_model().resolve_range(args.get('start_date'), args.get('end_date'))
+            split_date_range(start_date, end_date)
+            return await _stream_ndjson(scope, send, neo_model().aiter_neos(start_date, end_date))
+        if snapshot:
+            return await _send_encoded(send, snapshot.body, headers=headers)
+        neos = await neo_model().aget_neos(args.get('start_date'), args.get('end_date'))
+    except ValueError as e:
+        return await _send_json(send, {"error": str(e)}, 400)
+    if neos is None:
+        return await _send_json(send, {"error": "Failed to retrieve data from NASA API."}, 500)
+    await _send_json(send, neos)
+
+
+async def post_tsunami(scope, receive, send):
+    try:
+        data = json.loads(await _read_body(receive) or b'{}') or {}
+        lat, lon, energy_megatons = parse_tsunami_request(data)
+    except Exception:
+        return await _send_json(send, {"error": "Invalid input: must provide lat, lon, energy_megatons"}, 400)
+
+    google_key = os.getenv('GOOGLE_ELEVATION_API_KEY')
+    is_water, elevation = await tsunami_async.is_water_at_location(lat, lon, api_key=google_key)
+    await _send_json(send, tsunami_result(lat, lon, energy_megatons, is_water, elevation))
+
+
+ROUTES = {
+    ('GET', '/neo'): get_neo,
+    ('POST', '/tsunami'): post_tsunami,
+}
+
+
+async def _timed(handler, scope, receive, send):
+    """Run a native handler with the request timing and Server-Timing behaviour of app.py's hooks."""
+    started = time.perf_counter()
+    args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+    token = None
+    if metrics.wants_server_timing(args, _header(scope, b'x-server-timing')):
+        token = metrics.start_collecting()
+
+    async def timed_send(message):
+        if message['type'] == 'http.response.start':
+            elapsed = time.perf_counter() - started
+            metrics.observe_request(scope['path'], scope['method'], message['status'], elapsed)
+            if token is not None:
+                timing = metrics.server_timing_header(metrics.collected(), elapsed).encode('latin-1')
+                message = {**message, 'headers': list(message['headers']) + [
+                    (b'server-timing', timing), (b'timing-allow-origin', b'http://localhost:3000')]}
+        await send(message)
+
+    try:
+        await handler(scope, receive, timed_send)
+    finally:
+        if token is not None:
+            metrics.stop_collecting(token)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await aio.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] == 'http':
+        handler = ROUTES.get((scope['method'], scope['path']))
+        if handler is not None:
+            return await _timed(handler, scope, receive, send)
+    await flask_app(scope, receive, send)
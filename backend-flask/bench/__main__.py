@@ -0,0 +1,80 @@
+"""Benchmark suite for the backend.
+
+Examples (from backend-flask/):
+    python -m bench                                  # run everything, print a table
+    python -m bench --save bench/baseline.json       # record a baseline
+    python -m bench --compare bench/baseline.json    # exit 1 on a >25% p50/p95 regression
+    python -m bench --only tsunami --latency-ms google=80,nominatim=300 --concurrency 8
+
+Upstream services are replaced by the local stubs in bench/stubs.py, so results do not depend on
+the network, and --latency-ms can emulate realistic provider delays.
+"""
+import argparse
+import os
+import sys
+
+from bench import harness
+from bench.stubs import SERVICES, StubServer
+
+
+def parse_latency(spec):
+    latency = {}
+    for part in filter(None, (spec or '').split(',')):
+        name, _, value = part.partition('=')
+        if name not in SERVICES:
+            raise SystemExit(f'Unknown service {name!r}; expected one of {", ".join(SERVICES)}')
+        latency[name] = float(value) / 1000.0
+    return latency
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the backend benchmark suite.')
+    parser.add_argument('--only', help='run only cases whose name contains this substring')
+    parser.add_argument('--latency-ms', default='', help='stub latency per service, e.g. nasa=200,google=50')
+    parser.add_argument('--concurrency', type=int, default=1, help='client threads for route cases')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply iteration counts and run times')
+    parser.add_argument('--save', metavar='PATH', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH', help='baseline to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown fraction (default 0.25)')
+    args = parser.parse_args(argv)
+
+    latency = parse_latency(args.latency_ms)
+    stubs = StubServer(latency).start()
+    os.environ.update(stubs.env())
+    # The stub host is not rate limited (see models/outbound.py); keep on-disk caches and offline
+    # datasets out of the numbers
+    for name in ('NEO_CACHE_PATH', 'WATER_CACHE_PATH', 'WATER_CACHE_PREWARM', 'BATHYMETRY_RASTER_DIR',
+                 'WATER_INDEX_PATH'):
+        os.environ.pop(name, None)
+
+    from app import app
+    from bench.cases import model_cases, route_cases, uncovered_routes
+
+    cases = model_cases() + route_cases(app, concurrency=args.concurrency)
+    missing = uncovered_routes(app, cases)
+    if missing:
+        print(f'warning: routes without a benchmark case: {", ".join(missing)}', file=sys.stderr)
+    if args.only:
+        cases = [c for c in cases if args.only in c.name]
+
+    results = harness.run_cases(cases, scale=args.scale)
+    report = harness.make_report(results, latency_s=stubs.latency_s, concurrency=args.concurrency,
+                                 scale=args.scale, upstream_calls=dict(stubs.calls))
+    stubs.stop()
+
+    if args.save:
+        harness.save_report(report, args.save)
+        print(f'saved {len(results)} results to {args.save}')
+    if args.compare:
+        regressions = harness.compare(harness.load_report(args.compare), report, threshold=args.threshold)
+        for r in regressions:
+            change = '' if r['change'] is None else f" ({r['change']:+.0%})"
+            print(f"REGRESSION {r['case']} {r['metric']}: {r['baseline']:.3f} -> {r['current']:.3f}{change}")
+        if regressions:
+            return 1
+        print(f'no regressions beyond {args.threshold:.0%}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import random
+import threading
+from datetime import date, timedelta
+
+import requests
+
+from bench.harness import Case
+from bench.stubs import feed
+
+# Benchmark cases: model functions called directly, and every Flask route over real HTTP
+# - model_cases() / route_cases() must run after the stub environment is applied (the backend reads its upstream
+#   URLs at import time), which bench/__main__.py takes care of.
+# - Route cases talk to a threaded werkzeug server in this process, one requests.Session per
+#   worker thread, so JSON encoding, streaming and connection handling are part of the timing.
+# - "cold" cases use a fresh date range / random coordinates per call so caches miss;
+#   "warm" cases repeat the same request so they measure the cached path.
+
+# An ocean point on the synthetic planet served by the stubs (models.raster.synthetic_elevation)
+OCEAN_POINT = (0.0, -30.0)
+
+
+def _serve(app):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, name='bench-flask', daemon=True).start()
+    return server
+
+
+def model_cases():
+    import numpy as np
+
+    from models.deflection import estimate_deflection, estimate_deflection_batch
+    from models.impact import parse_feed
+    from models.tsunami import estimate_tsunami_array, estimate_tsunami_from_impact
+
+    week = feed('2025-01-01', '2025-01-07')
+    diameters = np.linspace(10, 1000, 10_000)
+    energies = np.logspace(-3, 6, 1000)[:, None]
+    depths = np.logspace(0, 4, 1000)[None, :]
+    return [
+        Case('model:estimate_deflection', lambda i: estimate_deflection(
+            diameter_m=150, relative_velocity_m_s=20000, lead_time_days=3650), max_iterations=20000),
+        Case('model:estimate_deflection_batch[10k]', lambda i: estimate_deflection_batch(
+            diameter_m=diameters, relative_velocity_m_s=20000.0, lead_time_days=3650.0)),
+        Case('model:estimate_tsunami_from_impact', lambda i: estimate_tsunami_from_impact(
+            energy_megatons=50.0, water_depth_m=4000.0), max_iterations=20000),
+        Case('model:estimate_tsunami_array[1M grid]', lambda i: estimate_tsunami_array(energies, depths),
+             max_iterations=200),
+        Case('model:parse_feed[7d]', lambda i: parse_feed(week)),
+    ]
+
+
+def route_cases(app, concurrency=1):
+    from app import feed_refresher
+    from models.impact import NEO
+    from models.tsunami import is_water_at_location
+
+    # the default /neo window is served from the refresher's snapshot; don't race its first run
+    feed_refresher().refresh()
+    server = _serve(app)
+    base = f'http://127.0.0.1:{server.server_port}'
+    local = threading.local()
+    rng = random.Random(0)
+    rng_lock = threading.Lock()
+
+    def session():
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    def get(path, **kwargs):
+        def fn(i):
+            r = session().get(base + path, **kwargs)
+            r.raise_for_status()
+            return r.content
+        return fn
+
+    def post(path, body):
+        def fn(i):
+            r = session().post(base + path, json=body)
+            r.raise_for_status()
+            return r.content
+        return fn
+
+    def cold_range(days):
+        # a fresh window every call, far enough apart that windows never overlap
+        def params(i):
+            s = date.fromordinal(738000 + (i + 10) * (days + 1))
+            return {'start_date': s.isoformat(), 'end_date': (s + timedelta(days=days - 1)).isoformat()}
+        return params
+
+    def neo_cold(days, **extra):
+        window = cold_range(days)
+
+        def fn(i):
+            r = session().get(base + '/neo', params={**window(i), **extra})
+            r.raise_for_status()
+            return r.content
+        return fn
+
+    def random_point():
+        with rng_lock:
+            return rng.uniform(-60, 60), rng.uniform(-180, 180)
+
+    def tsunami_cold(i):
+        lat, lon = random_point()
+        r = session().post(base + '/tsunami', json={'lat': lat, 'lon': lon, 'energy_megatons': 50})
+        r.raise_for_status()
+        return r.content
+
+    impact = {'lat': 40.0, 'lon': -74.0, 'energy_megatons': 1000}
+
+    def impact_tile_cold(i):
+        # a new scenario every call, so the tile is always rendered
+        r = session().get(base + '/impact/field/6/18/24.png', params={**impact, 'energy_megatons': 1000 + i})
+        r.raise_for_status()
+        return r.content
+
+    warm_week = {'start_date': '2025-01-01', 'end_date': '2025-01-07'}
+    warm_quarter = {'start_date': '2025-01-01', 'end_date': '2025-03-31'}
+    c = concurrency
+    return [
+        Case('route:GET /', get('/'), concurrency=c),
+        Case('route:GET /neo warm[7d]', get('/neo', params=warm_week), concurrency=c),
+        Case('route:GET /neo cold[7d]', neo_cold(7), concurrency=c, max_iterations=300),
+        Case('route:GET /neo cold[90d]', neo_cold(90), concurrency=c, max_iterations=50),
+        Case('route:GET /neo index warm[90d]', get('/neo', params={**warm_quarter, 'sort': 'energy', 'limit': 50}),
+             concurrency=c),
+        Case('route:GET /neo ndjson warm[90d]', get('/neo', params={**warm_quarter, 'format': 'ndjson'}),
+             concurrency=c),
+        Case('route:GET /neo/stream warm[90d]', get('/neo/stream', params=warm_quarter), concurrency=c),
+        Case('route:GET /neo snapshot[default window]', get('/neo'), concurrency=c),
+        Case('route:GET /neo/snapshot', get('/neo/snapshot'), concurrency=c),
+        Case('route:GET /neo/cache', get('/neo/cache'), concurrency=c),
+        Case('route:POST /deflect', post('/deflect', {
+            'diameter_m': 150, 'relative_velocity_m_s': 20000, 'lead_time_days': 3650}), concurrency=c),
+        Case('route:POST /deflect/batch[10k grid]', post('/deflect/batch', {
+            'grid': {'diameter_m': list(range(10, 1010, 10)), 'lead_time_days': list(range(30, 3030, 30))}}),
+            concurrency=c),
+        Case('route:POST /deflect/optimize[1M candidates]', post('/deflect/optimize', {
+            'diameter_m': 300, 'warning_time_days': 3650}), concurrency=c, max_iterations=200),
+        Case('route:POST /deflect_orbit elements', post('/deflect_orbit', {
+            'elements': {'a_au': 1.3, 'e': 0.2, 'i_deg': 5.0, 'raan_deg': 40.0, 'argp_deg': 80.0,
+                         'M_deg': 10.0, 'epoch_jd': 2460600.5},
+            'lead_time_days': 3650, 'diameter_m': 150}), concurrency=c),
+        Case('route:POST /deflect_orbit neo_id', post('/deflect_orbit', {
+            'neo_id': '73916703', 'lead_time_days': 3650}), concurrency=c),
+        Case('route:POST /montecarlo[100k]', post('/montecarlo', {'n_samples': 100_000, 'seed': 1}),
+             concurrency=c, max_iterations=200),
+        Case('route:POST /tsunami warm ocean', post('/tsunami', {
+            'lat': OCEAN_POINT[0], 'lon': OCEAN_POINT[1], 'energy_megatons': 50}), concurrency=c),
+        Case('route:POST /tsunami cold', tsunami_cold, concurrency=c, max_iterations=300, min_time_s=5.0),
+        Case('route:POST /tsunami/batch[10k grid]', post('/tsunami/batch', {
+            'grid': {'energy_megatons': [10 ** (k / 25) for k in range(-75, 25)],
+                     'water_depth_m': list(range(10, 10010, 100))}}), concurrency=c),
+        Case('route:POST /tsunami/field[200x200 ray]', post('/tsunami/field', {
+            'lat': OCEAN_POINT[0], 'lon': OCEAN_POINT[1], 'energy_megatons': 50, 'rows': 200, 'cols': 200}),
+            concurrency=c, max_iterations=200),
+        Case('route:GET /tsunami/cache', get('/tsunami/cache'), concurrency=c),
+        Case('route:POST /impact/field[256x256 png]', post('/impact/field', {
+            'lat': 40.0, 'lon': -74.0, 'energy_megatons': 1000}), concurrency=c),
+        Case('route:GET /impact/field/<int:z>/<int:x>/<int:y>.<fmt> warm', get(
+            '/impact/field/6/18/24.png', params=impact), concurrency=c),
+        Case('route:GET /impact/field/<int:z>/<int:x>/<int:y>.<fmt> cold', impact_tile_cold, concurrency=c,
+             max_iterations=500),
+        Case('route:GET /impact/cache', get('/impact/cache'), concurrency=c),
+        Case('route:GET /outbound', get('/outbound'), concurrency=c),
+        Case('route:GET /metrics', get('/metrics'), concurrency=c),
+        Case('route:GET /profiler', get('/profiler'), concurrency=c),
+        Case('route:POST /tsunami warm ocean server-timing', post('/tsunami?server_timing=1', {
+            'lat': OCEAN_POINT[0], 'lon': OCEAN_POINT[1], 'energy_megatons': 50}), concurrency=c),
+        Case('model:NEO.get_neos cold[30d]', lambda i: NEO().get_neos(**cold_range(30)(i)),
+             max_iterations=50),
+        Case('model:is_water_at_location cold', lambda i: is_water_at_location(*random_point()),
+             max_iterations=300, min_time_s=5.0),
+    ]
+
+
+# Routes deliberately not timed (e.g. streaming endpoints covered through another case)
+UNCOVERED_OK = {'/static/<path:filename>'}
+
+
+def uncovered_routes(app, cases):
+    """Flask rules that no route case exercises, so new endpoints don't silently go unmeasured."""
+    covered = set()
+    for case in cases:
+        if case.name.startswith('route:'):
+            covered.add(case.name.split()[1].split('[')[0])
+    return sorted(rule.rule for rule in app.url_map.iter_rules()
+                  if rule.rule not in covered and rule.rule not in UNCOVERED_OK)
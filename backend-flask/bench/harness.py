@@ -0,0 +1,153 @@
+import json
+import platform
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Measurement and baseline bookkeeping for the benchmark suite
+# - A Case is a named callable run repeatedly (optionally from several threads at once); each call
+#   is timed individually, so one run yields both throughput and the latency distribution.
+# - Results are plain dicts: {'n', 'errors', 'throughput_per_s', 'mean_ms', 'p50_ms', 'p95_ms',
+#   'p99_ms', 'max_ms'}; a report is {'meta': {...}, 'results': {case name: result}} and is what
+#   gets saved as a JSON baseline.
+# - compare() flags a regression when a latency metric grows by more than the threshold fraction
+#   and by more than min_delta_ms (so microsecond-scale jitter is not reported).
+
+DEFAULT_MIN_TIME_S = 1.0
+DEFAULT_MAX_ITERATIONS = 2000
+PERCENTILES = (50, 95, 99)
+
+
+class Case:
+    """A benchmark: fn(i) is called once per iteration i; setup() runs once before timing."""
+
+    def __init__(self, name, fn, setup=None, concurrency=1, max_iterations=DEFAULT_MAX_ITERATIONS,
+                 min_time_s=DEFAULT_MIN_TIME_S, warmup=3):
+        self.name = name
+        self.fn = fn
+        self.setup = setup
+        self.concurrency = concurrency
+        self.max_iterations = max_iterations
+        self.min_time_s = min_time_s
+        self.warmup = warmup
+
+
+def summarize(latencies_s, wall_s, errors=0):
+    lat_ms = np.asarray(latencies_s, dtype=np.float64) * 1000.0
+    n = int(lat_ms.size)
+    result = {
+        'n': n,
+        'errors': errors,
+        'throughput_per_s': n / wall_s if wall_s > 0 else None,
+        'mean_ms': float(lat_ms.mean()) if n else None,
+        'max_ms': float(lat_ms.max()) if n else None,
+    }
+    pct = np.percentile(lat_ms, PERCENTILES) if n else [None] * len(PERCENTILES)
+    for p, v in zip(PERCENTILES, pct):
+        result[f'p{p}_ms'] = float(v) if v is not None else None
+    return result
+
+
+def run_case(case, scale=1.0):
+    """Run one case until min_time_s has passed or max_iterations calls were made."""
+    if case.setup is not None:
+        case.setup()
+    for i in range(case.warmup):
+        case.fn(-1 - i)
+
+    max_iterations = max(1, int(case.max_iterations * scale))
+    min_time_s = case.min_time_s * scale
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(max_iterations))
+    start = time.perf_counter()
+    deadline = start + min_time_s
+
+    def worker():
+        local = []
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None or (time.perf_counter() > deadline and len(local) > 0):
+                break
+            t0 = time.perf_counter()
+            try:
+                case.fn(i)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    if case.concurrency > 1:
+        with ThreadPoolExecutor(max_workers=case.concurrency) as pool:
+            for future in [pool.submit(worker) for _ in range(case.concurrency)]:
+                future.result()
+    else:
+        worker()
+    result = summarize(latencies, time.perf_counter() - start, errors[0])
+    result['concurrency'] = case.concurrency
+    return result
+
+
+def run_cases(cases, scale=1.0, progress=print):
+    results = {}
+    for case in cases:
+        results[case.name] = run_case(case, scale=scale)
+        if progress:
+            progress(format_result(case.name, results[case.name]))
+    return results
+
+
+def make_report(results, **meta):
+    meta.update({
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    })
+    return {'meta': meta, 'results': results}
+
+
+def save_report(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=0.25, metrics=('p50_ms', 'p95_ms'), min_delta_ms=0.05):
+    """Return a list of regression dicts for cases present in both reports."""
+    regressions = []
+    for name, now in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        for metric in metrics:
+            old, new = before.get(metric), now.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1.0 + threshold) and new - old > min_delta_ms:
+                regressions.append({'case': name, 'metric': metric, 'baseline': old, 'current': new,
+                                    'change': new / old - 1.0 if old else float('inf')})
+        if now.get('errors', 0) > before.get('errors', 0):
+            regressions.append({'case': name, 'metric': 'errors', 'baseline': before.get('errors', 0),
+                                'current': now['errors'], 'change': None})
+    return regressions
+
+
+def format_result(name, r):
+    def ms(v):
+        return '-' if v is None else (f'{v * 1000:.1f}us' if v < 1 else f'{v:.2f}ms')
+    tput = r['throughput_per_s']
+    return (f"{name:<44} n={r['n']:<6} {('%.1f/s' % tput) if tput else '-':>11}  "
+            f"p50={ms(r['p50_ms']):>9} p95={ms(r['p95_ms']):>9} p99={ms(r['p99_ms']):>9}"
+            + (f"  errors={r['errors']}" if r['errors'] else ''))
@@ -0,0 +1,151 @@
+"""Startup cost of the backend: import time, time to first response and per-worker memory.
+
+Examples (from backend-flask/):
+    python -m bench.startup                         # 4 workers, synthetic raster + fixture water index
+    python -m bench.startup --workers 8 --raster /data/gebco --water-index /data/water_index
+
+Import time is measured in fresh interpreters. Worker memory is measured for the two ways a
+preforking server can start workers, with all workers alive at once:
+- preload: this process runs models.providers.preload() and then forks the workers, which share
+  the loaded modules and data copy-on-write (gunicorn.conf.py with GUNICORN_PRELOAD=1);
+- spawn: every worker starts a fresh interpreter and imports and loads everything itself.
+Each worker serves the same warm-up requests before reporting. RSS counts shared pages in every
+process; PSS splits them between the processes sharing them and is the number that adds up.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.cases import OCEAN_POINT
+from bench.stubs import StubServer
+
+IMPORT_PROBE = '''
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app(start_background=False)
+print(json.dumps({"import_s": imported - started, "create_app_s": time.perf_counter() - imported}))
+'''
+
+WARMUP_REQUESTS = (
+    ('GET', '/', None),
+    ('GET', '/neo', None),
+    ('POST', '/tsunami', {'lat': OCEAN_POINT[0], 'lon': OCEAN_POINT[1], 'energy_megatons': 50}),
+    ('POST', '/deflect', {'diameter_m': 150, 'relative_velocity_m_s': 20000, 'lead_time_days': 3650}),
+    ('GET', '/impact/field/6/18/24.png?lat=40&lon=-74&energy_megatons=1000', None),
+)
+
+
+def memory_kb():
+    """{'rss', 'pss', 'private', 'shared'} in kB from /proc/self/smaps_rollup (Linux), else maxrss only."""
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+    except OSError:
+        import resource
+        return {'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    private = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return {'rss': fields.get('Rss', 0), 'pss': fields.get('Pss', 0), 'private': private,
+            'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)}
+
+
+def _worker(mode, started, results, done):
+    if mode == 'spawn':
+        from models import providers
+        providers.preload()
+    from app import create_app
+
+    client = create_app(start_background=False).test_client()
+    for method, path, body in WARMUP_REQUESTS:
+        response = client.open(path, method=method, json=body)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method} {path} -> {response.status_code}')
+    results.put({'pid': os.getpid(), 'ready_s': time.time() - started, **memory_kb()})
+    done.wait()
+
+
+def run_workers(mode, n):
+    """Start n workers the given way ('preload' or 'spawn'); returns their reports once all are up."""
+    ctx = multiprocessing.get_context('fork' if mode == 'preload' else 'spawn')
+    results = ctx.Queue()
+    done = ctx.Event()
+    started = time.time()
+    if mode == 'preload':
+        from models import providers
+        providers.preload()
+    procs = [ctx.Process(target=_worker, args=(mode, started, results, done)) for _ in range(n)]
+    for p in procs:
+        p.start()
+    reports = [results.get(timeout=300) for _ in procs]
+    done.set()
+    for p in procs:
+        p.join()
+    return reports
+
+
+def measure_imports(runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', IMPORT_PROBE], capture_output=True, text=True, check=True)
+        sample = json.loads(out.stdout.strip().splitlines()[-1])
+        sample['process_s'] = time.perf_counter() - started
+        samples.append(sample)
+    return {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure backend import time and per-worker memory.')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--import-runs', type=int, default=5)
+    parser.add_argument('--raster', help='BATHYMETRY_RASTER_DIR to load (default: a synthetic 1-degree raster)')
+    parser.add_argument('--water-index', help='WATER_INDEX_PATH to load (default: data/water_fixture.geojson)')
+    parser.add_argument('--modes', default='preload,spawn', help='comma-separated worker start modes')
+    args = parser.parse_args(argv)
+
+    stubs = StubServer().start()
+    os.environ.update(stubs.env())
+    os.environ['FEED_REFRESH_ENABLED'] = '1'
+    for name in ('NEO_CACHE_PATH', 'WATER_CACHE_PATH'):
+        os.environ.pop(name, None)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.raster:
+            os.environ['BATHYMETRY_RASTER_DIR'] = args.raster
+        else:
+            from models.raster import build_synthetic_raster
+            build_synthetic_raster(tmp)
+            os.environ['BATHYMETRY_RASTER_DIR'] = tmp
+        os.environ['WATER_INDEX_PATH'] = args.water_index or os.path.join(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'water_fixture.geojson')
+
+        imports = measure_imports(args.import_runs)
+        print(f"import app          {imports['import_s'] * 1000:8.1f} ms  (median of {args.import_runs})")
+        print(f"create_app()        {imports['create_app_s'] * 1000:8.1f} ms")
+        print(f"interpreter + both  {imports['process_s'] * 1000:8.1f} ms")
+
+        # spawn first: the preload mode loads everything into this process
+        for mode in sorted(args.modes.split(','), key=lambda m: m != 'spawn'):
+            reports = run_workers(mode, args.workers)
+            print(f'\n{mode}: {args.workers} workers')
+            for r in sorted(reports, key=lambda r: r['pid']):
+                print(f"  pid {r['pid']:<7d} ready {r['ready_s'] * 1000:7.0f} ms  rss {r['rss'] / 1024:6.1f} MB  "
+                      f"pss {r.get('pss', 0) / 1024:6.1f} MB  private {r.get('private', 0) / 1024:6.1f} MB")
+            total_pss = sum(r.get('pss', 0) for r in reports) / 1024
+            mean_private = statistics.mean(r.get('private', 0) for r in reports) / 1024
+            print(f'  total pss {total_pss:.1f} MB, mean private {mean_private:.1f} MB')
+    stubs.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+import json
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from models.raster import synthetic_elevation
+
+# Local stand-ins for the third-party services the backend calls, for benchmarks
+# - One threaded HTTP server emulates NASA NeoWs (feed + lookup), Google Elevation, Nominatim
+#   reverse geocoding and the Overpass interpreter, each with its own configurable latency.
+# - Answers are deterministic: the world is models.raster.synthetic_elevation, so water/land
+#   agrees across the emulated providers, and feed content depends only on the date.
+# - env_for(server) returns the environment variables that point the backend at the stubs.
+
+SERVICES = ('nasa', 'google', 'nominatim', 'overpass')
+NEOS_PER_DAY = 12
+
+
+def _decode_polyline(s):
+    idx = 0
+    lat = lon = 0
+    points = []
+    while idx < len(s):
+        values = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                b = ord(s[idx]) - 63
+                idx += 1
+                result |= (b & 0x1f) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            values.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += values[0]
+        lon += values[1]
+        points.append((lat / 1e5, lon / 1e5))
+    return points
+
+
+def _elevation(lat, lon):
+    return float(synthetic_elevation(np.array([lat]), np.array([lon]))[0])
+
+
+def feed_day(day):
+    """Deterministic NeoWs feed entries for one date."""
+    neos = []
+    for k in range(NEOS_PER_DAY):
+        neo_id = f'{day.toordinal()}{k:02d}'
+        diameter_km = 0.01 + 0.05 * ((day.toordinal() * 7 + k * 13) % 40)
+        neos.append({
+            'id': neo_id,
+            'name': f'({day.year} {neo_id})',
+            'absolute_magnitude_h': 18.0 + (k % 10),
+            'estimated_diameter': {'kilometers': {
+                'estimated_diameter_min': diameter_km * 0.45,
+                'estimated_diameter_max': diameter_km,
+            }},
+            'close_approach_data': [{
+                'close_approach_date': day.isoformat(),
+                'close_approach_date_full': f'{day.isoformat()} 12:00',
+                'epoch_date_close_approach': (day - date(1970, 1, 1)).days * 86400000 + 43200000,
+                'relative_velocity': {'kilometers_per_second': str(5.0 + k * 1.5)},
+                'miss_distance': {'kilometers': str(4e5 * (k + 1))},
+                'orbiting_body': 'Earth',
+            }],
+        })
+    return neos
+
+
+def feed(start_date, end_date):
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    days = {}
+    d = start
+    while d <= end:
+        days[d.isoformat()] = feed_day(d)
+        d += timedelta(days=1)
+    return {'element_count': NEOS_PER_DAY * len(days), 'near_earth_objects': days}
+
+
+def lookup(neo_id):
+    day = date.fromordinal(int(neo_id[:-2]))
+    k = int(neo_id[-2:])
+    neo = next(n for n in feed_day(day) if n['id'] == neo_id)
+    neo['orbital_data'] = {
+        'semi_major_axis': str(1.1 + 0.05 * k),
+        'eccentricity': str(0.1 + 0.02 * k),
+        'inclination': str(2.0 + k),
+        'ascending_node_longitude': str(30.0 * k % 360),
+        'perihelion_argument': str(45.0 + 10 * k),
+        'mean_anomaly': str(20.0 * k % 360),
+        'epoch_osculation': '2460600.5',
+    }
+    return neo
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, service, body, status=200):
+        stub = self.server.stub
+        with stub.lock:
+            stub.calls[service] += 1
+        delay = stub.latency_s.get(service, 0.0)
+        if delay:
+            time.sleep(delay)
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == '/neo/rest/v1/feed':
+            return self._reply('nasa', feed(q['start_date'], q['end_date']))
+        if url.path.startswith('/neo/rest/v1/neo/'):
+            return self._reply('nasa', lookup(url.path.rsplit('/', 1)[1]))
+        if url.path == '/maps/api/elevation/json':
+            loc = q['locations']
+            points = (_decode_polyline(loc[4:]) if loc.startswith('enc:')
+                      else [tuple(map(float, p.split(','))) for p in loc.split('|')])
+            results = [{'elevation': _elevation(lat, lon), 'location': {'lat': lat, 'lng': lon}}
+                       for lat, lon in points]
+            return self._reply('google', {'status': 'OK', 'results': results})
+        if url.path == '/reverse':
+            water = _elevation(float(q['lat']), float(q['lon'])) <= 0
+            body = {'class': 'water', 'type': 'water'} if water else {'class': 'place', 'type': 'village'}
+            return self._reply('nominatim', body)
+        self._reply('nasa', {'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        query = self.rfile.read(length).decode('utf-8')
+        # 'around:{radius},{lat},{lon}' as written by models.tsunami._overpass_query
+        around = query.split('around:', 1)[1].split(')', 1)[0]
+        _radius, lat, lon = (float(v) for v in around.split(','))
+        elements = [{'type': 'count', 'tags': {'total': '1'}}] if _elevation(lat, lon) <= 0 else []
+        self._reply('overpass', {'elements': elements})
+
+
+class StubServer:
+    """Threaded stub server; latency_s maps a service name to its per-request delay (seconds)."""
+
+    def __init__(self, latency_s=None, port=0):
+        self.latency_s = dict.fromkeys(SERVICES, 0.0)
+        self.latency_s.update(latency_s or {})
+        self.calls = dict.fromkeys(SERVICES, 0)
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='bench-stubs', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def env(self):
+        """Environment variables pointing the backend at this server."""
+        return {
+            'NASA_API_KEY': 'BENCH',
+            'NASA_NEO_FEED_URL': f'{self.url}/neo/rest/v1/feed',
+            'NASA_NEO_LOOKUP_URL': f'{self.url}/neo/rest/v1/neo',
+            'GOOGLE_ELEVATION_API_KEY': 'BENCH',
+            'GOOGLE_ELEVATION_URL': f'{self.url}/maps/api/elevation/json',
+            'NOMINATIM_REVERSE_URL': f'{self.url}/reverse',
+            'OVERPASS_URL': f'{self.url}/api/interpreter',
+        }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run the stub NASA/Google/Nominatim/Overpass server.')
+    parser.add_argument('--port', type=int, default=8900)
+    for service in SERVICES:
+        parser.add_argument(f'--{service}-ms', type=float, default=0.0, help=f'{service} latency (ms)')
+    args = parser.parse_args()
+
+    server = StubServer({s: getattr(args, f'{s}_ms') / 1000.0 for s in SERVICES}, port=args.port)
+    for key, value in server.env().items():
+        print(f'{key}={value}')
+    server.httpd.serve_forever()
@@ -0,0 +1,31 @@
+import pytest
+
+from bench.stubs import StubServer
+
+
+@pytest.fixture
+def client():
+    from app import create_app
+
+    return create_app(start_background=False).test_client()
+
+
+@pytest.fixture(scope='session')
+def stub_server():
+    server = StubServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def stub_neo(stub_server, monkeypatch):
+    """A fresh NEO client against the stub server, installed as the app's shared client."""
+    from models import providers
+    from models.impact import NEO
+
+    for name, value in stub_server.env().items():
+        monkeypatch.setenv(name, value)
+    neo = NEO()
+    monkeypatch.setattr(providers, '_neo', neo)
+    monkeypatch.setattr(providers, '_refresher', None)
+    return neo
@@ -0,0 +1,35 @@
+import os
+
+# Gunicorn settings for the Flask app:  gunicorn -c gunicorn.conf.py
+# - Preload/fork mode (GUNICORN_PRELOAD=1, the default): the master imports the app and loads the
+#   read-only data once (models.providers.preload: model modules, water index, water cache prewarm,
+#   NEO snapshots) before forking, so workers start in milliseconds and share that memory
+#   copy-on-write. Each worker then starts its own feed refresher, since threads do not survive fork.
+# - GUNICORN_PRELOAD=0 has every worker import and load everything itself (needed for code reload).
+# - python -m bench.startup measures import time and per-worker memory for both modes.
+# - The feed refresher is on by default when serving (FEED_REFRESH_ENABLED=0 turns it off); it is
+#   off by default everywhere else (tests, scripts).
+
+os.environ.setdefault('FEED_REFRESH_ENABLED', '1')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1').lower() not in ('0', 'false', 'no')
+# background threads are started per worker in post_fork
+wsgi_app = 'app:create_app(start_background=False)'
+
+
+def when_ready(server):
+    if preload_app:
+        from models import providers
+
+        timings = providers.preload()
+        server.log.info('preloaded shared data: %s',
+                        ', '.join(f'{name} {seconds * 1000:.0f} ms' for name, seconds in timings.items()))
+
+
+def post_fork(server, worker):
+    from models import providers
+
+    providers.start_background()
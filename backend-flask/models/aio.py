@@ -0,0 +1,99 @@
+import asyncio
+import os
+from urllib.parse import urlsplit
+
+import httpx
+
+# Shared non-blocking HTTP client for the async serving path (see asgi.py)
+# - One pooled httpx.AsyncClient per event loop, so keep-alive connections are reused across
+#   requests while hundreds of lookups are in flight.
+# - A per-host semaphore caps concurrent requests to each upstream so a burst of slow shoreline
+#   lookups cannot flood (or get us banned by) any single provider.
+# - Transient failures (429/5xx, connection errors) are retried with exponential backoff,
+#   honouring Retry-After, mirroring the retry policy of the synchronous NEO session.
+
+MAX_CONNECTIONS = int(os.getenv('ASYNC_MAX_CONNECTIONS', '200'))
+DEFAULT_HOST_CONCURRENCY = int(os.getenv('ASYNC_HOST_CONCURRENCY', '16'))
+HOST_CONCURRENCY = {
+    'nominatim.openstreetmap.org': 2,
+    'overpass-api.de': 4,
+    'api.nasa.gov': 8,
+}
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 3
+BACKOFF_S = 0.5
+
+_clients = {}
+_semaphores = {}
+
+
+def _reset_after_fork():
+    # clients and semaphores are bound to the parent's event loops
+    _clients.clear()
+    _semaphores.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_client():
+    """Return the pooled AsyncClient for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS // 4)
+        client = httpx.AsyncClient(limits=limits, follow_redirects=True)
+        _clients[loop] = client
+    return client
+
+
+def _host_semaphore(url):
+    loop = asyncio.get_running_loop()
+    host = urlsplit(url).hostname or ''
+    key = (loop, host)
+    sem = _semaphores.get(key)
+    if sem is None:
+        sem = _semaphores[key] = asyncio.Semaphore(HOST_CONCURRENCY.get(host, DEFAULT_HOST_CONCURRENCY))
+    return sem
+
+
+async def request(method, url, retries=MAX_RETRIES, **kwargs):
+    """Send a request through the shared client, limited per host and retried on transient errors.
+
+    Returns the httpx.Response after raise_for_status(); raises httpx.HTTPError on failure.
+    """
+    attempt = 0
+    while True:
+        try:
+            async with _host_semaphore(url):
+                response = await get_client().request(method, url, **kwargs)
+            if response.status_code in RETRY_STATUSES and attempt < retries:
+                delay = BACKOFF_S * (2 ** attempt)
+                retry_after = response.headers.get('Retry-After')
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            response.raise_for_status()
+            return response
+        except httpx.TransportError:
+            if attempt >= retries:
+                raise
+            await asyncio.sleep(BACKOFF_S * (2 ** attempt))
+            attempt += 1
+
+
+async def get(url, **kwargs):
+    return await request('GET', url, **kwargs)
+
+
+async def post(url, **kwargs):
+    return await request('POST', url, **kwargs)
+
+
+async def close():
+    """Close the client bound to the running loop (call on application shutdown)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,401 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from models import metrics
+
+# Small caching building blocks shared by the models
+# - LRUCache: bounded in-process map with least-recently-used eviction
+# - SQLiteStore: optional on-disk tier that survives restarts (JSON-serializable values only);
+#   writes periodically sweep expired rows and trim the table to max_rows, oldest first
+# - SingleFlight: collapses concurrent loads of the same key into one call
+#   (AsyncSingleFlight does the same for coroutines on one event loop)
+# - TieredCache: LRU + SQLite with per-key TTLs and stale-while-revalidate
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache bounded by entry count."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+                return self._data[key]
+            except KeyError:
+                return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class SQLiteStore:
+    """Key/value store in a single SQLite table. Values are stored as JSON with a timestamp.
+
+    Rows written with an expires_at are deleted once it has passed, and max_rows (None = unbounded)
+    caps the table by dropping the oldest rows. Both run as a sweep every sweep_every writes, so the
+    table can briefly exceed max_rows by up to that many rows.
+    """
+
+    def __init__(self, path, table='cache', max_rows=None, sweep_every=256):
+        self.path = path
+        self.table = table
+        self.max_rows = max_rows
+        self.sweep_every = sweep_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        _stores.add(self)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {table} '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, expires_at REAL)'
+            )
+            columns = {row[1] for row in self._conn.execute(f'PRAGMA table_info({table})')}
+            if 'expires_at' not in columns:
+                # tables written before expiry was tracked; their rows are only trimmed by max_rows
+                self._conn.execute(f'ALTER TABLE {table} ADD COLUMN expires_at REAL')
+            self._conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_expires_at ON {table} (expires_at)')
+            self._conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_stored_at ON {table} (stored_at)')
+
+    def get(self, key):
+        """Return (value, stored_at) or None."""
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT value, stored_at FROM {self.table} WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, stored_at=None, expires_at=None):
+        """Store value; expires_at (same clock as stored_at) lets a later sweep delete the row."""
+        stored_at = time.time() if stored_at is None else stored_at
+        payload = json.dumps(value)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)',
+                (key, payload, stored_at, expires_at),
+            )
+            self._writes += 1
+            due = self._writes % self.sweep_every == 0
+        if due:
+            self.sweep(now=stored_at)
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+
+    def sweep(self, now=None):
+        """Delete rows whose expires_at is before now, then the oldest rows beyond max_rows.
+
+        Returns the number of rows deleted.
+        """
+        now = time.time() if now is None else now
+        with self._lock, self._conn:
+            deleted = self._conn.execute(
+                f'DELETE FROM {self.table} WHERE expires_at < ?', (now,)
+            ).rowcount
+            if self.max_rows is not None:
+                excess = self._conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0] - self.max_rows
+                if excess > 0:
+                    deleted += self._conn.execute(
+                        f'DELETE FROM {self.table} WHERE key IN '
+                        f'(SELECT key FROM {self.table} ORDER BY stored_at LIMIT ?)', (excess,)
+                    ).rowcount
+        return deleted
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _reopen(self):
+        # A SQLite connection must not be used across fork(); the child opens its own
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+
+
+_stores = weakref.WeakSet()
+
+
+def _reopen_stores_after_fork():
+    for store in list(_stores):
+        store._reopen()
+
+
+os.register_at_fork(after_in_child=_reopen_stores_after_fork)
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers wait for and share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Return (result, shared) where shared is True if another caller did the work."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'event': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+
+        if not leader:
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result'], True
+
+        try:
+            call['result'] = fn()
+        except BaseException as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call['event'].set()
+        return call['result'], False
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines: concurrent awaiters of one key on the same loop share a task."""
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, fn):
+        """Await fn() once per key; returns (result, shared) like SingleFlight.do."""
+        loop = asyncio.get_running_loop()
+        task = self._tasks.get((loop, key))
+        shared = task is not None
+        if not shared:
+            task = loop.create_task(fn())
+            self._tasks[(loop, key)] = task
+            task.add_done_callback(lambda t, k=(loop, key): self._tasks.pop(k, None))
+        # shield: one cancelled awaiter must not cancel the load for everyone else
+        return await asyncio.shield(task), shared
+
+    def in_flight(self, key):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return (loop, key) in self._tasks
+
+
+# TieredCache stat name -> result label of the exported lookup counter
+LOOKUP_RESULTS = {'hits': 'hit', 'disk_hits': 'disk_hit', 'stale_hits': 'stale', 'misses': 'miss'}
+
+
+class TieredCache:
+    """Two-tier (memory LRU + optional SQLite) cache with TTLs and stale-while-revalidate.
+
+    - ttl: seconds an entry is fresh, or a callable key -> seconds so TTLs can vary per key
+    - stale_ttl: extra seconds an expired entry may still be served while a background refresh runs
+    - path: SQLite file for the persistent tier (None keeps the cache in memory only)
+    - max_rows: row limit of the persistent tier; rows past their TTL + stale_ttl are swept from it
+    - name: label for the lookup counters exported by models.metrics
+
+    Keys must be strings. Loader exceptions propagate to the caller and are never cached.
+    get() takes a plain loader; aget() is the same lookup for coroutine loaders on the async path.
+    """
+
+    def __init__(self, maxsize=128, path=None, ttl=3600.0, stale_ttl=0.0, clock=time.time, name='tiered',
+                 max_rows=None):
+        self.name = name
+        self.memory = LRUCache(maxsize)
+        self.store = SQLiteStore(path, max_rows=max_rows) if path else None
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self._flight = SingleFlight()
+        self._aflight = AsyncSingleFlight()
+        self._refresh_tasks = set()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'disk_hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'shared_loads': 0,
+            'refreshes': 0,
+            'refresh_errors': 0,
+        }
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+        if name in LOOKUP_RESULTS:
+            metrics.count_cache(self.name, LOOKUP_RESULTS[name])
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['entries'] = len(self.memory)
+        stats['persistent'] = self.store is not None
+        return stats
+
+    def _ttl_for(self, key):
+        return self.ttl(key) if callable(self.ttl) else self.ttl
+
+    def _lookup(self, key):
+        """Return (value, stored_at, tier) from memory or disk, or None."""
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry[0], entry[1], 'memory'
+        if self.store is not None:
+            row = self.store.get(key)
+            if row is not None:
+                self.memory.set(key, row)
+                return row[0], row[1], 'disk'
+        return None
+
+    def _load(self, key, loader):
+        def run():
+            value = loader()
+            self.put(key, value)
+            return value
+
+        value, shared = self._flight.do(key, run)
+        if shared:
+            self._count('shared_loads')
+        return value
+
+    def _refresh_in_background(self, key, loader):
+        if self._flight.in_flight(key):
+            return
+
+        def run():
+            try:
+                self._load(key, loader)
+                self._count('refreshes')
+            except Exception:
+                self._count('refresh_errors')
+
+        threading.Thread(target=run, name=f'cache-refresh-{key}', daemon=True).start()
+
+    def put(self, key, value, stored_at=None):
+        stored_at = self.clock() if stored_at is None else stored_at
+        self.memory.set(key, (value, stored_at))
+        if self.store is not None:
+            self.store.set(key, value, stored_at, expires_at=stored_at + self._ttl_for(key) + self.stale_ttl)
+
+    def age(self, key):
+        """Seconds since key was stored, or None when it is not cached."""
+        found = self._lookup(key)
+        return None if found is None else self.clock() - found[1]
+
+    def reload(self, key, loader):
+        """Call loader() and store the result regardless of the cached entry's age (used to refresh ahead)."""
+        value = self._load(key, loader)
+        self._count('refreshes')
+        return value
+
+    def invalidate(self, key):
+        self.memory.pop(key)
+        if self.store is not None:
+            self.store.delete(key)
+
+    def get(self, key, loader):
+        """Return the cached value for key, calling loader() on a miss or once the entry is too old."""
+        found = self._lookup(key)
+        if found is not None:
+            value, stored_at, tier = found
+            age = self.clock() - stored_at
+            ttl = self._ttl_for(key)
+            if age <= ttl:
+                self._count('disk_hits' if tier == 'disk' else 'hits')
+                return value
+            if age <= ttl + self.stale_ttl:
+                self._count('stale_hits')
+                self._refresh_in_background(key, loader)
+                return value
+
+        self._count('misses')
+        return self._load(key, loader)
+
+    async def _aload(self, key, loader):
+        async def run():
+            value = await loader()
+            self.put(key, value)
+            return value
+
+        value, shared = await self._aflight.do(key, run)
+        if shared:
+            self._count('shared_loads')
+        return value
+
+    def _arefresh_in_background(self, key, loader):
+        if self._aflight.in_flight(key):
+            return
+
+        async def run():
+            try:
+                await self._aload(key, loader)
+                self._count('refreshes')
+            except Exception:
+                self._count('refresh_errors')
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._refresh_tasks.add(task)  # keep a reference until it finishes
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def aget(self, key, loader):
+        """Async get(): loader is a coroutine function, awaited on a miss or once the entry is too old."""
+        found = self._lookup(key)
+        if found is not None:
+            value, stored_at, tier = found
+            age = self.clock() - stored_at
+            ttl = self._ttl_for(key)
+            if age <= ttl:
+                self._count('disk_hits' if tier == 'disk' else 'hits')
+                return value
+            if age <= ttl + self.stale_ttl:
+                self._count('stale_hits')
+                self._arefresh_in_background(key, loader)
+                return value
+
+        self._count('misses')
+        return await self._aload(key, loader)
@@ -0,0 +1,264 @@
+import math
+
+import numpy as np
+
+from models import metrics
+from models.deflection import asteroid_mass_from_diameter
+
+# Multi-impactor kinetic deflection campaign optimizer
+# Assumptions and notes (same simplified physics as models.deflection):
+# - A campaign is N identical launches of one vehicle type, all launched on the same day, cruising
+#   cruise_days and hitting the asteroid at impactor_velocity_m_s relative velocity.
+# - Each launch delivers the vehicle's payload_kg at REFERENCE_IMPACTOR_VELOCITY_M_S. Faster
+#   arrivals need extra kick-stage delta-v, which costs mass by the rocket equation
+#   (exhaust velocity KICK_STAGE_ISP_S * g0).
+# - Achieved deflection: delta_v = N * m_impactor * v_impactor * beta / m_asteroid, and the miss
+#   distance is delta_v * lead_time (the linear model of required_delta_v_to_shift), where lead
+#   time = warning_time - launch_day - cruise_days. Launches before a vehicle's ready_days, or
+#   arriving after the encounter, are infeasible.
+# - Candidates are the Cartesian product vehicle x launches (1..max_launches) x launch_day x
+#   impactor velocity, laid out so each (vehicle, launches) group is one contiguous block.
+#   Cost and launch count are constant within a group, so only the group's largest miss
+#   distance can be on the Pareto front: groups are evaluated in NumPy blocks, reduced to their
+#   best candidate, and the front is taken over those (vehicles x max_launches points) in one
+#   sweep in cost order. Custom vehicle tables are capped at MAX_VEHICLES entries.
+# - Large searches are split into group ranges on a process pool when one is given (the server
+#   passes models.providers.process_pool()); the result is identical either way.
+
+G0 = 9.80665
+REFERENCE_IMPACTOR_VELOCITY_M_S = 6000.0
+KICK_STAGE_ISP_S = 320.0
+CHUNK_CANDIDATES = 1_000_000
+POOL_MIN_CANDIDATES = 4_000_000
+MAX_CANDIDATES = 50_000_000
+MAX_LAUNCHES = 200
+MAX_AXIS_POINTS = 10_000
+MAX_VEHICLES = 32
+
+# Illustrative launch vehicles: payload per launch (kg, same convention as the /deflect default),
+# list price per launch (USD) and earliest launch (days from now, procurement + integration)
+VEHICLES = {
+    'falcon_9': {'payload_kg': 22_800.0, 'cost_per_launch_usd': 50_000_000.0, 'ready_days': 180.0},
+    'vulcan_centaur': {'payload_kg': 27_200.0, 'cost_per_launch_usd': 110_000_000.0, 'ready_days': 270.0},
+    'falcon_heavy': {'payload_kg': 63_800.0, 'cost_per_launch_usd': 97_000_000.0, 'ready_days': 365.0},
+    'sls_block_1': {'payload_kg': 95_000.0, 'cost_per_launch_usd': 2_000_000_000.0, 'ready_days': 730.0},
+}
+VEHICLE_FIELDS = ('payload_kg', 'cost_per_launch_usd', 'ready_days')
+
+DEFAULT_LAUNCH_DAY_POINTS = 200
+DEFAULT_IMPACTOR_VELOCITIES = {'start': 3000.0, 'stop': 15000.0, 'num': 25}
+
+
+def resolve_vehicles(vehicles=None):
+    """Vehicle table for a search: None (all of VEHICLES), a list of names, or {name: spec}.
+
+    Specs may override or extend VEHICLES; missing fields fall back to the named table entry,
+    and ready_days defaults to 0 for new vehicles.
+    """
+    if vehicles is None:
+        return {name: dict(spec) for name, spec in VEHICLES.items()}
+    if len(vehicles) > MAX_VEHICLES:
+        raise ValueError(f"At most {MAX_VEHICLES} vehicles can be searched at once")
+    if isinstance(vehicles, (list, tuple)):
+        unknown = [name for name in vehicles if name not in VEHICLES]
+        if unknown:
+            raise ValueError(f"Unknown vehicles: {', '.join(unknown)}")
+        return {name: dict(VEHICLES[name]) for name in vehicles}
+    table = {}
+    for name, spec in dict(vehicles).items():
+        merged = {'ready_days': 0.0, **VEHICLES.get(name, {}), **(spec or {})}
+        missing = [f for f in VEHICLE_FIELDS if f not in merged]
+        if missing:
+            raise ValueError(f"Vehicle {name!r} is missing {', '.join(missing)}")
+        unknown = set(merged) - set(VEHICLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown vehicle fields: {', '.join(sorted(unknown))}")
+        table[name] = {f: float(merged[f]) for f in VEHICLE_FIELDS}
+        if table[name]['payload_kg'] <= 0 or table[name]['cost_per_launch_usd'] < 0:
+            raise ValueError(f"Vehicle {name!r} needs a positive payload and a non-negative cost")
+    if not table:
+        raise ValueError("At least one vehicle is required")
+    return table
+
+
+def axis_values(spec, name):
+    """A search axis from a number, a list of values, or {"start", "stop", "num"} (inclusive linspace)."""
+    if isinstance(spec, dict):
+        unknown = set(spec) - {'start', 'stop', 'num'}
+        if unknown:
+            raise ValueError(f"Unknown keys for {name}: {', '.join(sorted(unknown))}")
+        num = int(spec.get('num', 50))
+        if num > MAX_AXIS_POINTS:
+            raise ValueError(f"{name} has more than {MAX_AXIS_POINTS} values")
+        values = np.linspace(float(spec['start']), float(spec['stop']), max(num, 0))
+    else:
+        values = np.atleast_1d(np.asarray(spec, dtype=np.float64))
+    if values.ndim != 1 or values.size == 0:
+        raise ValueError(f"{name} must be a non-empty list of values")
+    if values.size > MAX_AXIS_POINTS:
+        raise ValueError(f"{name} has more than {MAX_AXIS_POINTS} values")
+    return values
+
+
+def delivered_mass(payload_kg, impactor_velocity_m_s):
+    """Impactor mass delivered per launch at the given arrival velocity (rocket-equation penalty)."""
+    extra_dv = np.maximum(0.0, impactor_velocity_m_s - REFERENCE_IMPACTOR_VELOCITY_M_S)
+    return payload_kg * np.exp(-extra_dv / (KICK_STAGE_ISP_S * G0))
+
+
+def _evaluate_groups(search, group_start, group_stop):
+    """Best (miss distance, within-group index) for each (vehicle, launches) group in the range."""
+    n_launches = search['max_launches']
+    groups = np.arange(group_start, group_stop)
+    vehicle = groups // n_launches
+    launches = (groups % n_launches + 1).astype(np.float64)[:, None, None]
+    payload = search['payload_kg'][vehicle][:, None, None]
+    ready = search['ready_days'][vehicle][:, None, None]
+    days = search['launch_days'][None, :, None]
+    velocity = search['impactor_velocity_m_s'][None, None, :]
+
+    lead_time_s = (search['warning_time_days'] - days - search['cruise_days']) * 86400.0
+    delta_v = launches * delivered_mass(payload, velocity) * velocity * search['beta'] / search['asteroid_mass_kg']
+    miss = np.where((lead_time_s > 0) & (days >= ready), delta_v * lead_time_s, -np.inf)
+
+    flat = miss.reshape(len(groups), -1)
+    best = flat.argmax(axis=1)
+    return flat[np.arange(len(groups)), best], best
+
+
+def pareto_mask(cost, launches, miss):
+    """True where no other point has lower-or-equal cost and launches and higher-or-equal miss
+    distance, and is strictly better in at least one of them.
+
+    Points are swept in (cost, launches, -miss) order, so every possible dominator of a point is
+    visited before it; best[r] holds the largest miss distance seen so far among points with at
+    most the r-th smallest launch count. Identical points do not dominate each other, so each is
+    only added to best once its run of duplicates has been checked.
+    """
+    c, n, m = (np.asarray(a, dtype=np.float64) for a in (cost, launches, miss))
+    levels, rank = np.unique(n, return_inverse=True)
+    best = np.full(levels.size, np.nan)
+    mask = np.zeros(c.size, dtype=bool)
+    previous = None
+    for k in np.lexsort((-m, n, c)):
+        if previous is not None and (c[k], n[k], m[k]) != (c[previous], n[previous], m[previous]):
+            r = rank[previous]
+            best[r:] = np.fmax(best[r:], m[previous])
+        mask[k] = not best[rank[k]] >= m[k]
+        previous = k
+    return mask
+
+
+@metrics.timed()
+def optimize_campaign(diameter_m, warning_time_days, density_kg_m3=2700, beta=1.0,
+                      distance_shift_m=6400000, cruise_days=180.0, vehicles=None, max_launches=50,
+                      launch_days=None, impactor_velocity_m_s=None, pool=None):
+    """Search launch day, vehicle, launch count and impactor velocity for Pareto-optimal campaigns.
+
+    Inputs:
+    - diameter_m, density_kg_m3, beta: asteroid and momentum transfer, as in estimate_deflection
+    - warning_time_days: days from now until the predicted impact
+    - distance_shift_m: miss distance that counts as a successful deflection (default ~Earth radius)
+    - cruise_days: transfer time from launch to impact on the asteroid
+    - vehicles: see resolve_vehicles; max_launches: 1..MAX_LAUNCHES launches per campaign
+    - launch_days, impactor_velocity_m_s: search axes (see axis_values). launch_days defaults to
+      DEFAULT_LAUNCH_DAY_POINTS days spread over the launch window (0 .. warning - cruise)
+    - pool: an Executor to evaluate large searches on; None evaluates inline
+
+    Returns the Pareto front (minimum cost, minimum launches, maximum miss distance) sorted by cost,
+    the cheapest campaign reaching distance_shift_m (or None), and search statistics.
+    """
+    warning_time_days = float(warning_time_days)
+    cruise_days = float(cruise_days)
+    if warning_time_days <= 0 or cruise_days < 0:
+        raise ValueError("warning_time_days must be positive and cruise_days non-negative")
+    max_launches = int(max_launches)
+    if not 1 <= max_launches <= MAX_LAUNCHES:
+        raise ValueError(f"max_launches must be between 1 and {MAX_LAUNCHES}")
+    if float(diameter_m) <= 0 or float(density_kg_m3) <= 0:
+        raise ValueError("diameter_m and density_kg_m3 must be positive")
+
+    table = resolve_vehicles(vehicles)
+    names = list(table)
+    if launch_days is None:
+        launch_days = {'start': 0.0, 'stop': max(warning_time_days - cruise_days, 0.0),
+                       'num': DEFAULT_LAUNCH_DAY_POINTS}
+    search = {
+        'max_launches': max_launches,
+        'payload_kg': np.array([table[n]['payload_kg'] for n in names]),
+        'ready_days': np.array([table[n]['ready_days'] for n in names]),
+        'launch_days': axis_values(launch_days, 'launch_days'),
+        'impactor_velocity_m_s': axis_values(
+            DEFAULT_IMPACTOR_VELOCITIES if impactor_velocity_m_s is None else impactor_velocity_m_s,
+            'impactor_velocity_m_s'),
+        'warning_time_days': warning_time_days,
+        'cruise_days': cruise_days,
+        'beta': float(beta),
+        'asteroid_mass_kg': asteroid_mass_from_diameter(float(diameter_m), float(density_kg_m3)),
+    }
+    per_group = search['launch_days'].size * search['impactor_velocity_m_s'].size
+    n_groups = len(names) * max_launches
+    n_candidates = n_groups * per_group
+    if n_candidates > MAX_CANDIDATES:
+        raise ValueError(f"Search has {n_candidates} candidates; the maximum is {MAX_CANDIDATES}")
+
+    step = max(1, CHUNK_CANDIDATES // per_group)
+    ranges = [(g, min(g + step, n_groups)) for g in range(0, n_groups, step)]
+    if pool is not None and len(ranges) > 1 and n_candidates >= POOL_MIN_CANDIDATES:
+        parts = list(pool.map(_evaluate_groups, [search] * len(ranges), *zip(*ranges)))
+    else:
+        parts = [_evaluate_groups(search, g0, g1) for g0, g1 in ranges]
+    best_miss = np.concatenate([p[0] for p in parts])
+    best_index = np.concatenate([p[1] for p in parts])
+
+    groups = np.flatnonzero(np.isfinite(best_miss))
+    vehicle = groups // max_launches
+    launches = groups % max_launches + 1
+    cost_per_launch = np.array([table[n]['cost_per_launch_usd'] for n in names])
+    cost = launches * cost_per_launch[vehicle]
+    front = groups[pareto_mask(cost, launches, best_miss[groups])]
+
+    campaigns = [_campaign(search, names, table, int(g), int(best_index[g]), float(best_miss[g]),
+                           float(distance_shift_m)) for g in front]
+    campaigns.sort(key=lambda c: (c['estimated_cost_usd'], c['launches'], -c['miss_distance_m']))
+    successful = [c for c in campaigns if c['deflects']]
+    return {
+        'candidates_evaluated': int(n_candidates),
+        'feasible_groups': int(groups.size),
+        'asteroid_mass_kg': search['asteroid_mass_kg'],
+        'distance_shift_m': float(distance_shift_m),
+        'pareto_front': campaigns,
+        'cheapest_deflection': successful[0] if successful else None,
+        'assumptions': {
+            'reference_impactor_velocity_m_s': REFERENCE_IMPACTOR_VELOCITY_M_S,
+            'kick_stage_isp_s': KICK_STAGE_ISP_S,
+            'cruise_days': cruise_days,
+            'beta': search['beta'],
+            'vehicles': table,
+        },
+    }
+
+
+def _campaign(search, names, table, group, index, miss, distance_shift_m):
+    """Describe one candidate (group + index within the group) as a JSON-serializable dict."""
+    max_launches = search['max_launches']
+    name = names[group // max_launches]
+    launches = group % max_launches + 1
+    day_index, velocity_index = divmod(index, search['impactor_velocity_m_s'].size)
+    launch_day = float(search['launch_days'][day_index])
+    velocity = float(search['impactor_velocity_m_s'][velocity_index])
+    impactor_mass = float(delivered_mass(table[name]['payload_kg'], velocity))
+    lead_time_days = search['warning_time_days'] - launch_day - search['cruise_days']
+    delta_v = launches * impactor_mass * velocity * search['beta'] / search['asteroid_mass_kg']
+    return {
+        'vehicle': name,
+        'launches': launches,
+        'launch_day': launch_day,
+        'impactor_velocity_m_s': velocity,
+        'lead_time_days': lead_time_days,
+        'impactor_mass_per_launch_kg': impactor_mass,
+        'delta_v_m_s': delta_v,
+        'miss_distance_m': miss,
+        'estimated_cost_usd': launches * table[name]['cost_per_launch_usd'],
+        'deflects': bool(math.isfinite(miss) and miss >= distance_shift_m),
+    }
@@ -1,5 +1,10 @@
 import math
 
+import numpy as np
+
+from models import metrics
+from models.orbit import required_delta_v_two_body
+
 # Simple kinetic impactor deflection model
 # Assumptions and notes:
 # - Asteroid is roughly spherical with given diameter (m) and density (kg/m^3)
@@ -20,6 +25,7 @@ def required_delta_v_to_shift(distance_to_shift_m, lead_time_s):
 
     This uses a simple kinematic relation: delta_v = distance / lead_time (approximate, assumes
     lateral impulse and linear motion). For small perturbations and long lead times this is fine.
+    See models.orbit.required_delta_v_two_body for the orbit-propagation based alternative.
     """
     if lead_time_s <= 0:
         return float('inf')
@@ -40,13 +46,16 @@ def kinetic_impactor_mass(asteroid_mass, delta_v_needed, impactor_velocity_m_s,
     return (asteroid_mass * delta_v_needed) / (impactor_velocity_m_s * momentum_transfer_coeff)
 
 
+@metrics.timed()
 def estimate_deflection(diameter_m, relative_velocity_m_s, lead_time_days,
                         distance_shift_m=6400000,  # approx Earth radius to ensure miss
                         density_kg_m3=2700,
                         impactor_velocity_m_s=10000,
                         beta=1.0,
                         cost_per_launch_usd=50_000_000,
-                        payload_per_launch_kg=22800):
+                        payload_per_launch_kg=22800,
+                        orbit_elements=None,
+                        encounter_jd=None):
     """Run a full estimate for a kinetic impactor deflection.
 
     Inputs:
@@ -57,6 +66,9 @@ def estimate_deflection(diameter_m, relative_velocity_m_s, lead_time_days,
     - impactor_velocity_m_s: speed of incoming impactor relative to asteroid (m/s)
     - beta: momentum enhancement factor (>1 if ejecta helps)
     - cost_per_launch_usd: cost per rocket launch
+    - orbit_elements: optional element dict (see models.orbit.elements_arrays). When given, the
+      required delta-v comes from two-body propagation of an along-track kick instead of
+      distance / lead_time; encounter_jd defaults to the elements' epoch.
 
     Returns dict with asteroid mass, required delta-v, impactor mass, number of launches, cost.
     """
@@ -66,7 +78,10 @@ def estimate_deflection(diameter_m, relative_velocity_m_s, lead_time_days,
     m_asteroid = asteroid_mass_from_diameter(diameter_m, density_kg_m3)
 
     # delta-v needed (m/s)
-    delta_v = required_delta_v_to_shift(distance_shift_m, lead_time_s)
+    if orbit_elements is not None:
+        delta_v = float(required_delta_v_two_body(orbit_elements, lead_time_s, distance_shift_m, encounter_jd)[0])
+    else:
+        delta_v = required_delta_v_to_shift(distance_shift_m, lead_time_s)
 
     # required impactor mass (kg)
     m_impactor = kinetic_impactor_mass(m_asteroid, delta_v, impactor_velocity_m_s, beta)
@@ -79,7 +94,7 @@ def estimate_deflection(diameter_m, relative_velocity_m_s, lead_time_days,
 
     total_cost = launches * cost_per_launch_usd
 
-    return {
+    result = {
         'asteroid_mass_kg': m_asteroid,
         'required_delta_v_m_s': delta_v,
         'impactor_mass_kg': m_impactor,
@@ -94,3 +109,106 @@ def estimate_deflection(diameter_m, relative_velocity_m_s, lead_time_days,
             'cost_per_launch_usd': cost_per_launch_usd,
         }
     }
+    if orbit_elements is not None:
+        result['assumptions']['delta_v_model'] = 'two_body'
+    return result
+
+
+# Vectorized batch variant
+# - Mirrors estimate_deflection operation-for-operation so each element matches the scalar
+#   path bit-for-bit (np.float_power defers to the same libm pow used by Python's ** operator).
+# - Inputs may be scalars or arrays and are broadcast together.
+
+DEFLECTION_BATCH_PARAMS = (
+    'diameter_m',
+    'relative_velocity_m_s',
+    'lead_time_days',
+    'distance_shift_m',
+    'density_kg_m3',
+    'impactor_velocity_m_s',
+    'beta',
+    'cost_per_launch_usd',
+    'payload_per_launch_kg',
+)
+
+
+@metrics.timed()
+def estimate_deflection_batch(diameter_m, relative_velocity_m_s, lead_time_days,
+                              distance_shift_m=6400000,
+                              density_kg_m3=2700,
+                              impactor_velocity_m_s=10000,
+                              beta=1.0,
+                              cost_per_launch_usd=50_000_000,
+                              payload_per_launch_kg=22800,
+                              required_delta_v_m_s=None):
+    """Vectorized estimate_deflection over NumPy arrays.
+
+    Every argument may be a scalar or an array; all are broadcast to a common shape. Returns a dict
+    of float64 arrays with the same keys as estimate_deflection (minus 'assumptions'). Where the
+    scalar path would produce an infinite impactor mass, launches and cost are inf instead of
+    raising OverflowError. required_delta_v_m_s, if given, replaces distance_shift_m / lead time
+    (e.g. with values from models.orbit.required_delta_v_two_body).
+    """
+    (diameter_m, relative_velocity_m_s, lead_time_days, distance_shift_m, density_kg_m3,
+     impactor_velocity_m_s, beta, cost_per_launch_usd, payload_per_launch_kg) = np.broadcast_arrays(
+        *(np.asarray(a, dtype=np.float64) for a in (
+            diameter_m, relative_velocity_m_s, lead_time_days, distance_shift_m, density_kg_m3,
+            impactor_velocity_m_s, beta, cost_per_launch_usd, payload_per_launch_kg)))
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        lead_time_s = np.maximum(lead_time_days * 24 * 3600.0, 1.0)
+
+        radius = diameter_m / 2.0
+        volume = (4.0/3.0) * math.pi * np.float_power(radius, 3)
+        m_asteroid = density_kg_m3 * volume
+
+        delta_v = distance_shift_m / lead_time_s
+        if required_delta_v_m_s is not None:
+            delta_v = np.broadcast_arrays(np.asarray(required_delta_v_m_s, dtype=np.float64), delta_v)[0]
+
+        valid_impactor = (impactor_velocity_m_s > 0) & (beta > 0)
+        m_impactor = np.where(valid_impactor,
+                              (m_asteroid * delta_v) / (impactor_velocity_m_s * beta),
+                              np.inf)
+        m_impactor = np.maximum(m_impactor, 0.0)
+
+        launches = np.where(payload_per_launch_kg > 0,
+                            np.ceil(m_impactor / payload_per_launch_kg),
+                            np.inf)
+        total_cost = launches * cost_per_launch_usd
+
+    return {
+        'asteroid_mass_kg': m_asteroid,
+        'required_delta_v_m_s': delta_v,
+        'impactor_mass_kg': m_impactor,
+        'launches_required': launches,
+        'estimated_cost_usd': total_cost,
+    }
+
+
+def deflection_parameter_grid(**axes):
+    """Expand per-parameter value lists into a flattened Cartesian grid.
+
+    Example: deflection_parameter_grid(diameter_m=[50, 100], beta=[1, 2, 3]) returns a dict of
+    6-element arrays plus the grid shape, in the order the axes were given.
+    """
+    names = list(axes)
+    values = [np.atleast_1d(np.asarray(axes[n], dtype=np.float64)) for n in names]
+    mesh = np.meshgrid(*values, indexing='ij')
+    shape = tuple(len(v) for v in values)
+    return {n: m.ravel() for n, m in zip(names, mesh)}, shape
+
+
+def iter_deflection_grid(axes, chunk_size=65536):
+    """Yield (offset, {name: values}) slices of deflection_parameter_grid(**axes) in C order.
+
+    Only chunk_size grid points are materialized at a time, so arbitrarily large sweeps can be
+    evaluated (and streamed) in constant memory.
+    """
+    names = list(axes)
+    values = [np.atleast_1d(np.asarray(axes[n], dtype=np.float64)) for n in names]
+    shape = tuple(len(v) for v in values)
+    total = int(np.prod(shape)) if shape else 0
+    for start in range(0, total, chunk_size):
+        coords = np.unravel_index(np.arange(start, min(total, start + chunk_size)), shape)
+        yield start, {n: v[c] for n, v, c in zip(names, values, coords)}
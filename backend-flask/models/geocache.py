@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import time
+
+from models import metrics
+from models.cache import LRUCache, SQLiteStore
+
+# Spatial result cache for the water/land classification providers
+# - Coordinates are quantized to geohash cells; precision 7 (~150 m x 150 m) by default, so clicks
+#   a few meters apart share an entry.
+# - Each entry stores is_water, elevation_m and the provider that produced it ("provenance").
+# - Entries are namespaced by kind ("water", "osm", "overpass:200", "elevation", ...) so each
+#   provider can cache its own answers in the same store.
+# - Memory tier is a bounded LRU; an optional SQLite file keeps entries across restarts, and
+#   prewarm() loads known cells (e.g. coastlines, oceans) from an NDJSON file. Cells are keyed by
+#   where clients click, so the SQLite tier is capped at max_rows (oldest entries dropped first).
+# - Prewarmed cells coarser than the cache precision (e.g. a whole ocean cell "dr5") go into a
+#   prefix table that lookups fall back to after an exact-cell miss; the longest prefix wins.
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+DEFAULT_PRECISION = 7
+
+
+def geohash_encode(lat, lon, precision=DEFAULT_PRECISION):
+    """Return the geohash string of the cell containing lat/lon."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value = (value << 1) | 1
+                lon_lo = mid
+            else:
+                value <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+class WaterCache:
+    """Geohash-keyed cache of water/land and elevation answers with optional SQLite persistence."""
+
+    def __init__(self, precision=DEFAULT_PRECISION, maxsize=100_000, path=None, max_rows=None):
+        self.precision = precision
+        self.memory = LRUCache(maxsize)
+        self.store = SQLiteStore(path, table='water_cells', max_rows=max_rows) if path else None
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'disk_hits': 0, 'prefix_hits': 0, 'misses': 0, 'stores': 0}
+        self._prefixes = {}
+        self._prefix_lengths = ()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def key(self, kind, lat, lon):
+        return f'{kind}:{geohash_encode(float(lat), float(lon), self.precision)}'
+
+    def get(self, kind, lat, lon):
+        """Return the cached entry dict for the cell containing lat/lon, or None."""
+        cell = geohash_encode(float(lat), float(lon), self.precision)
+        key = f'{kind}:{cell}'
+        entry = self.memory.get(key)
+        name = 'geo:' + kind.split(':', 1)[0]
+        if entry is not None:
+            self._count('hits')
+            metrics.count_cache(name, 'hit')
+            return entry
+        if self.store is not None:
+            row = self.store.get(key)
+            if row is not None:
+                self.memory.set(key, row[0])
+                self._count('disk_hits')
+                metrics.count_cache(name, 'disk_hit')
+                return row[0]
+        for length in self._prefix_lengths:
+            entry = self._prefixes.get(f'{kind}:{cell[:length]}')
+            if entry is not None:
+                self._count('prefix_hits')
+                metrics.count_cache(name, 'prefix_hit')
+                return entry
+        self._count('misses')
+        metrics.count_cache(name, 'miss')
+        return None
+
+    def put(self, kind, lat, lon, is_water=None, elevation_m=None, provenance=None):
+        entry = {
+            'is_water': is_water,
+            'elevation_m': elevation_m,
+            'provenance': provenance,
+            'stored_at': time.time(),
+        }
+        key = self.key(kind, lat, lon)
+        self.memory.set(key, entry)
+        if self.store is not None:
+            self.store.set(key, entry, entry['stored_at'])
+        self._count('stores')
+        return entry
+
+    def prewarm(self, path, kind='water'):
+        """Load cells from an NDJSON file; returns the number of entries loaded.
+
+        Each line is an object with either "lat"/"lon" or "geohash", plus "is_water" and optional
+        "elevation_m", "provenance" and "kind" (defaults to the kind argument). Geohashes shorter
+        than the cache precision cover every cell under them (see the prefix table above).
+        """
+        loaded = 0
+        prefixes = dict(self._prefixes)
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                rec = json.loads(line)
+                entry = {
+                    'is_water': rec.get('is_water'),
+                    'elevation_m': rec.get('elevation_m'),
+                    'provenance': rec.get('provenance', 'prewarm'),
+                    'stored_at': time.time(),
+                }
+                rec_kind = rec.get('kind', kind)
+                if 'geohash' in rec and len(rec['geohash']) < self.precision:
+                    prefixes[f"{rec_kind}:{rec['geohash']}"] = entry
+                    loaded += 1
+                    continue
+                if 'geohash' in rec:
+                    key = f"{rec_kind}:{rec['geohash'][:self.precision]}"
+                else:
+                    key = self.key(rec_kind, rec['lat'], rec['lon'])
+                self.memory.set(key, entry)
+                loaded += 1
+        self._prefixes = prefixes
+        self._prefix_lengths = tuple(sorted({len(k.split(':')[-1]) for k in prefixes}, reverse=True))
+        return loaded
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['entries'] = len(self.memory)
+        stats['prefix_cells'] = len(self._prefixes)
+        stats['precision'] = self.precision
+        stats['persistent'] = self.store is not None
+        return stats
+
+
+_water_cache = None
+_water_cache_lock = threading.Lock()
+
+
+def get_water_cache():
+    """Return the process-wide WaterCache, configured from the environment on first use.
+
+    WATER_CACHE_PRECISION (geohash length), WATER_CACHE_SIZE (LRU entries), WATER_CACHE_PATH
+    (SQLite file), WATER_CACHE_MAX_ROWS (SQLite rows) and WATER_CACHE_PREWARM (NDJSON file) are
+    all optional.
+    """
+    global _water_cache
+    if _water_cache is None:
+        with _water_cache_lock:
+            if _water_cache is None:
+                cache = WaterCache(
+                    precision=int(os.getenv('WATER_CACHE_PRECISION', str(DEFAULT_PRECISION))),
+                    maxsize=int(os.getenv('WATER_CACHE_SIZE', '100000')),
+                    path=os.getenv('WATER_CACHE_PATH') or None,
+                    max_rows=int(os.getenv('WATER_CACHE_MAX_ROWS', '1000000')),
+                )
+                prewarm = os.getenv('WATER_CACHE_PREWARM')
+                if prewarm:
+                    cache.prewarm(prewarm)
+                _water_cache = cache
+    return _water_cache
+
+
+def set_water_cache(cache):
+    """Install (or reset with None) the process-wide WaterCache."""
+    global _water_cache
+    _water_cache = cache
@@ -1,52 +1,406 @@
 
+import asyncio
 import os
+import threading
+import time
+import weakref
 import requests
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from models import metrics, outbound
+from models.cache import AsyncSingleFlight, LRUCache, SingleFlight, TieredCache
+from models.neo_index import NEOIndex
+
+# Feed cache TTLs (seconds). Approach data for past days is settled; data for today and
+# upcoming days is refined as new observations come in, so it expires sooner.
+PAST_DAY_TTL_S = 7 * 24 * 3600
+TODAY_TTL_S = 3600
+FUTURE_DAY_TTL_S = 6 * 3600
+STALE_TTL_S = 24 * 3600
+# Orbit solutions from the lookup endpoint change only when new observations are fitted
+LOOKUP_TTL_S = 24 * 3600
+
+# The feed rejects windows where end_date - start_date exceeds 7 days, so longer ranges are
+# split into chunks of at most this span and fetched concurrently.
+FEED_MAX_SPAN_DAYS = 7
+MAX_RANGE_DAYS = 366
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def feed_ttl_seconds(start_date, end_date, today=None):
+    """Return the cache TTL for a feed window: the shortest TTL of any day it covers."""
+    today = today or date.today()
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    if end < today:
+        return PAST_DAY_TTL_S
+    if start <= today:
+        return TODAY_TTL_S
+    return FUTURE_DAY_TTL_S
+
+
+def _feed_cache_key(start_date, end_date):
+    return f"{start_date}:{end_date}"
+
+
+def _ttl_for_key(key):
+    if key.startswith("neo:"):
+        return LOOKUP_TTL_S
+    start_date, end_date = key.split(":")
+    return feed_ttl_seconds(start_date, end_date)
+
+
+def split_date_range(start_date, end_date, max_span_days=FEED_MAX_SPAN_DAYS):
+    """Split an inclusive YYYY-MM-DD range into consecutive feed-sized (start, end) windows."""
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    if end < start:
+        raise ValueError("end_date must not be before start_date")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise ValueError(f"Date range must be shorter than {MAX_RANGE_DAYS} days")
+
+    chunks = []
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=max_span_days), end)
+        chunks.append((chunk_start.isoformat(), chunk_end.isoformat()))
+        chunk_start = chunk_end + timedelta(days=1)
+    return chunks
+
+
+def merge_neos(chunks):
+    """Concatenate per-window NEO lists, keeping the first record seen for each NEO id."""
+    seen = set()
+    merged = []
+    for neos in chunks:
+        for neo in neos:
+            if neo["id"] in seen:
+                continue
+            seen.add(neo["id"])
+            merged.append(neo)
+    return merged
+
+
+def parse_feed(data):
+    """Flatten a NeoWs feed response into the list of NEO records served by /neo."""
+    neos = []
+    for day in data["near_earth_objects"]:
+        for neo in data["near_earth_objects"][day]:
+            # Pull primary close approach data (first entry)
+            cad = neo.get("close_approach_data", [])
+            cad0 = cad[0] if cad else {}
+            neos.append({
+                "name": neo["name"],
+                "id": neo["id"],
+                "estimated_diameter_km": neo["estimated_diameter"]["kilometers"],
+                "relative_velocity_kps": cad0.get("relative_velocity", {}).get("kilometers_per_second"),
+                "miss_distance_km": cad0.get("miss_distance", {}).get("kilometers"),
+                "absolute_magnitude": neo["absolute_magnitude_h"],
+                # include close approach date fields so frontend can compute lead time
+                "close_approach_date": cad0.get("close_approach_date"),
+                "close_approach_date_full": cad0.get("close_approach_date_full")
+            })
+    return neos
+
+
+def _neo_details(data):
+    return {
+        "id": data.get("id"),
+        "name": data.get("name"),
+        "orbital_data": data.get("orbital_data"),
+        "close_approach_data": data.get("close_approach_data", []),
+    }
+
+
+def _make_session(pool_size):
+    retry = Retry(
+        total=4,
+        backoff_factor=0.5,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# NEO clients in this process; a forked child drops their pooled connections and fetch threads
+_clients = weakref.WeakSet()
+
+
+def _reset_clients_after_fork():
+    for client in list(_clients):
+        client.session.close()
+        client._pool = None
+        client._pool_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_clients_after_fork)
+
 
 class NEO:
-    def __init__(self):
+    def __init__(self, cache=None, timeout=15, max_workers=None):
         self.api_key = os.getenv("NASA_API_KEY")
-        self.api_url = "https://api.nasa.gov/neo/rest/v1/feed"
+        self.api_url = os.getenv("NASA_NEO_FEED_URL", "https://api.nasa.gov/neo/rest/v1/feed")
+        self.lookup_url = os.getenv("NASA_NEO_LOOKUP_URL", "https://api.nasa.gov/neo/rest/v1/neo")
+        self.timeout = timeout
+        self.max_workers = max_workers or int(os.getenv("NEO_FETCH_WORKERS", "16"))
+        self.session = _make_session(self.max_workers)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        if cache is None:
+            cache = TieredCache(
+                maxsize=int(os.getenv("NEO_CACHE_SIZE", "64")),
+                path=os.getenv("NEO_CACHE_PATH") or None,
+                max_rows=int(os.getenv("NEO_CACHE_MAX_ROWS", "2000")),
+                ttl=_ttl_for_key,
+                stale_ttl=STALE_TTL_S,
+                name="neo",
+            )
+        self.cache = cache
+        self._indexes = LRUCache(16)
+        self._index_flight = SingleFlight()
+        self._index_aflight = AsyncSingleFlight()
+        _clients.add(self)
+
+    def get_neos(self, start_date=None, end_date=None, progress=None):
+        """Return the flattened NEO list for an inclusive date range, or None if a fetch failed.
+
+        Ranges longer than one feed window are fetched concurrently in 7-day chunks and merged,
+        deduplicated by NEO id. progress, if given, is called as progress(done, total) after
+        each chunk completes.
+        """
+        start_date, end_date = self.resolve_range(start_date, end_date)
+        chunks = {}
+        try:
+            for chunk_start, _chunk_end, neos, total in self.iter_neo_chunks(start_date, end_date):
+                chunks[chunk_start] = neos
+                if progress:
+                    progress(len(chunks), total)
+        except (requests.exceptions.RequestException, outbound.OutboundError) as e:
+            print(f"Error fetching NEO data: {e}")
+            return None
+        return merge_neos(chunks[k] for k in sorted(chunks))
+
+    def iter_neos(self, start_date=None, end_date=None):
+        """Yield NEO records for the range as each feed window completes (deduplicated by id).
+
+        Records come out in window completion order rather than date order. Raises like
+        iter_neo_chunks.
+        """
+        start_date, end_date = self.resolve_range(start_date, end_date)
+        seen = set()
+        for _chunk_start, _chunk_end, neos, _total in self.iter_neo_chunks(start_date, end_date):
+            for neo in neos:
+                if neo["id"] not in seen:
+                    seen.add(neo["id"])
+                    yield neo
+
+    def get_index(self, start_date=None, end_date=None):
+        """Return a NEOIndex for the range, or None if the feed could not be fetched.
+
+        The index is built once per feed refresh: it is reused until the feed TTL for the range
+        has elapsed, then rebuilt from (possibly cached) feed data.
+        """
+        start_date, end_date = self.resolve_range(start_date, end_date)
+        key = _feed_cache_key(start_date, end_date)
+        index = self._indexes.get(key)
+        if index is not None and time.time() - index.built_at <= feed_ttl_seconds(start_date, end_date):
+            metrics.count_cache("neo_index", "hit")
+            return index
+        metrics.count_cache("neo_index", "miss")
+
+        def build():
+            neos = self.get_neos(start_date, end_date)
+            if neos is None:
+                return None
+            with metrics.span("neo.index_build"):
+                built = NEOIndex(neos)
+            self._indexes.set(key, built)
+            return built
 
-    def get_neos(self, start_date=None, end_date=None):
+        return self._index_flight.do(key, build)[0]
+
+    def prefetch(self, start_date=None, end_date=None, ahead_s=0.0):
+        """Refresh the cached feed windows for the range that are missing or within ahead_s of expiring.
+
+        Used by the background refresher (models.refresher) so requests keep hitting fresh entries.
+        Returns the number of windows fetched; raises like iter_neo_chunks.
+        """
+        start_date, end_date = self.resolve_range(start_date, end_date)
+        fetched = 0
+        for chunk_start, chunk_end in split_date_range(start_date, end_date):
+            key = _feed_cache_key(chunk_start, chunk_end)
+            age = self.cache.age(key)
+            if age is None or age > feed_ttl_seconds(chunk_start, chunk_end) - ahead_s:
+                self.cache.reload(key, lambda s=chunk_start, e=chunk_end: self._fetch_feed(s, e))
+                fetched += 1
+        return fetched
+
+    @staticmethod
+    def resolve_range(start_date=None, end_date=None):
+        """Fill in the default window (today through today + 7 days)."""
         if not start_date:
             start_date = datetime.now().strftime("%Y-%m-%d")
         if not end_date:
-            end_date = (datetime.now() + timedelta(days=7)).strftime("%Y-%m-%d")
+            end_date = (date.fromisoformat(start_date) + timedelta(days=7)).strftime("%Y-%m-%d")
+        return start_date, end_date
+
+    def iter_neo_chunks(self, start_date, end_date):
+        """Yield (chunk_start, chunk_end, neos, total_chunks) for each feed window as it completes.
+
+        Raises the first requests exception encountered; pending chunks are cancelled.
+        """
+        chunks = split_date_range(start_date, end_date)
+        if len(chunks) == 1:
+            chunk_start, chunk_end = chunks[0]
+            yield chunk_start, chunk_end, self._get_chunk(chunk_start, chunk_end), 1
+            return
+
+        pool = self._executor()
+        futures = {pool.submit(metrics.run_in_context(self._get_chunk), s, e): (s, e) for s, e in chunks}
+        try:
+            for future in as_completed(futures):
+                chunk_start, chunk_end = futures[future]
+                yield chunk_start, chunk_end, future.result(), len(chunks)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="neo-fetch")
+            return self._pool
+
+    def _get_chunk(self, start_date, end_date):
+        key = _feed_cache_key(start_date, end_date)
+        return self.cache.get(key, lambda: self._fetch_feed(start_date, end_date))
+
+    def get_neo_details(self, neo_id):
+        """Return orbital_data and close_approach_data for one NEO from the lookup endpoint.
+
+        Raises requests exceptions (or outbound.OutboundError when the API is being skipped) on failure.
+        """
+        url = f"{self.lookup_url}/{neo_id}"
+
+        def fetch():
+            response = self.session.get(url, params={"api_key": self.api_key}, timeout=self.timeout)
+            response.raise_for_status()
+            return _neo_details(response.json())
+
+        return self.cache.get(f"neo:{neo_id}", lambda: outbound.call(
+            url, "lookup", fetch, max_wait=self.timeout, provider="nasa_lookup"))
+
+    # Async counterparts used by the ASGI server (asgi.py). They share the cache and index memo with
+    # the synchronous methods but never block the event loop on network I/O: feed windows are
+    # fetched concurrently through the pooled client in models.aio.
+
+    async def aget_neos(self, start_date=None, end_date=None):
+        """Async get_neos(). Returns None if a fetch failed."""
+        import httpx
+
+        start_date, end_date = self.resolve_range(start_date, end_date)
+        chunks = split_date_range(start_date, end_date)
+        try:
+            results = await asyncio.gather(*(self._aget_chunk(s, e) for s, e in chunks))
+        except (httpx.HTTPError, outbound.OutboundError, ValueError) as e:
+            print(f"Error fetching NEO data: {e}")
+            return None
+        return merge_neos(results)
 
+    async def aiter_neos(self, start_date=None, end_date=None):
+        """Async iter_neos(): an async generator of records, window by window as they complete."""
+        start_date, end_date = self.resolve_range(start_date, end_date)
+        tasks = [asyncio.ensure_future(self._aget_chunk(s, e)) for s, e in split_date_range(start_date, end_date)]
+        seen = set()
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for neo in await next_done:
+                    if neo["id"] not in seen:
+                        seen.add(neo["id"])
+                        yield neo
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def aget_index(self, start_date=None, end_date=None):
+        """Async get_index(). The index build itself is CPU-bound and runs in a worker thread.
+
+        Concurrent cold requests for one range on the event loop share a single fetch and build.
+        """
+        start_date, end_date = self.resolve_range(start_date, end_date)
+        key = _feed_cache_key(start_date, end_date)
+        index = self._indexes.get(key)
+        if index is not None and time.time() - index.built_at <= feed_ttl_seconds(start_date, end_date):
+            metrics.count_cache("neo_index", "hit")
+            return index
+        metrics.count_cache("neo_index", "miss")
+
+        async def build():
+            neos = await self.aget_neos(start_date, end_date)
+            if neos is None:
+                return None
+            with metrics.span("neo.index_build"):
+                built = await asyncio.to_thread(NEOIndex, neos)
+            self._indexes.set(key, built)
+            return built
+
+        return (await self._index_aflight.do(key, build))[0]
+
+    async def aget_neo_details(self, neo_id):
+        """Async get_neo_details(). Raises httpx.HTTPError on failure."""
+        from models import aio
+
+        url = f"{self.lookup_url}/{neo_id}"
+
+        async def fetch():
+            response = await aio.get(url, params={"api_key": self.api_key}, timeout=self.timeout)
+            return _neo_details(response.json())
+
+        return await self.cache.aget(
+            f"neo:{neo_id}", lambda: outbound.acall(url, "lookup", fetch, max_wait=self.timeout, provider="nasa_lookup"))
+
+    async def _aget_chunk(self, start_date, end_date):
+        from models import aio
+
+        async def fetch():
+            params = {"start_date": start_date, "end_date": end_date, "api_key": self.api_key}
+            response = await aio.get(self.api_url, params=params, timeout=self.timeout)
+            return parse_feed(response.json())
+
+        key = _feed_cache_key(start_date, end_date)
+        return await self.cache.aget(key, lambda: outbound.acall(
+            self.api_url, key, fetch, max_wait=self.timeout, provider="nasa_feed"))
+
+    def cache_stats(self):
+        return self.cache.stats()
+
+    def _fetch_feed(self, start_date, end_date):
+        """Fetch and flatten one NeoWs feed window.
+
+        Raises requests exceptions, or outbound.OutboundError when the rate limit or circuit breaker
+        for the API host rejects the call.
+        """
         params = {
             "start_date": start_date,
             "end_date": end_date,
             "api_key": self.api_key,
         }
 
-        try:
-            response = requests.get(self.api_url, params=params)
+        def get():
+            response = self.session.get(self.api_url, params=params, timeout=self.timeout)
             response.raise_for_status()  # Raise an exception for bad status codes
-            data = response.json()
-            
-            neos = []
-            for date in data["near_earth_objects"]:
-                for neo in data["near_earth_objects"][date]:
-                    # Pull primary close approach data (first entry)
-                    cad = neo.get("close_approach_data", [])
-                    cad0 = cad[0] if cad else {}
-                    neos.append({
-                        "name": neo["name"],
-                        "id": neo["id"],
-                        "estimated_diameter_km": neo["estimated_diameter"]["kilometers"],
-                        "relative_velocity_kps": cad0.get("relative_velocity", {}).get("kilometers_per_second"),
-                        "miss_distance_km": cad0.get("miss_distance", {}).get("kilometers"),
-                        "absolute_magnitude": neo["absolute_magnitude_h"],
-                        # include close approach date fields so frontend can compute lead time
-                        "close_approach_date": cad0.get("close_approach_date"),
-                        "close_approach_date_full": cad0.get("close_approach_date_full")
-                    })
-            return neos
-
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching NEO data: {e}")
-            return None
+            return parse_feed(response.json())
+
+        return outbound.call(self.api_url, _feed_cache_key(start_date, end_date), get, max_wait=self.timeout,
+                             provider="nasa_feed")
 
 if __name__ == '__main__':
     neo = NEO()
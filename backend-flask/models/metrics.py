@@ -0,0 +1,360 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Lightweight in-process instrumentation
+# - Spans time a block of code (an outbound call, a model function, a cache load) and record
+#   the duration in a fixed-bucket histogram keyed by span name and labels such as provider,
+#   cache (hit/miss) and outcome (ok/error/...). A span costs about a microsecond.
+# - Counters count discrete events (cache lookups, rejections).
+# - render_prometheus() writes everything in the Prometheus text exposition format (/metrics).
+# - Spans finished inside a request are also summed per name in a context-local collector, which
+#   app.py turns into a Server-Timing header when asked to (wants_server_timing()). Work run on
+#   worker pools is included when submitted through run_in_context().
+# - SamplingProfiler periodically samples every thread's stack and aggregates them in collapsed
+#   ("folded") form for flame graphs; it is off unless PROFILER_ENABLED is set or toggled at runtime.
+#   The /profiler route that toggles it and exposes the stacks is off unless PROFILER_ROUTE_ENABLED
+#   is set. Profiler state is per process: under gunicorn a toggle reaches only the worker that
+#   handled the request.
+# - METRICS_ENABLED=0 turns spans and counters into no-ops.
+
+# Upper bounds in seconds; an implicit +Inf bucket follows
+DEFAULT_BUCKETS_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SPAN_METRIC = 'backend_span_seconds'
+REQUEST_METRIC = 'backend_request_seconds'
+
+_enabled = os.getenv('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+_server_timing_always = os.getenv('SERVER_TIMING', '0').lower() in ('1', 'true', 'yes')
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(value):
+    global _enabled
+    _enabled = bool(value)
+
+
+class Histogram:
+    """Fixed-bucket histogram (non-cumulative counts internally, cumulative when exported)."""
+
+    __slots__ = ('buckets', 'counts', 'total', 'count', '_lock')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS_S):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.total += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.total, self.count
+
+
+class Registry:
+    """Histograms and counters keyed by (metric name, sorted label items)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def histogram(self, name, labels, buckets=DEFAULT_BUCKETS_S):
+        key = (name, labels)
+        h = self._histograms.get(key)
+        if h is None:
+            with self._lock:
+                h = self._histograms.get(key)
+                if h is None:
+                    h = self._histograms[key] = Histogram(buckets)
+        return h
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+        _span_histograms.clear()
+
+    def render(self):
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        lines = []
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f'# HELP {name} {self._help[name]}')
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{_labels(labels)} {value}')
+        for (name, labels), h in histograms:
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f'# HELP {name} {self._help[name]}')
+                lines.append(f'# TYPE {name} histogram')
+            counts, total, count = h.snapshot()
+            cumulative = 0
+            for bound, c in zip(h.buckets + (float('inf'),), counts):
+                cumulative += c
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{_labels(labels + (("le", le),))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {total!r}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(items):
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+registry = Registry()
+registry.describe(SPAN_METRIC, 'Duration of instrumented operations (outbound calls, model functions, cache loads).')
+registry.describe(REQUEST_METRIC, 'HTTP request handling time until the response is returned.')
+registry.describe('backend_cache_lookups_total', 'Cache lookups by cache and result.')
+
+# Per-request span totals: {span name: [seconds, calls]}, or None outside an instrumented request
+_collector = contextvars.ContextVar('metrics_collector', default=None)
+_collector_lock = threading.Lock()
+_span_histograms = {}
+
+
+class Span:
+    """Context manager timing one operation. Labels can be added while it runs via set()."""
+
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.start = 0.0
+
+    def set(self, **labels):
+        self.labels.update(labels)
+        return self
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if not _enabled:
+            return False
+        labels = self.labels
+        if 'outcome' not in labels:
+            labels['outcome'] = 'ok' if exc_type is None else 'error'
+        # Label order is fixed per call site, so the unsorted items make a cheap lookup key
+        fast_key = (self.name, tuple(labels.items()))
+        histogram = _span_histograms.get(fast_key)
+        if histogram is None:
+            histogram = _span_histograms[fast_key] = registry.histogram(
+                SPAN_METRIC, (('span', self.name),) + tuple(sorted(labels.items())))
+        histogram.observe(elapsed)
+        collected = _collector.get()
+        if collected is not None:
+            with _collector_lock:
+                entry = collected.setdefault(self.name, [0.0, 0])
+                entry[0] += elapsed
+                entry[1] += 1
+        return False
+
+
+def span(name, **labels):
+    return Span(name, labels)
+
+
+def timed(name=None, **labels):
+    """Decorator: run the function (or coroutine function) inside span(name or module.qualname, **labels)."""
+    def decorate(fn):
+        span_name = name or f'{fn.__module__.rsplit(".", 1)[-1]}.{fn.__qualname__}'
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with Span(span_name, dict(labels)):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(span_name, dict(labels)):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count_cache(cache, result):
+    """Count a lookup in the named cache; result is 'hit', 'miss', 'stale', ..."""
+    if _enabled:
+        registry.inc('backend_cache_lookups_total', (('cache', cache), ('result', result)))
+
+
+def observe_request(route, method, status, seconds):
+    if _enabled:
+        registry.histogram(REQUEST_METRIC, (('method', method), ('route', route), ('status', str(status)))).observe(
+            seconds)
+
+
+def wants_server_timing(args, header=None):
+    """Server-Timing is sent when SERVER_TIMING is set, or per request with ?server_timing=1 or X-Server-Timing: 1."""
+    return (_server_timing_always or str(args.get('server_timing', '')).lower() in ('1', 'true')
+            or (header or '').strip().lower() in ('1', 'true'))
+
+
+def start_collecting():
+    """Begin collecting span totals for the current request; returns a token for stop_collecting."""
+    return _collector.set({})
+
+
+def collected():
+    """Span totals collected so far in the current request ({} when not collecting)."""
+    with _collector_lock:
+        return {name: list(entry) for name, entry in (_collector.get() or {}).items()}
+
+
+def stop_collecting(token):
+    collected = _collector.get()
+    _collector.reset(token)
+    return collected or {}
+
+
+def run_in_context(fn):
+    """Wrap fn so that, when run on a worker thread, its spans count towards the submitting request."""
+    ctx = contextvars.copy_context()
+    return functools.partial(ctx.run, fn)
+
+
+def server_timing_header(collected, total_s=None):
+    """Format collected span totals (and the request total) as a Server-Timing header value."""
+    parts = []
+    for name, (seconds, calls) in sorted(collected.items(), key=lambda kv: -kv[1][0]):
+        token = ''.join(ch if ch.isalnum() or ch in '._-' else '_' for ch in name)
+        parts.append(f'{token};dur={seconds * 1000:.2f};desc="{calls}x"')
+    if total_s is not None:
+        parts.append(f'total;dur={total_s * 1000:.2f}')
+    return ', '.join(parts)
+
+
+def render_prometheus(extra=()):
+    """Prometheus text exposition of all metrics, followed by any extra pre-rendered lines."""
+    text = registry.render()
+    if extra:
+        text += '\n'.join(extra) + '\n'
+    return text
+
+
+# Shorter intervals spend more time walking stacks (under the GIL) than serving requests
+MIN_PROFILER_INTERVAL_S = 0.001
+
+
+def profiler_route_enabled():
+    return os.getenv('PROFILER_ROUTE_ENABLED', '0').lower() in ('1', 'true', 'yes')
+
+
+def _check_interval(interval_s):
+    if not interval_s >= MIN_PROFILER_INTERVAL_S:
+        raise ValueError(f"profiler interval must be at least {MIN_PROFILER_INTERVAL_S * 1000:g} ms")
+    return interval_s
+
+
+class SamplingProfiler:
+    """Samples all thread stacks every interval_s and aggregates them as collapsed stacks."""
+
+    def __init__(self, interval_s=0.01, max_depth=64):
+        self.interval_s = _check_interval(interval_s)
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_s=None):
+        if interval_s is not None:
+            self.interval_s = _check_interval(interval_s)
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+            self.sample_count = 0
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                names = []
+                while frame is not None and len(names) < self.max_depth:
+                    code = frame.f_code
+                    names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                stacks.append(';'.join(reversed(names)))
+            with self._lock:
+                self.samples.update(stacks)
+                self.sample_count += 1
+
+    def collapsed(self, limit=None):
+        """Folded stacks ("frame;frame;frame count" per line), most frequent first."""
+        with self._lock:
+            items = self.samples.most_common(limit)
+        return '\n'.join(f'{stack} {count}' for stack, count in items) + ('\n' if items else '')
+
+    def status(self):
+        return {'running': self.running, 'interval_s': self.interval_s, 'samples': self.sample_count,
+                'distinct_stacks': len(self.samples)}
+
+
+profiler = SamplingProfiler(interval_s=float(os.getenv('PROFILER_INTERVAL_MS', '10')) / 1000.0)
+if os.getenv('PROFILER_ENABLED', '0').lower() in ('1', 'true', 'yes'):
+    profiler.start()
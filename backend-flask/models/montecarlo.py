@@ -0,0 +1,182 @@
+import numpy as np
+
+from models import metrics
+from models.deflection import estimate_deflection_batch
+from models.tsunami import DAMAGE_LEVELS, JOULES_PER_MEGATON, classify_damage, shore_wave_height
+
+# Monte Carlo uncertainty propagation for the deflection and tsunami estimates
+# - Each uncertain input is either a fixed number or a distribution spec such as
+#   {"dist": "uniform", "low": 1500, "high": 3500}. Supported: uniform, normal (optionally
+#   clipped to low/high), lognormal (median, sigma) and triangular (low, mode, high).
+# - Draws outside an input's physical range (PHYSICAL_RANGES, e.g. a negative diameter from a
+#   wide normal) are rejected: every output of that sample is NaN and it is left out of the
+#   damage level probabilities; the summary reports how many were rejected.
+# - Samples are drawn in fixed-size batches, each from its own child SeedSequence, so a given
+#   seed gives identical results whether batches run inline or on a process pool.
+# - Every batch is evaluated with array kernels (estimate_deflection_batch and a vectorized
+#   shore wave height), so 10^6 draws take well under a second on one core.
+
+DEFAULT_BATCH_SIZE = 250_000
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+MAX_SAMPLES = 5_000_000
+
+# Defaults span typical NEO compositions and the demo tsunami model's coupling range
+DEFAULT_PARAMS = {
+    'diameter_m': 100.0,
+    'density_kg_m3': {'dist': 'uniform', 'low': 1500.0, 'high': 3500.0},
+    'beta': {'dist': 'lognormal', 'median': 2.0, 'sigma': 0.35},
+    'coupling_efficiency': {'dist': 'uniform', 'low': 0.03, 'high': 0.1},
+    'relative_velocity_m_s': 20000.0,
+    'lead_time_days': 3650.0,
+    'impactor_velocity_m_s': 10000.0,
+    'water_depth_m': 4000.0,
+    'distance_shift_m': 6400000.0,
+    'cost_per_launch_usd': 50_000_000.0,
+    'payload_per_launch_kg': 22800.0,
+}
+
+# Inclusive (low, high) physical range per input; None is unbounded
+PHYSICAL_RANGES = {
+    'diameter_m': (0.0, None),
+    'density_kg_m3': (0.0, None),
+    'beta': (0.0, None),
+    'coupling_efficiency': (0.0, 1.0),
+    'relative_velocity_m_s': (0.0, None),
+    'lead_time_days': (0.0, None),
+    'impactor_velocity_m_s': (0.0, None),
+    'water_depth_m': (0.0, None),
+    'distance_shift_m': (0.0, None),
+    'cost_per_launch_usd': (0.0, None),
+    'payload_per_launch_kg': (0.0, None),
+}
+
+OUTPUTS = ('launches_required', 'estimated_cost_usd', 'shore_wave_height_m', 'energy_megatons')
+
+
+def diameter_from_neo(estimated_diameter_km):
+    """Uniform diameter distribution (meters) from a NeoWs estimated_diameter kilometers block."""
+    return {
+        'dist': 'uniform',
+        'low': float(estimated_diameter_km['estimated_diameter_min']) * 1000.0,
+        'high': float(estimated_diameter_km['estimated_diameter_max']) * 1000.0,
+    }
+
+
+def sample_param(spec, n, rng):
+    """Draw n samples for one parameter spec (a number or a distribution dict)."""
+    if not isinstance(spec, dict):
+        return np.full(n, float(spec))
+    dist = spec.get('dist')
+    if dist == 'uniform':
+        return rng.uniform(float(spec['low']), float(spec['high']), n)
+    if dist == 'normal':
+        out = rng.normal(float(spec['mean']), float(spec['std']), n)
+        if 'low' in spec or 'high' in spec:
+            np.clip(out, spec.get('low'), spec.get('high'), out=out)
+        return out
+    if dist == 'lognormal':
+        return rng.lognormal(np.log(float(spec['median'])), float(spec['sigma']), n)
+    if dist == 'triangular':
+        return rng.triangular(float(spec['low']), float(spec['mode']), float(spec['high']), n)
+    raise ValueError(f"Unknown distribution: {dist!r}")
+
+
+def _run_batch(params, n, seed_seq):
+    rng = np.random.default_rng(seed_seq)
+    draws = {name: sample_param(spec, n, rng) for name, spec in params.items()}
+    physical = np.ones(n, dtype=bool)
+    for name, (low, high) in PHYSICAL_RANGES.items():
+        if low is not None:
+            physical &= draws[name] >= low
+        if high is not None:
+            physical &= draws[name] <= high
+
+    deflection = estimate_deflection_batch(
+        diameter_m=draws['diameter_m'],
+        relative_velocity_m_s=draws['relative_velocity_m_s'],
+        lead_time_days=draws['lead_time_days'],
+        distance_shift_m=draws['distance_shift_m'],
+        density_kg_m3=draws['density_kg_m3'],
+        impactor_velocity_m_s=draws['impactor_velocity_m_s'],
+        beta=draws['beta'],
+        cost_per_launch_usd=draws['cost_per_launch_usd'],
+        payload_per_launch_kg=draws['payload_per_launch_kg'],
+    )
+    energy_mt = 0.5 * deflection['asteroid_mass_kg'] * draws['relative_velocity_m_s'] ** 2 / JOULES_PER_MEGATON
+    with np.errstate(invalid='ignore'):
+        heights = shore_wave_height(energy_mt, draws['water_depth_m'], draws['coupling_efficiency'])
+    outputs = {
+        'launches_required': deflection['launches_required'],
+        'estimated_cost_usd': deflection['estimated_cost_usd'],
+        'shore_wave_height_m': heights,
+        'energy_megatons': energy_mt,
+    }
+    for values in outputs.values():
+        values[~physical] = np.nan
+    return outputs
+
+
+def _summarize(values, percentiles, bins):
+    finite = values[np.isfinite(values)]
+    summary = {
+        'mean': float(finite.mean()) if finite.size else None,
+        'std': float(finite.std()) if finite.size else None,
+        'non_finite': int(values.size - finite.size),
+        'percentiles': {},
+        'histogram': None,
+    }
+    if finite.size:
+        pct = np.percentile(finite, percentiles)
+        summary['percentiles'] = {f'p{p:g}': float(v) for p, v in zip(percentiles, pct)}
+        counts, edges = np.histogram(finite, bins=bins)
+        summary['histogram'] = {'counts': counts.tolist(), 'edges': edges.tolist()}
+    return summary
+
+
+@metrics.timed()
+def run_monte_carlo(n_samples=100_000, seed=0, params=None, batch_size=DEFAULT_BATCH_SIZE, pool=None,
+                    percentiles=DEFAULT_PERCENTILES, bins=50):
+    """Sample the uncertain inputs and summarize launches, cost, shore wave height and energy.
+
+    params overrides entries of DEFAULT_PARAMS. pool, an Executor (e.g. models.providers.process_pool()),
+    evaluates batches in parallel; results are identical for a given seed either way. Returns a
+    JSON-serializable dict with mean/std/percentiles/histogram per output, the probability of each
+    tsunami damage level among the samples with a finite shore wave height, and the number of
+    samples rejected for non-physical inputs.
+    """
+    n_samples = int(n_samples)
+    if not 0 < n_samples <= MAX_SAMPLES:
+        raise ValueError(f"n_samples must be between 1 and {MAX_SAMPLES}")
+    merged = dict(DEFAULT_PARAMS)
+    unknown = set(params or {}) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+    merged.update(params or {})
+
+    sizes = [batch_size] * (n_samples // batch_size)
+    if n_samples % batch_size:
+        sizes.append(n_samples % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if pool is not None and len(sizes) > 1:
+        batches = list(pool.map(_run_batch, [merged] * len(sizes), sizes, seeds))
+    else:
+        batches = [_run_batch(merged, n, s) for n, s in zip(sizes, seeds)]
+
+    results = {name: np.concatenate([b[name] for b in batches]) for name in OUTPUTS}
+
+    heights = results['shore_wave_height_m']
+    heights = heights[np.isfinite(heights)]
+    counts = np.bincount(classify_damage(heights), minlength=len(DAMAGE_LEVELS))
+
+    summary = {
+        'n_samples': n_samples,
+        'seed': seed,
+        'rejected_samples': int(np.isnan(results['energy_megatons']).sum()),
+        'damage_level_samples': int(heights.size),
+        'damage_level_probability': {name: float(c) / heights.size if heights.size else None
+                                     for (name, _), c in zip(DAMAGE_LEVELS, counts)},
+    }
+    for name in OUTPUTS:
+        summary[name] = _summarize(results[name], percentiles, bins)
+    return summary
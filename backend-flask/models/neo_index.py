@@ -0,0 +1,162 @@
+import time
+from datetime import date
+
+import numpy as np
+
+from models import metrics
+from models.deflection import asteroid_mass_from_diameter, estimate_deflection_batch
+from models.tsunami import JOULES_PER_MEGATON
+
+# Columnar index over a flattened NeoWs feed (the list returned by NEO.get_neos)
+# - Built once per feed refresh; every query afterwards is answered from NumPy columns.
+# - Derived per-NEO fields are precomputed at build time using the frontend's conventions:
+#   size is the estimated maximum diameter, lead time is the number of days until close approach
+#   (at least 1), and deflection uses estimate_deflection's default parameters.
+# - Missing values (e.g. no close approach data) are NaN / NaT; they never match a range filter
+#   on that column and sort last.
+
+DEFAULT_DENSITY_KG_M3 = 2700
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+
+# sort key -> (column attribute, default descending)
+SORT_KEYS = {
+    'energy': ('energy_megatons', True),
+    'miss_distance': ('miss_distance_km', False),
+    'diameter': ('diameter_m', True),
+    'velocity': ('velocity_kps', True),
+    'magnitude': ('absolute_magnitude', False),
+    'date': ('approach_day', False),
+    'launches': ('launches_required', True),
+    'cost': ('estimated_cost_usd', True),
+}
+
+# query parameter -> (column attribute, comparison)
+RANGE_FILTERS = {
+    'min_diameter_m': ('diameter_m', '>='),
+    'max_diameter_m': ('diameter_m', '<='),
+    'min_velocity_kps': ('velocity_kps', '>='),
+    'max_velocity_kps': ('velocity_kps', '<='),
+    'min_miss_distance_km': ('miss_distance_km', '>='),
+    'max_miss_distance_km': ('miss_distance_km', '<='),
+    'min_magnitude': ('absolute_magnitude', '>='),
+    'max_magnitude': ('absolute_magnitude', '<='),
+    'min_energy_megatons': ('energy_megatons', '>='),
+    'max_energy_megatons': ('energy_megatons', '<='),
+}
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _approach_day(neo):
+    """Close approach date as days since the Unix epoch (NaN when missing)."""
+    value = neo.get('close_approach_date')
+    if not value:
+        return np.nan
+    return float((date.fromisoformat(value[:10]) - date(1970, 1, 1)).days)
+
+
+class NEOIndex:
+    """Array-backed columns plus precomputed risk fields for one feed snapshot."""
+
+    def __init__(self, neos, today=None):
+        today = today or date.today()
+        self.built_at = time.time()
+        self.size = len(neos)
+
+        self.diameter_m = np.array([
+            _to_float((neo.get('estimated_diameter_km') or {}).get('estimated_diameter_max')) * 1000.0
+            for neo in neos])
+        self.velocity_kps = np.array([_to_float(neo.get('relative_velocity_kps')) for neo in neos])
+        self.miss_distance_km = np.array([_to_float(neo.get('miss_distance_km')) for neo in neos])
+        self.absolute_magnitude = np.array([_to_float(neo.get('absolute_magnitude')) for neo in neos])
+        self.approach_day = np.array([_approach_day(neo) for neo in neos])
+
+        today_day = float((today - date(1970, 1, 1)).days)
+        self.lead_time_days = np.maximum(np.nan_to_num(self.approach_day - today_day, nan=1.0), 1.0)
+
+        velocity_m_s = self.velocity_kps * 1000.0
+        mass = asteroid_mass_from_diameter(self.diameter_m, DEFAULT_DENSITY_KG_M3)
+        self.energy_megatons = 0.5 * mass * velocity_m_s ** 2 / JOULES_PER_MEGATON
+        deflection = estimate_deflection_batch(
+            diameter_m=self.diameter_m,
+            relative_velocity_m_s=velocity_m_s,
+            lead_time_days=self.lead_time_days,
+        )
+        self.launches_required = deflection['launches_required']
+        self.estimated_cost_usd = deflection['estimated_cost_usd']
+
+        # Response rows are materialized once; queries only select and order them
+        self.records = []
+        for k, neo in enumerate(neos):
+            row = dict(neo)
+            row['derived'] = {
+                'diameter_m': _json_float(self.diameter_m[k]),
+                'energy_megatons': _json_float(self.energy_megatons[k]),
+                'lead_time_days': _json_float(self.lead_time_days[k]),
+                'launches_required': _json_float(self.launches_required[k]),
+                'estimated_cost_usd': _json_float(self.estimated_cost_usd[k]),
+            }
+            self.records.append(row)
+
+    @metrics.timed()
+    def query(self, sort=None, order=None, limit=DEFAULT_LIMIT, offset=0, approach_from=None,
+              approach_to=None, **ranges):
+        """Filter, order and page the index.
+
+        ranges are RANGE_FILTERS keys (e.g. min_diameter_m=100). approach_from/approach_to are
+        inclusive YYYY-MM-DD bounds. sort is a SORT_KEYS name; order is 'asc' or 'desc' (default
+        depends on the key). Returns {'total', 'offset', 'limit', 'items'}.
+        """
+        mask = np.ones(self.size, dtype=bool)
+        for name, value in ranges.items():
+            if value is None:
+                continue
+            if name not in RANGE_FILTERS:
+                raise ValueError(f"Unknown filter: {name}")
+            column, op = RANGE_FILTERS[name]
+            col = getattr(self, column)
+            mask &= (col >= float(value)) if op == '>=' else (col <= float(value))
+        if approach_from:
+            mask &= self.approach_day >= _approach_day({'close_approach_date': approach_from})
+        if approach_to:
+            mask &= self.approach_day <= _approach_day({'close_approach_date': approach_to})
+
+        limit = max(0, min(int(limit), MAX_LIMIT))
+        offset = max(0, int(offset))
+        idx = np.flatnonzero(mask)
+        total = int(idx.size)
+
+        if sort:
+            if sort not in SORT_KEYS:
+                raise ValueError(f"Unknown sort key: {sort}")
+            column, default_desc = SORT_KEYS[sort]
+            descending = default_desc if order is None else order == 'desc'
+            values = getattr(self, column)[idx]
+            # NaNs sort last in either direction
+            keys = np.where(np.isnan(values), np.inf, -values if descending else values)
+            k = offset + limit
+            if k < idx.size:
+                top = np.argpartition(keys, k - 1)[:k] if k > 0 else np.array([], dtype=np.intp)
+                top = top[np.argsort(keys[top], kind='stable')]
+            else:
+                top = np.argsort(keys, kind='stable')
+            idx = idx[top]
+
+        page = idx[offset:offset + limit]
+        return {
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'items': [self.records[i] for i in page],
+        }
+
+
+def _json_float(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
@@ -0,0 +1,278 @@
+import numpy as np
+
+from models import metrics
+
+# Two-body orbit propagation and kinetic-impactor b-plane shift
+# Assumptions and notes:
+# - Heliocentric two-body motion only (no planetary perturbations, no Earth gravity focusing).
+# - States are propagated with the universal-variable Lagrange f/g formulation, vectorized over any
+#   leading array shape, so many asteroids and many delta-v candidates are handled in one call.
+# - The encounter geometry assumes Earth sits at the asteroid's nominal position at the encounter
+#   time, moving on a circular heliocentric orbit in the ecliptic. The miss distance shift is the
+#   component of the deflected asteroid's displacement perpendicular to its Earth-relative velocity
+#   (i.e. the shift in the b-plane).
+# - Good enough to show the secular along-track drift (~3 * dv * t) that the linear
+#   distance / lead_time approximation misses; not mission-grade.
+
+MU_SUN = 1.32712440018e20  # m^3/s^2
+AU = 1.495978707e11  # m
+SECONDS_PER_DAY = 86400.0
+UNIX_EPOCH_JD = 2440587.5
+
+KEPLER_TOL = 1e-13
+KEPLER_MAX_ITER = 60
+# Below this Earth-relative speed the encounter has no usable b-plane (and the timing shift diverges)
+MIN_ENCOUNTER_SPEED_M_S = 100.0
+
+
+def _stumpff(z):
+    """Stumpff functions C(z), S(z) for arrays, using a series near zero to avoid cancellation."""
+    C = np.empty_like(z)
+    S = np.empty_like(z)
+    pos = z > 1e-3
+    neg = z < -1e-3
+    small = ~(pos | neg)
+
+    sz = np.sqrt(z[pos])
+    C[pos] = (1 - np.cos(sz)) / z[pos]
+    S[pos] = (sz - np.sin(sz)) / sz ** 3
+
+    sz = np.sqrt(-z[neg])
+    C[neg] = (np.cosh(sz) - 1) / -z[neg]
+    S[neg] = (np.sinh(sz) - sz) / sz ** 3
+
+    zs = z[small]
+    C[small] = 0.5 - zs / 24 + zs ** 2 / 720
+    S[small] = 1.0 / 6 - zs / 120 + zs ** 2 / 5040
+    return C, S
+
+
+def solve_kepler(M, e):
+    """Eccentric anomaly E for mean anomaly M (radians) and eccentricity e < 1, vectorized Newton."""
+    M, e = np.broadcast_arrays(np.asarray(M, dtype=np.float64), np.asarray(e, dtype=np.float64))
+    M = np.mod(M, 2 * np.pi)
+    E = np.where(e < 0.8, M, np.pi)
+    for _ in range(KEPLER_MAX_ITER):
+        step = (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+        E = E - step
+        if np.all(np.abs(step) < KEPLER_TOL):
+            break
+    return E
+
+
+def elements_to_state(a, e, i, raan, argp, M, mu=MU_SUN):
+    """Position and velocity (m, m/s; arrays of shape (..., 3)) from elliptic orbital elements.
+
+    a in meters, angles in radians. Frame is the elements' reference frame (ecliptic J2000 for NeoWs).
+    """
+    a, e, i, raan, argp, M = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (a, e, i, raan, argp, M)))
+    if np.any(e >= 1):
+        raise ValueError("Only elliptic orbits (e < 1) are supported")
+    E = solve_kepler(M, e)
+    cos_E, sin_E = np.cos(E), np.sin(E)
+    b = a * np.sqrt(1 - e ** 2)
+    # Perifocal position/velocity
+    x_p = a * (cos_E - e)
+    y_p = b * sin_E
+    r = a * (1 - e * cos_E)
+    n = np.sqrt(mu / a ** 3)
+    vx_p = -a * n * sin_E * a / r
+    vy_p = b * n * cos_E * a / r
+
+    cO, sO = np.cos(raan), np.sin(raan)
+    cw, sw = np.cos(argp), np.sin(argp)
+    ci, si = np.cos(i), np.sin(i)
+    # Columns of the perifocal -> inertial rotation
+    px = cO * cw - sO * sw * ci
+    py = sO * cw + cO * sw * ci
+    pz = sw * si
+    qx = -cO * sw - sO * cw * ci
+    qy = -sO * sw + cO * cw * ci
+    qz = cw * si
+
+    pos = np.stack([px * x_p + qx * y_p, py * x_p + qy * y_p, pz * x_p + qz * y_p], axis=-1)
+    vel = np.stack([px * vx_p + qx * vy_p, py * vx_p + qy * vy_p, pz * vx_p + qz * vy_p], axis=-1)
+    return pos, vel
+
+
+def propagate(r0, v0, dt, mu=MU_SUN):
+    """Propagate states (..., 3) by dt seconds (broadcastable, may be negative) with universal variables."""
+    r0 = np.asarray(r0, dtype=np.float64)
+    v0 = np.asarray(v0, dtype=np.float64)
+    dt = np.asarray(dt, dtype=np.float64)
+    r0, v0 = np.broadcast_arrays(r0, v0)
+    shape = np.broadcast_shapes(r0.shape[:-1], dt.shape)
+    r0 = np.broadcast_to(r0, shape + (3,))
+    v0 = np.broadcast_to(v0, shape + (3,))
+    dt = np.broadcast_to(dt, shape).copy()
+
+    sqrt_mu = np.sqrt(mu)
+    rn = np.linalg.norm(r0, axis=-1)
+    vr = np.sum(r0 * v0, axis=-1) / rn
+    alpha = 2.0 / rn - np.sum(v0 * v0, axis=-1) / mu
+
+    # Elliptic orbits: drop whole revolutions so Newton starts close to the root
+    ell = alpha > 0
+    period = np.full(shape, np.inf)
+    period[ell] = 2 * np.pi / np.sqrt(mu * alpha[ell] ** 3)
+    dt[ell] = np.mod(dt[ell], period[ell])
+
+    chi = sqrt_mu * np.abs(alpha) * dt
+    for _ in range(KEPLER_MAX_ITER):
+        z = alpha * chi ** 2
+        C, S = _stumpff(z)
+        F = (rn * vr / sqrt_mu * chi ** 2 * C + (1 - alpha * rn) * chi ** 3 * S + rn * chi - sqrt_mu * dt)
+        dF = (rn * vr / sqrt_mu * chi * (1 - z * S) + (1 - alpha * rn) * chi ** 2 * C + rn)
+        step = F / dF
+        chi = chi - step
+        if np.all(np.abs(step) <= KEPLER_TOL * np.maximum(1.0, np.abs(chi))):
+            break
+
+    z = alpha * chi ** 2
+    C, S = _stumpff(z)
+    f = 1 - chi ** 2 / rn * C
+    g = dt - chi ** 3 * S / sqrt_mu
+    r = f[..., None] * r0 + g[..., None] * v0
+    r_norm = np.linalg.norm(r, axis=-1)
+    fdot = sqrt_mu / (r_norm * rn) * (z * S - 1) * chi
+    gdot = 1 - chi ** 2 / r_norm * C
+    v = fdot[..., None] * r0 + gdot[..., None] * v0
+    return r, v
+
+
+def local_frame(r, v):
+    """Unit vectors (along-track t, in-plane normal n, orbit normal w) for states (..., 3)."""
+    t = v / np.linalg.norm(v, axis=-1, keepdims=True)
+    h = np.cross(r, v)
+    w = h / np.linalg.norm(h, axis=-1, keepdims=True)
+    n = np.cross(w, t)
+    return t, n, w
+
+
+def unit_direction(direction):
+    """Normalize a (t, n, w) kick direction; raises ValueError unless it is 3 finite numbers, not all 0."""
+    try:
+        direction = np.asarray(direction, dtype=np.float64)
+    except (TypeError, ValueError):
+        direction = None
+    if direction is None or direction.shape != (3,) or not np.all(np.isfinite(direction)):
+        raise ValueError("direction must be 3 finite numbers [t, n, w]")
+    norm = np.linalg.norm(direction)
+    if norm == 0:
+        raise ValueError("direction must not be the zero vector")
+    return direction / norm
+
+
+def earth_velocity_at(r, mu=MU_SUN):
+    """Circular, prograde ecliptic velocity of a body at heliocentric position r (..., 3)."""
+    rxy = r.copy()
+    rxy[..., 2] = 0.0
+    dist = np.linalg.norm(rxy, axis=-1, keepdims=True)
+    direction = np.stack([-rxy[..., 1], rxy[..., 0], np.zeros(rxy.shape[:-1])], axis=-1) / dist
+    return direction * np.sqrt(mu / dist)
+
+
+@metrics.timed()
+def bplane_shift(r_enc, v_enc, lead_time_s, delta_v_m_s, direction=(1.0, 0.0, 0.0), mu=MU_SUN):
+    """Shift of the encounter miss distance from an impulsive delta-v applied lead_time_s earlier.
+
+    r_enc, v_enc: nominal states at encounter, shape (N, 3) (or (3,)).
+    lead_time_s: scalar or shape (N,). delta_v_m_s: candidate magnitudes, shape (M,) (or scalar).
+    direction: (t, n, w) components of the delta-v in the local frame at deflection time
+    (default purely along-track). Returns dict of (N, M) arrays: 'miss_shift_m' (b-plane
+    displacement) and 'timing_shift_s' (change in encounter time). Raises ValueError for an
+    invalid direction or an encounter slower than MIN_ENCOUNTER_SPEED_M_S relative to Earth.
+    """
+    r_enc = np.atleast_2d(np.asarray(r_enc, dtype=np.float64))
+    v_enc = np.atleast_2d(np.asarray(v_enc, dtype=np.float64))
+    lead = np.broadcast_to(np.asarray(lead_time_s, dtype=np.float64), r_enc.shape[:1])
+    dv = np.atleast_1d(np.asarray(delta_v_m_s, dtype=np.float64))
+    direction = unit_direction(direction)
+
+    # State at deflection time
+    r_d, v_d = propagate(r_enc, v_enc, -lead)
+    t, n, w = local_frame(r_d, v_d)
+    kick = direction[0] * t + direction[1] * n + direction[2] * w  # (N, 3)
+
+    # Nominal and deflected states back at encounter, through the same numerical path
+    r_nom, v_nom = propagate(r_d, v_d, lead)
+    v_kicked = v_d[:, None, :] + dv[None, :, None] * kick[:, None, :]  # (N, M, 3)
+    r_def, _ = propagate(r_d[:, None, :], v_kicked, lead[:, None])
+
+    v_rel = v_nom - earth_velocity_at(r_nom, mu)
+    speed = np.linalg.norm(v_rel, axis=-1, keepdims=True)
+    slow = np.flatnonzero(speed[:, 0] < MIN_ENCOUNTER_SPEED_M_S)
+    if slow.size:
+        raise ValueError(f"Encounter speed relative to Earth is below {MIN_ENCOUNTER_SPEED_M_S:g} m/s for "
+                         f"element set(s) {slow.tolist()}; the b-plane shift is undefined")
+    u = v_rel / speed  # (N, 3)
+    disp = r_def - r_nom[:, None, :]
+    along = np.sum(disp * u[:, None, :], axis=-1)
+    perp = disp - along[..., None] * u[:, None, :]
+    return {
+        'miss_shift_m': np.linalg.norm(perp, axis=-1),
+        'timing_shift_s': -along / speed,
+    }
+
+
+def elements_arrays(elements):
+    """Convert a list of element dicts (a_au, e, i_deg, raan_deg, argp_deg, M_deg, epoch_jd) to arrays."""
+    if isinstance(elements, dict):
+        elements = [elements]
+
+    def col(name, default=None):
+        return np.array([float(el.get(name, default)) for el in elements])
+
+    return {
+        'a': col('a_au') * AU,
+        'e': col('e'),
+        'i': np.radians(col('i_deg', 0.0)),
+        'raan': np.radians(col('raan_deg', 0.0)),
+        'argp': np.radians(col('argp_deg', 0.0)),
+        'M': np.radians(col('M_deg', 0.0)),
+        'epoch_jd': col('epoch_jd', 0.0),
+    }
+
+
+def elements_from_neows(orbital_data):
+    """Element dict from a NeoWs 'orbital_data' block."""
+    return {
+        'a_au': float(orbital_data['semi_major_axis']),
+        'e': float(orbital_data['eccentricity']),
+        'i_deg': float(orbital_data['inclination']),
+        'raan_deg': float(orbital_data['ascending_node_longitude']),
+        'argp_deg': float(orbital_data['perihelion_argument']),
+        'M_deg': float(orbital_data['mean_anomaly']),
+        'epoch_jd': float(orbital_data['epoch_osculation']),
+    }
+
+
+@metrics.timed()
+def encounter_states(elements, encounter_jd=None):
+    """Heliocentric states at encounter for element dict(s); encounter_jd defaults to each epoch."""
+    el = elements_arrays(elements)
+    r, v = elements_to_state(el['a'], el['e'], el['i'], el['raan'], el['argp'], el['M'])
+    if encounter_jd is None:
+        return r, v
+    dt = (np.asarray(encounter_jd, dtype=np.float64) - el['epoch_jd']) * SECONDS_PER_DAY
+    return propagate(r, v, dt)
+
+
+@metrics.timed()
+def deflection_sensitivity(r_enc, v_enc, lead_time_s, direction=(1.0, 0.0, 0.0), probe_dv=1e-3):
+    """Miss-distance shift per unit delta-v (m per m/s) for each state, from a small probe kick."""
+    shift = bplane_shift(r_enc, v_enc, lead_time_s, probe_dv, direction)['miss_shift_m'][:, 0]
+    return shift / probe_dv
+
+
+def required_delta_v_two_body(elements, lead_time_s, distance_to_shift_m, encounter_jd=None,
+                              direction=(1.0, 0.0, 0.0)):
+    """Delta-v (m/s) needed to shift the b-plane miss distance by distance_to_shift_m.
+
+    Two-body replacement for required_delta_v_to_shift; uses the (locally linear) sensitivity of the
+    miss distance to a kick applied lead_time_s before encounter. Returns an array per element set.
+    """
+    r, v = encounter_states(elements, encounter_jd)
+    sens = deflection_sensitivity(r, v, lead_time_s, direction)
+    with np.errstate(divide='ignore'):
+        return np.where(sens > 0, distance_to_shift_m / sens, np.inf)
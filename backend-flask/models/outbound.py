@@ -0,0 +1,334 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+from models import metrics
+from models.cache import AsyncSingleFlight, SingleFlight
+
+# Shared policy for calls to third-party services (NASA, Google Elevation, Nominatim, Overpass)
+# - Token bucket per host: requests beyond the host's rate wait their turn (FIFO by reservation).
+#   A caller whose wait would exceed its own timeout fails immediately with RateLimitedError
+#   instead of queueing past its deadline.
+# - Coalescing: identical in-flight calls (same host and key) share one upstream request.
+# - Circuit breaker per host: after FAILURE_THRESHOLD consecutive failures the host is skipped
+#   (CircuitOpenError) for RESET_TIMEOUT_S, then one trial call decides whether to close it again.
+#   Client errors (4xx other than 429) don't count as failures.
+# - Per-host metrics: calls, coalesced calls, rejections, failures and queueing delay.
+# - Every call is timed as an "outbound.<provider>" span (models.metrics), labelled with the
+#   provider and the outcome (ok, coalesced, error, rate_limited, circuit_open).
+# Sync callers use call(); coroutines on the async path use acall(). Both share the same buckets,
+# breakers and metrics.
+
+# host -> (requests per second, burst). Nominatim's usage policy is at most 1 request/second.
+DEFAULT_LIMITS = {
+    'nominatim.openstreetmap.org': (1.0, 1),
+    'overpass-api.de': (2.0, 4),
+    'maps.googleapis.com': (50.0, 50),
+    'api.nasa.gov': (10.0, 20),
+}
+FAILURE_THRESHOLD = int(os.getenv('OUTBOUND_FAILURE_THRESHOLD', '5'))
+RESET_TIMEOUT_S = float(os.getenv('OUTBOUND_RESET_TIMEOUT_S', '30'))
+# Upper bounds (seconds) of the queueing delay histogram buckets; the last bucket is open-ended
+DELAY_BUCKETS_S = (0.0, 0.01, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0)
+QUEUE_METRIC = 'backend_outbound_queue_seconds'
+metrics.registry.describe(QUEUE_METRIC, 'Time outbound calls waited for a rate-limit slot, per host.')
+
+
+class OutboundError(Exception):
+    """Raised instead of making an outbound call the host policy does not allow right now."""
+
+
+class RateLimitedError(OutboundError):
+    pass
+
+
+class CircuitOpenError(OutboundError):
+    pass
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations: reserve() returns how long to wait before calling."""
+
+    def __init__(self, rate, burst=1, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.clock = clock
+        self._tokens = float(burst)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """Take one token and return the delay (s) until it is available.
+
+        Raises RateLimitedError, without taking a token, if the delay would exceed max_wait.
+        """
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            delay = max(0.0, (1.0 - self._tokens) / self.rate)
+            if max_wait is not None and delay > max_wait:
+                raise RateLimitedError(f"rate limit: next slot in {delay:.2f}s")
+            self._tokens -= 1.0
+            return delay
+
+
+class CircuitBreaker:
+    """closed -> open after failure_threshold consecutive failures -> half-open after reset_timeout."""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT_S, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """True if a call may proceed. In half-open state only one trial call is let through."""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def release(self):
+        """Give back a half-open trial slot that was granted but not used."""
+        with self._lock:
+            self._trial = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self._trial = False
+
+
+def _is_failure(exc):
+    """Whether an exception from an outbound call says the provider is unhealthy."""
+    response = getattr(exc, 'response', None)
+    status = getattr(response, 'status_code', None)
+    return status is None or status == 429 or status >= 500
+
+
+class HostPolicy:
+    """Bucket, breaker and metrics for one upstream host."""
+
+    def __init__(self, host, rate=None, burst=1):
+        self.host = host
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.breaker = CircuitBreaker()
+        self._lock = threading.Lock()
+        self._stats = {
+            'calls': 0,
+            'coalesced': 0,
+            'rate_limited': 0,
+            'circuit_open': 0,
+            'failures': 0,
+            'queued': 0,
+            'queue_delay_total_s': 0.0,
+            'queue_delay_max_s': 0.0,
+        }
+        self._delay_counts = [0] * (len(DELAY_BUCKETS_S) + 1)
+
+    def count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def admit(self, max_wait=None):
+        """Check the breaker and reserve a slot; returns the queueing delay to wait out."""
+        if not self.breaker.allow():
+            self.count('circuit_open')
+            raise CircuitOpenError(f"circuit open for {self.host}")
+        try:
+            delay = self.bucket.reserve(max_wait) if self.bucket is not None else 0.0
+        except RateLimitedError:
+            self.count('rate_limited')
+            self.breaker.release()
+            raise
+        with self._lock:
+            self._stats['calls'] += 1
+            if delay > 0:
+                self._stats['queued'] += 1
+            self._stats['queue_delay_total_s'] += delay
+            self._stats['queue_delay_max_s'] = max(self._stats['queue_delay_max_s'], delay)
+            self._delay_counts[_bucket_index(delay)] += 1
+        if metrics.enabled():
+            metrics.registry.histogram(QUEUE_METRIC, (('host', self.host),), DELAY_BUCKETS_S).observe(delay)
+        return delay
+
+    def record(self, exc=None):
+        if exc is None:
+            self.breaker.record_success()
+        elif _is_failure(exc):
+            self.count('failures')
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            counts = list(self._delay_counts)
+        stats['circuit'] = self.breaker.state
+        stats['consecutive_failures'] = self.breaker.failures
+        stats['queue_delay_mean_s'] = stats['queue_delay_total_s'] / stats['calls'] if stats['calls'] else 0.0
+        labels = [f'le_{b:g}' for b in DELAY_BUCKETS_S] + ['inf']
+        stats['queue_delay_histogram'] = dict(zip(labels, counts))
+        if self.bucket is not None:
+            stats['rate_per_s'] = self.bucket.rate
+            stats['burst'] = self.bucket.burst
+        return stats
+
+
+def _bucket_index(delay):
+    for i, bound in enumerate(DELAY_BUCKETS_S):
+        if delay <= bound:
+            return i
+    return len(DELAY_BUCKETS_S)
+
+
+def _configured_limits():
+    limits = dict(DEFAULT_LIMITS)
+    # e.g. OUTBOUND_LIMITS='{"nominatim.example.org": [1, 1], "api.nasa.gov": [0.3, 5]}'
+    override = os.getenv('OUTBOUND_LIMITS')
+    if override:
+        limits.update({host: tuple(v) for host, v in json.loads(override).items()})
+    return limits
+
+
+_policies = {}
+_policies_lock = threading.Lock()
+_flight = SingleFlight()
+_aflight = AsyncSingleFlight()
+
+
+def policy_for(url):
+    """Return the HostPolicy for a URL's host (hosts without a configured limit are not throttled)."""
+    host = urlsplit(url).hostname or ''
+    with _policies_lock:
+        policy = _policies.get(host)
+        if policy is None:
+            rate, burst = _configured_limits().get(host, (None, 1))
+            policy = _policies[host] = HostPolicy(host, rate, burst)
+        return policy
+
+
+def reset():
+    """Forget all host policies (buckets, breakers and metrics)."""
+    with _policies_lock:
+        _policies.clear()
+
+
+def stats():
+    with _policies_lock:
+        policies = list(_policies.values())
+    return {p.host: p.stats() for p in policies}
+
+
+def _outcome(exc):
+    if isinstance(exc, RateLimitedError):
+        return 'rate_limited'
+    if isinstance(exc, CircuitOpenError):
+        return 'circuit_open'
+    return 'error'
+
+
+def prometheus_lines():
+    """Circuit breaker state per host as Prometheus gauges (1 = open or half-open)."""
+    with _policies_lock:
+        policies = list(_policies.values())
+    lines = ['# HELP backend_outbound_circuit_open Whether calls to the host are currently being skipped.',
+             '# TYPE backend_outbound_circuit_open gauge']
+    for p in sorted(policies, key=lambda p: p.host):
+        lines.append(f'backend_outbound_circuit_open{{host="{p.host}"}} {int(p.breaker.state != "closed")}')
+    return lines
+
+
+def call(url, key, fn, max_wait=None, provider=None):
+    """Run fn() (which performs the request to url) under the host's policy.
+
+    Concurrent calls with the same url and key share one fn() call. max_wait bounds how long the
+    caller is willing to queue for a rate-limit slot (typically its request timeout). provider
+    names the service in metrics (defaults to the host).
+    Raises OutboundError subclasses when the policy rejects the call; fn's exceptions propagate.
+    """
+    policy = policy_for(url)
+    provider = provider or policy.host
+
+    def run():
+        time.sleep(policy.admit(max_wait))
+        try:
+            result = fn()
+        except Exception as e:
+            policy.record(e)
+            raise
+        policy.record()
+        return result
+
+    with metrics.span(f'outbound.{provider}', provider=provider) as span:
+        try:
+            result, shared = _flight.do((url, key), run)
+        except Exception as e:
+            span.set(outcome=_outcome(e))
+            raise
+        if shared:
+            policy.count('coalesced')
+            span.set(outcome='coalesced')
+    return result
+
+
+async def acall(url, key, fn, max_wait=None, provider=None):
+    """Async call(): fn is a coroutine function."""
+    policy = policy_for(url)
+    provider = provider or policy.host
+
+    async def run():
+        await asyncio.sleep(policy.admit(max_wait))
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            policy.breaker.release()
+            raise
+        except Exception as e:
+            policy.record(e)
+            raise
+        policy.record()
+        return result
+
+    with metrics.span(f'outbound.{provider}', provider=provider) as span:
+        try:
+            result, shared = await _aflight.do((url, key), run)
+        except Exception as e:
+            span.set(outcome=_outcome(e))
+            raise
+        if shared:
+            policy.count('coalesced')
+            span.set(outcome='coalesced')
+    return result
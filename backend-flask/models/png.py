@@ -0,0 +1,54 @@
+import struct
+import zlib
+
+import numpy as np
+
+# Minimal PNG writer (no imaging dependency)
+# - encode_indexed(): 8-bit palette image (color type 3) with an optional alpha table (tRNS), which
+#   is what the map overlays use: one byte per pixel, so tiles compress to a few KB.
+# - encode_gray(): 8-bit grayscale (color type 0) for raw value previews.
+# Rows are written top to bottom with filter type 0 (none); zlib does the rest.
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def _chunk(kind, data):
+    body = kind + data
+    return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+
+def _idat(pixels, level):
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    rows = np.zeros((pixels.shape[0], pixels.shape[1] + 1), dtype=np.uint8)
+    rows[:, 1:] = pixels
+    return _chunk(b'IDAT', zlib.compress(rows.tobytes(), level))
+
+
+def encode_indexed(indices, palette, level=6):
+    """PNG bytes for a 2D uint8 array of palette indices (row 0 = top).
+
+    palette is a (n, 3) or (n, 4) uint8 array of RGB(A) colors, n <= 256; with an alpha column a
+    tRNS chunk makes the corresponding indices (partly) transparent.
+    """
+    indices = np.asarray(indices)
+    palette = np.asarray(palette, dtype=np.uint8)
+    if indices.ndim != 2 or not 1 <= len(palette) <= 256:
+        raise ValueError('indices must be 2D and the palette must have 1..256 entries')
+    height, width = indices.shape
+    header = struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0)
+    chunks = [_chunk(b'IHDR', header), _chunk(b'PLTE', palette[:, :3].tobytes())]
+    if palette.shape[1] == 4:
+        chunks.append(_chunk(b'tRNS', palette[:, 3].tobytes()))
+    chunks.append(_idat(indices, level))
+    chunks.append(_chunk(b'IEND', b''))
+    return PNG_SIGNATURE + b''.join(chunks)
+
+
+def encode_gray(values, level=6):
+    """PNG bytes for a 2D uint8 grayscale array (row 0 = top)."""
+    values = np.asarray(values)
+    if values.ndim != 2:
+        raise ValueError('values must be 2D')
+    height, width = values.shape
+    header = struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)
+    return PNG_SIGNATURE + _chunk(b'IHDR', header) + _idat(values, level) + _chunk(b'IEND', b'')
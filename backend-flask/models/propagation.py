@@ -0,0 +1,217 @@
+import math
+
+import numpy as np
+
+from models import metrics
+from models.tsunami import G, estimate_tsunami_from_impact
+
+# Regional tsunami propagation over a bathymetry grid
+# - The grid is a local equirectangular box centred on the impact point (row 0 = south edge).
+# - Elevations follow the raster convention: negative values are water depth, >= 0 is land.
+# - Two solvers, both fully vectorized (no per-cell Python loops):
+#   * 'ray' (default): straight rays from the source. Arrival time integrates the shallow-water
+#     slowness 1/sqrt(g*d) along each ray; amplitude uses cylindrical spreading plus Green's law
+#     shoaling, H = H0 * sqrt(r0/r) * (d0/d)^(1/4), capped at the depth-limited breaking height.
+#     Rays that cross land are shadowed. Cost is O(samples * cells): a 1000x1000 grid takes a
+#     few seconds on one core.
+#   * 'swe': linear shallow-water equations on a staggered grid with forward-backward time
+#     stepping and in-place updates. More faithful (refraction, reflection) but needs
+#     O(cells * steps) work, so it is meant for grids of a few hundred cells per side. The step
+#     count grows with cells per side and with sqrt(max depth / source depth) (a shallow source
+#     is slow to cross the box while the deepest cell sets the time step), so it is capped at
+#     SWE_MAX_STEPS.
+# - The source amplitude H0 comes from estimate_tsunami_from_impact so the field agrees with the
+#   point estimate at the impact site. Highly approximate; demonstration only.
+
+METERS_PER_DEG_LAT = 111000.0
+BREAKING_RATIO = 0.78  # max wave height / depth before breaking
+MIN_DEPTH_M = 1.0
+DEFAULT_RAY_SAMPLES = 128
+SWE_MAX_STEPS = 5000
+
+
+def regional_grid(lat, lon, half_width_km, rows, cols):
+    """Return (lat_min, lat_max, lon_min, lon_max, dy_m, dx_m) for a box centred on lat/lon."""
+    half_m = half_width_km * 1000.0
+    dlat = half_m / METERS_PER_DEG_LAT
+    dlon = half_m / (METERS_PER_DEG_LAT * max(0.01, math.cos(math.radians(lat))))
+    dy = 2 * half_m / (rows - 1)
+    dx = 2 * half_m / (cols - 1)
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon, dy, dx
+
+
+def source_radius_m(energy_megatons, cell_m):
+    """Radius of the initial disturbance: ~1 km per Mt^(1/4), never smaller than two cells."""
+    return max(2.0 * cell_m, 1000.0 * max(energy_megatons, 0.0) ** 0.25)
+
+
+def ray_field(elevation, dy, dx, src_row, src_col, H0, r0, samples=DEFAULT_RAY_SAMPLES):
+    """Straight-ray arrival time (s) and max amplitude (m) fields. Land and shadowed cells are NaN."""
+    rows, cols = elevation.shape
+    depth = np.where(elevation < 0, -elevation, 0.0).astype(np.float32)
+    wet = depth > 0
+    slowness = np.full(rows * cols, np.inf, dtype=np.float32)
+    slowness[wet.ravel()] = 1.0 / np.sqrt(G * np.maximum(depth[wet], MIN_DEPTH_M))
+
+    di = (np.arange(rows, dtype=np.float32) - src_row)[:, None]
+    dj = (np.arange(cols, dtype=np.float32) - src_col)[None, :]
+    di, dj = np.broadcast_arrays(di, dj)
+
+    acc = np.zeros((rows, cols), dtype=np.float32)
+    pos_i = np.empty((rows, cols), dtype=np.float64)
+    pos_j = np.empty((rows, cols), dtype=np.float64)
+    flat = np.empty((rows, cols), dtype=np.intp)
+    for k in range(samples):
+        f = (k + 0.5) / samples
+        np.multiply(di, f, out=pos_i)
+        pos_i += src_row
+        np.rint(pos_i, out=pos_i)
+        np.multiply(dj, f, out=pos_j)
+        pos_j += src_col
+        np.rint(pos_j, out=pos_j)
+        np.multiply(pos_i, cols, out=pos_i)
+        pos_i += pos_j
+        flat[...] = pos_i
+        acc += slowness[flat]
+
+    dist = np.sqrt((di * dy) ** 2 + (dj * dx) ** 2)
+    arrival = dist * acc / samples
+    reachable = np.isfinite(arrival) & wet
+    arrival[~reachable] = np.nan
+
+    src_depth = max(float(depth[int(round(src_row)), int(round(src_col))]), MIN_DEPTH_M)
+    d = np.maximum(depth, MIN_DEPTH_M)
+    amplitude = H0 * np.sqrt(r0 / np.maximum(dist, r0)) * (src_depth / d) ** 0.25
+    np.minimum(amplitude, BREAKING_RATIO * d, out=amplitude)
+    amplitude = amplitude.astype(np.float32)
+    amplitude[~reachable] = np.nan
+    return arrival, amplitude
+
+
+def swe_field(elevation, dy, dx, src_row, src_col, H0, r0, duration_s, threshold_m=None, cfl=0.5,
+              max_steps=SWE_MAX_STEPS):
+    """Linear shallow-water solve; returns arrival time (first |eta| > threshold) and max |eta|.
+
+    Raises ValueError when the solve would need more than max_steps time steps.
+    """
+    rows, cols = elevation.shape
+    depth = np.where(elevation < 0, -elevation, 0.0).astype(np.float32)
+    wet = depth > 0
+    dmax = float(depth.max()) if wet.any() else MIN_DEPTH_M
+    dt = cfl * min(dx, dy) / math.sqrt(2 * G * dmax)
+    steps = int(math.ceil(duration_s / dt))
+    if max_steps is not None and steps > max_steps:
+        raise ValueError(f"The 'swe' solve needs {steps} time steps (max {max_steps}); "
+                         "use fewer rows/cols, a deeper source or method 'ray'")
+    threshold_m = threshold_m if threshold_m is not None else 0.01 * H0
+
+    # Face depths; faces touching land are closed (reflective coast)
+    hu = np.zeros((rows, cols + 1), dtype=np.float32)
+    hu[:, 1:-1] = np.where(wet[:, 1:] & wet[:, :-1], 0.5 * (depth[:, 1:] + depth[:, :-1]), 0.0)
+    hv = np.zeros((rows + 1, cols), dtype=np.float32)
+    hv[1:-1, :] = np.where(wet[1:, :] & wet[:-1, :], 0.5 * (depth[1:, :] + depth[:-1, :]), 0.0)
+
+    ii = (np.arange(rows, dtype=np.float32) - src_row)[:, None] * dy
+    jj = (np.arange(cols, dtype=np.float32) - src_col)[None, :] * dx
+    eta = (H0 * np.exp(-(ii ** 2 + jj ** 2) / r0 ** 2)).astype(np.float32)
+    eta[~wet] = 0.0
+    u = np.zeros((rows, cols + 1), dtype=np.float32)  # depth-integrated fluxes
+    v = np.zeros((rows + 1, cols), dtype=np.float32)
+
+    max_eta = np.abs(eta)
+    arrival = np.where(max_eta > threshold_m, 0.0, np.nan).astype(np.float32)
+    gx = np.float32(G * dt / dx)
+    gy = np.float32(G * dt / dy)
+    cx = np.float32(dt / dx)
+    cy = np.float32(dt / dy)
+    grad = np.empty((rows, cols - 1), dtype=np.float32)
+    grad_v = np.empty((rows - 1, cols), dtype=np.float32)
+    div = np.empty((rows, cols), dtype=np.float32)
+    abs_eta = np.empty((rows, cols), dtype=np.float32)
+
+    for n in range(1, steps + 1):
+        # momentum: flux -= g * h * dt * d(eta)/dx
+        np.subtract(eta[:, 1:], eta[:, :-1], out=grad)
+        grad *= hu[:, 1:-1]
+        grad *= gx
+        u[:, 1:-1] -= grad
+        np.subtract(eta[1:, :], eta[:-1, :], out=grad_v)
+        grad_v *= hv[1:-1, :]
+        grad_v *= gy
+        v[1:-1, :] -= grad_v
+        # continuity: eta -= dt * div(flux)
+        np.subtract(u[:, 1:], u[:, :-1], out=div)
+        div *= cx
+        eta -= div
+        np.subtract(v[1:, :], v[:-1, :], out=div)
+        div *= cy
+        eta -= div
+
+        np.abs(eta, out=abs_eta)
+        np.maximum(max_eta, abs_eta, out=max_eta)
+        newly = np.isnan(arrival) & (abs_eta > threshold_m)
+        arrival[newly] = n * dt
+
+    max_eta[~wet] = np.nan
+    arrival[~wet] = np.nan
+    return arrival, max_eta
+
+
+@metrics.timed()
+def tsunami_field(lat, lon, energy_megatons, half_width_km=500.0, rows=200, cols=200, raster=None,
+                  depth_m=4000.0, coupling_efficiency=0.05, method='ray', duration_s=None,
+                  samples=DEFAULT_RAY_SAMPLES):
+    """Compute arrival-time and max-amplitude rasters for an impact at lat/lon.
+
+    Bathymetry comes from raster (an ElevationRaster) when given, otherwise a flat ocean of
+    depth_m. Returns a dict with the grid bounds, shape, source parameters and two float32 arrays
+    (row 0 = south): 'arrival_time_s' and 'max_amplitude_m', NaN on land and unreached cells.
+    """
+    if rows < 3 or cols < 3:
+        raise ValueError('rows and cols must be at least 3')
+    if method not in ('ray', 'swe'):
+        raise ValueError("method must be 'ray' or 'swe'")
+
+    lat_min, lat_max, lon_min, lon_max, dy, dx = regional_grid(lat, lon, half_width_km, rows, cols)
+    if raster is not None:
+        elevation = raster.grid(lat_min, lat_max, lon_min, lon_max, rows, cols)
+        # Outside raster coverage fall back to the flat ocean depth
+        elevation = np.where(np.isnan(elevation), -depth_m, elevation)
+    else:
+        elevation = np.full((rows, cols), -float(depth_m))
+
+    src_row = (rows - 1) / 2.0
+    src_col = (cols - 1) / 2.0
+    src_elev = float(elevation[int(round(src_row)), int(round(src_col))])
+    if src_elev >= 0:
+        raise ValueError('Impact point is on land according to the bathymetry grid')
+    src_depth = -src_elev
+
+    point = estimate_tsunami_from_impact(energy_megatons=energy_megatons, water_depth_m=src_depth,
+                                         coupling_efficiency=coupling_efficiency)
+    H0 = point['initial_wave_height_m']
+    r0 = source_radius_m(energy_megatons, min(dx, dy))
+
+    if method == 'ray':
+        arrival, amplitude = ray_field(elevation, dy, dx, src_row, src_col, H0, r0, samples=samples)
+    else:
+        if duration_s is None:
+            # long enough for the wave to cross the box at the source depth celerity
+            duration_s = 1.5 * half_width_km * 1000.0 / math.sqrt(G * src_depth)
+        arrival, amplitude = swe_field(elevation, dy, dx, src_row, src_col, H0, r0, duration_s)
+
+    return {
+        'bounds': {'lat_min': lat_min, 'lat_max': lat_max, 'lon_min': lon_min, 'lon_max': lon_max},
+        'shape': [rows, cols],
+        'cell_size_m': {'dy': dy, 'dx': dx},
+        'method': method,
+        'source': {
+            'lat': lat,
+            'lon': lon,
+            'water_depth_m': src_depth,
+            'initial_wave_height_m': H0,
+            'source_radius_m': r0,
+        },
+        'arrival_time_s': arrival,
+        'max_amplitude_m': amplitude,
+    }
@@ -0,0 +1,134 @@
+import gc
+import os
+import threading
+import time
+
+# Process-wide providers, created on first use rather than at import
+# - neo_model(): the NEO feed client; feed_refresher(): the FeedRefresher over it. Nothing talks
+#   to NASA and no thread is started until start_background() or the first /neo request.
+# - The bathymetry raster and water index stay lazy as well (models.tsunami / models.water_index):
+#   raster tiles, and water indexes saved as a directory, are memory-mapped when first touched.
+# - preload() loads the large read-only data (model modules, raster metadata, water index, water
+#   cache prewarm file, NEO snapshots) in the current process. A forking server (gunicorn with
+#   preload_app, see gunicorn.conf.py) calls it in the master, so workers share that memory
+#   copy-on-write instead of each loading their own copy; gc.freeze() keeps the collector from
+#   touching (and so copying) those objects in the workers.
+# - process_pool(): one process pool per server process for the CPU-heavy batch endpoints
+#   (/montecarlo), sized by the PROCESS_POOL_WORKERS setting rather than by requests. Its
+#   processes come from a fork server, so they are never forked from a threaded worker.
+# - Modules that hold connections, pools or SQLite handles reset them in forked children via
+#   os.register_at_fork, so nothing process-local is shared with the master.
+
+MODEL_MODULES = (
+    'models.deflection', 'models.orbit', 'models.impact', 'models.neo_index', 'models.tsunami',
+    'models.propagation', 'models.montecarlo', 'models.campaign', 'models.effects', 'models.streaming',
+)
+
+PROCESS_POOL_WORKERS = int(os.getenv('PROCESS_POOL_WORKERS', '1'))
+
+_neo = None
+_refresher = None
+_pool = None
+_lock = threading.Lock()
+
+
+def neo_model():
+    """The shared models.impact.NEO client."""
+    global _neo
+    if _neo is None:
+        with _lock:
+            if _neo is None:
+                from models.impact import NEO
+                _neo = NEO()
+    return _neo
+
+
+def feed_refresher():
+    """The shared models.refresher.FeedRefresher (not started; see start_background)."""
+    global _refresher
+    if _refresher is None:
+        neo = neo_model()
+        with _lock:
+            if _refresher is None:
+                from models.refresher import FeedRefresher
+                _refresher = FeedRefresher(neo)
+    return _refresher
+
+
+def process_pool():
+    """The shared ProcessPoolExecutor, or None when PROCESS_POOL_WORKERS <= 1 (evaluate inline)."""
+    global _pool
+    if PROCESS_POOL_WORKERS <= 1:
+        return None
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                _pool = ProcessPoolExecutor(max_workers=min(PROCESS_POOL_WORKERS, os.cpu_count() or 1),
+                                            mp_context=multiprocessing.get_context(method))
+    return _pool
+
+
+def _reset_after_fork():
+    # the pool's processes and the lock's state belong to the parent
+    global _pool, _lock
+    _pool = None
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def background_enabled():
+    """FEED_REFRESH_ENABLED; off unless set, so tests and scripts that build the app stay offline.
+
+    The serving entry points (gunicorn.conf.py, asgi.py, python app.py) default it to on.
+    """
+    return os.getenv('FEED_REFRESH_ENABLED', '0').lower() not in ('', '0', 'false', 'no')
+
+
+def start_background():
+    """Start this process's background threads (the feed refresher) if FEED_REFRESH_ENABLED.
+
+    Threads do not survive fork(), so a preforking server calls this in each worker.
+    """
+    if background_enabled():
+        feed_refresher().start()
+
+
+def preload(snapshots=True):
+    """Load model modules and read-only datasets now; returns {step: seconds}.
+
+    snapshots=False skips fetching the NEO feed (e.g. when NASA is unreachable at boot).
+    """
+    import importlib
+
+    timings = {}
+
+    def step(name, fn):
+        started = time.perf_counter()
+        fn()
+        timings[name] = time.perf_counter() - started
+
+    step('imports', lambda: [importlib.import_module(name) for name in MODEL_MODULES])
+
+    from models.geocache import get_water_cache
+    from models.tsunami import get_bathymetry_raster
+    from models.water_index import get_water_index
+
+    step('bathymetry_raster', get_bathymetry_raster)
+    step('water_index', get_water_index)
+    step('water_cache', get_water_cache)
+    if snapshots and background_enabled():
+        def refresh():
+            try:
+                feed_refresher().refresh()
+            except Exception as e:
+                print(f"NEO snapshot preload failed: {e}")
+        step('neo_snapshots', refresh)
+    gc.collect()
+    gc.freeze()
+    return timings
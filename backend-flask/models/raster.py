@@ -0,0 +1,211 @@
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+# Offline elevation/bathymetry raster
+# - A global (or regional) node-registered grid, like GEBCO/ETOPO, stored as square .npy tiles
+#   next to an index.json describing the grid. Tiles are memory-mapped on first use, so only the
+#   pages actually touched are read from disk.
+# - Tiles overlap their neighbours by one row/column, so a bilinear lookup always reads 4 nodes
+#   from a single tile.
+# - Elevations are meters relative to sea level; ocean depths are negative.
+# - build_raster converts an in-memory array (e.g. a GEBCO grid loaded from netCDF) into this
+#   layout; build_synthetic_raster writes a tiny deterministic fixture for tests and demos.
+
+INDEX_FILE = 'index.json'
+DEFAULT_TILE_SIZE = 1024
+
+
+def _tile_name(tile_row, tile_col):
+    return f'tile_{tile_row}_{tile_col}.npy'
+
+
+class ElevationRaster:
+    """Memory-mapped tiled elevation grid answering point lookups with bilinear interpolation."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            meta = json.load(f)
+        self.lat_min = float(meta['lat_min'])
+        self.lat_max = float(meta['lat_max'])
+        self.lon_min = float(meta['lon_min'])
+        self.lon_max = float(meta['lon_max'])
+        self.rows = int(meta['rows'])
+        self.cols = int(meta['cols'])
+        self.tile_size = int(meta['tile_size'])
+        self.nodata = meta.get('nodata')
+        self.tile_rows = max(1, math.ceil((self.rows - 1) / self.tile_size))
+        self.tile_cols = max(1, math.ceil((self.cols - 1) / self.tile_size))
+        self.dlat = (self.lat_max - self.lat_min) / (self.rows - 1)
+        self.dlon = (self.lon_max - self.lon_min) / (self.cols - 1)
+        self._tiles = {}
+        self._lock = threading.Lock()
+
+    def _tile(self, tile_row, tile_col):
+        """Return the memory-mapped tile array, or None when the tile is not present on disk."""
+        key = (tile_row, tile_col)
+        try:
+            return self._tiles[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._tiles:
+                tile_path = os.path.join(self.path, _tile_name(tile_row, tile_col))
+                self._tiles[key] = np.load(tile_path, mmap_mode='r') if os.path.exists(tile_path) else None
+            return self._tiles[key]
+
+    def _normalize_lon(self, lon):
+        # Bring longitudes into the grid's span when it is global (e.g. -180..180)
+        if self.lon_max - self.lon_min >= 360.0 - 1e-9:
+            return (lon - self.lon_min) % 360.0 + self.lon_min
+        return lon
+
+    def elevation(self, lat, lon):
+        """Return the interpolated elevation (m) at lat/lon, or None outside coverage."""
+        lon = self._normalize_lon(lon)
+        y = (lat - self.lat_min) / self.dlat
+        x = (lon - self.lon_min) / self.dlon
+        if not (0.0 <= y <= self.rows - 1 and 0.0 <= x <= self.cols - 1):
+            return None
+
+        i = min(int(y), self.rows - 2)
+        j = min(int(x), self.cols - 2)
+        tile_row = min(i // self.tile_size, self.tile_rows - 1)
+        tile_col = min(j // self.tile_size, self.tile_cols - 1)
+        tile = self._tile(tile_row, tile_col)
+        if tile is None:
+            return None
+
+        ti = i - tile_row * self.tile_size
+        tj = j - tile_col * self.tile_size
+        z00 = float(tile[ti, tj])
+        z01 = float(tile[ti, tj + 1])
+        z10 = float(tile[ti + 1, tj])
+        z11 = float(tile[ti + 1, tj + 1])
+        if self.nodata is not None and self.nodata in (z00, z01, z10, z11):
+            return None
+
+        fy = y - i
+        fx = x - j
+        return (z00 * (1 - fx) * (1 - fy) + z01 * fx * (1 - fy)
+                + z10 * (1 - fx) * fy + z11 * fx * fy)
+
+    def sample(self, lats, lons):
+        """Vectorized bilinear lookup for arrays of lat/lon. Uncovered points are NaN."""
+        lats, lons = np.broadcast_arrays(np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64))
+        y = (lats - self.lat_min) / self.dlat
+        x = (self._normalize_lon(lons) - self.lon_min) / self.dlon
+        out = np.full(lats.shape, np.nan)
+        inside = (y >= 0) & (y <= self.rows - 1) & (x >= 0) & (x <= self.cols - 1)
+
+        yi, xi = y[inside], x[inside]
+        i = np.minimum(yi.astype(np.int64), self.rows - 2)
+        j = np.minimum(xi.astype(np.int64), self.cols - 2)
+        tile_row = np.minimum(i // self.tile_size, self.tile_rows - 1)
+        tile_col = np.minimum(j // self.tile_size, self.tile_cols - 1)
+        fy = yi - i
+        fx = xi - j
+        values = np.full(yi.shape, np.nan)
+
+        tile_ids = tile_row * self.tile_cols + tile_col
+        for tile_id in np.unique(tile_ids):
+            tile = self._tile(*divmod(int(tile_id), self.tile_cols))
+            if tile is None:
+                continue
+            sel = tile_ids == tile_id
+            ti = i[sel] - tile_row[sel] * self.tile_size
+            tj = j[sel] - tile_col[sel] * self.tile_size
+            z00 = tile[ti, tj].astype(np.float64)
+            z01 = tile[ti, tj + 1].astype(np.float64)
+            z10 = tile[ti + 1, tj].astype(np.float64)
+            z11 = tile[ti + 1, tj + 1].astype(np.float64)
+            v = (z00 * (1 - fx[sel]) * (1 - fy[sel]) + z01 * fx[sel] * (1 - fy[sel])
+                 + z10 * (1 - fx[sel]) * fy[sel] + z11 * fx[sel] * fy[sel])
+            if self.nodata is not None:
+                bad = (z00 == self.nodata) | (z01 == self.nodata) | (z10 == self.nodata) | (z11 == self.nodata)
+                v[bad] = np.nan
+            values[sel] = v
+
+        out[inside] = values
+        return out
+
+    def grid(self, lat_min, lat_max, lon_min, lon_max, rows, cols):
+        """Resample a regular rows x cols grid over a bounding box (row 0 = lat_min)."""
+        lats = np.linspace(lat_min, lat_max, rows)
+        lons = np.linspace(lon_min, lon_max, cols)
+        return self.sample(lats[:, None], lons[None, :])
+
+
+def build_raster(array, lat_min, lat_max, lon_min, lon_max, out_dir, tile_size=DEFAULT_TILE_SIZE, nodata=None):
+    """Write a node-registered elevation array (row 0 = lat_min) as an ElevationRaster directory."""
+    array = np.asarray(array)
+    rows, cols = array.shape
+    os.makedirs(out_dir, exist_ok=True)
+    tile_rows = max(1, math.ceil((rows - 1) / tile_size))
+    tile_cols = max(1, math.ceil((cols - 1) / tile_size))
+    for tr in range(tile_rows):
+        for tc in range(tile_cols):
+            block = array[tr * tile_size:(tr + 1) * tile_size + 1, tc * tile_size:(tc + 1) * tile_size + 1]
+            np.save(os.path.join(out_dir, _tile_name(tr, tc)), np.ascontiguousarray(block))
+    meta = {
+        'lat_min': lat_min,
+        'lat_max': lat_max,
+        'lon_min': lon_min,
+        'lon_max': lon_max,
+        'rows': rows,
+        'cols': cols,
+        'tile_size': tile_size,
+        'dtype': str(array.dtype),
+        'nodata': nodata,
+    }
+    with open(os.path.join(out_dir, INDEX_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return ElevationRaster(out_dir)
+
+
+def synthetic_elevation(lats, lons):
+    """Deterministic toy planet: smooth continents (up to ~4 km) on about a third of the surface, ocean elsewhere (to ~6.5 km deep)."""
+    lat_r = np.radians(lats)
+    lon_r = np.radians(lons)
+    relief = (np.sin(2 * lon_r) * np.cos(3 * lat_r)
+              + 0.5 * np.cos(3 * lon_r + 1.0) * np.cos(lat_r)
+              + 0.3 * np.sin(5 * lat_r))
+    return np.where(relief > 0.3, (relief - 0.3) * 3000.0, (relief - 0.3) * 3500.0)
+
+
+def build_synthetic_raster(out_dir, resolution_deg=1.0, tile_size=64):
+    """Write a small global synthetic raster (181 x 361 nodes at 1 degree) for tests."""
+    rows = int(round(180.0 / resolution_deg)) + 1
+    cols = int(round(360.0 / resolution_deg)) + 1
+    lats = np.linspace(-90.0, 90.0, rows)
+    lons = np.linspace(-180.0, 180.0, cols)
+    grid = synthetic_elevation(lats[:, None], lons[None, :]).astype(np.float32)
+    return build_raster(grid, -90.0, 90.0, -180.0, 180.0, out_dir, tile_size=tile_size)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build an offline elevation raster directory.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    synth = sub.add_parser('synthetic', help='write the synthetic test fixture')
+    synth.add_argument('out_dir')
+    synth.add_argument('--resolution', type=float, default=1.0)
+    conv = sub.add_parser('convert', help='tile a node-registered .npy grid (row 0 = south)')
+    conv.add_argument('npy_file')
+    conv.add_argument('out_dir')
+    conv.add_argument('--bounds', type=float, nargs=4, metavar=('LAT_MIN', 'LAT_MAX', 'LON_MIN', 'LON_MAX'),
+                      default=(-90.0, 90.0, -180.0, 180.0))
+    conv.add_argument('--tile-size', type=int, default=DEFAULT_TILE_SIZE)
+    args = parser.parse_args()
+
+    if args.command == 'synthetic':
+        raster = build_synthetic_raster(args.out_dir, resolution_deg=args.resolution)
+    else:
+        raster = build_raster(np.load(args.npy_file, mmap_mode='r'), *args.bounds, args.out_dir,
+                              tile_size=args.tile_size)
+    print(f'Wrote {raster.rows}x{raster.cols} raster to {args.out_dir}')
@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+from models import metrics
+from models.impact import STALE_TTL_S
+from models.neo_index import NEOIndex
+
+# Background refresh of the default NEO feed windows
+# - A daemon thread re-fetches the default /neo window (today + 7 days) and the next
+#   FEED_REFRESH_DAYS_AHEAD days' windows on a schedule, ahead of their cache TTL, so neither the
+#   first request after startup nor the one after the date rolls over waits on NASA.
+# - Each refresh builds a FeedSnapshot per window: the merged records, their NEOIndex (energy and
+#   default-parameter deflection precomputed per NEO) and the encoded JSON body of the plain list.
+# - Snapshots are immutable and published by swapping one dict reference, so readers never take a
+#   lock or wait on a refresh; they see either the previous or the new set.
+# - A failed refresh keeps the previous snapshots (served until FEED_SNAPSHOT_MAX_AGE_S) and is
+#   retried after FEED_REFRESH_RETRY_S.
+
+FEED_REFRESH_INTERVAL_S = float(os.getenv('FEED_REFRESH_INTERVAL_S', '600'))
+FEED_REFRESH_RETRY_S = float(os.getenv('FEED_REFRESH_RETRY_S', '60'))
+FEED_REFRESH_DAYS_AHEAD = int(os.getenv('FEED_REFRESH_DAYS_AHEAD', '1'))
+FEED_SNAPSHOT_MAX_AGE_S = float(os.getenv('FEED_SNAPSHOT_MAX_AGE_S', str(STALE_TTL_S)))
+
+
+def _compact_json(obj):
+    return json.dumps(obj, separators=(',', ':'))
+
+
+class FeedSnapshot:
+    """One feed window's records, index and encoded JSON body, as of built_at."""
+
+    __slots__ = ('start_date', 'end_date', 'neos', 'index', 'body', 'built_at')
+
+    def __init__(self, start_date, end_date, neos, encode=_compact_json):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.neos = neos
+        self.index = NEOIndex(neos)
+        self.body = encode(neos).encode('utf-8')
+        self.built_at = time.time()
+
+    @property
+    def age_s(self):
+        return time.time() - self.built_at
+
+
+class FeedRefresher:
+    """Keeps FeedSnapshots of the upcoming default feed windows current on a background thread.
+
+    neo is a models.impact.NEO; encode turns the record list into the JSON text served by /neo.
+    """
+
+    def __init__(self, neo, interval_s=FEED_REFRESH_INTERVAL_S, retry_s=FEED_REFRESH_RETRY_S,
+                 days_ahead=FEED_REFRESH_DAYS_AHEAD, max_age_s=FEED_SNAPSHOT_MAX_AGE_S, encode=_compact_json):
+        self.neo = neo
+        self.interval_s = interval_s
+        self.retry_s = retry_s
+        self.days_ahead = days_ahead
+        self.max_age_s = max_age_s
+        self.encode = encode
+        self._snapshots = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.refreshes = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_refresh_at = None
+
+    def windows(self, today=None):
+        """(start_date, end_date) of today's default window and the next days_ahead days' windows."""
+        today = today or date.today()
+        return [self.neo.resolve_range((today + timedelta(days=k)).isoformat()) for k in range(self.days_ahead + 1)]
+
+    def get(self, start_date=None, end_date=None):
+        """The snapshot for a range (defaults as in /neo), or None if there is none recent enough."""
+        snapshot = self._snapshots.get(self.neo.resolve_range(start_date, end_date))
+        if snapshot is None or snapshot.age_s > self.max_age_s:
+            return None
+        return snapshot
+
+    def refresh(self):
+        """Fetch what is due and publish new snapshots for the current windows. Raises on fetch errors."""
+        with self._lock, metrics.span('neo.refresh'):
+            snapshots = {}
+            for start_date, end_date in self.windows():
+                # windows within one interval of expiring are fetched now rather than on the next run
+                self.neo.prefetch(start_date, end_date, ahead_s=self.interval_s)
+                neos = self.neo.get_neos(start_date, end_date)
+                if neos is None:
+                    raise RuntimeError(f'feed window {start_date}..{end_date} unavailable')
+                snapshots[(start_date, end_date)] = FeedSnapshot(start_date, end_date, neos, self.encode)
+            self._snapshots = snapshots
+            self.refreshes += 1
+            self.last_refresh_at = time.time()
+            self.last_error = None
+        return snapshots
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        # snapshots inherited from a preloading parent process are only refreshed when due
+        delay = 0.0
+        if self.last_refresh_at is not None:
+            delay = max(0.0, self.interval_s - (time.time() - self.last_refresh_at))
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(delay,), name='feed-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, delay):
+        while not self._stop.wait(delay):
+            try:
+                self.refresh()
+                delay = self.interval_s
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                print(f"Feed refresh failed: {e}")
+                delay = min(self.retry_s, self.interval_s)
+
+    def status(self):
+        snapshots = self._snapshots
+        return {
+            'running': self.running,
+            'interval_s': self.interval_s,
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'last_refresh_age_s': None if self.last_refresh_at is None else time.time() - self.last_refresh_at,
+            'windows': [{'start_date': s.start_date, 'end_date': s.end_date, 'count': len(s.neos),
+                         'age_s': s.age_s} for s in snapshots.values()],
+        }
@@ -0,0 +1,113 @@
+import json
+import math
+import zlib
+
+import numpy as np
+
+# Newline-delimited JSON (NDJSON) streaming helpers shared by app.py and asgi.py
+# - A client opts in with "Accept: application/x-ndjson" or ?format=ndjson; each record is then
+#   written as one JSON line as soon as it is available, so memory stays flat and the client can
+#   start rendering before the response is complete.
+# - Lines are grouped into ~64 KB chunks to keep per-chunk overhead low.
+# - gzip is applied when the client sends "Accept-Encoding: gzip" (disable with ?gzip=0). The
+#   compressor is sync-flushed after every chunk, so compression never holds records back.
+# - A failure after the response has started cannot change the status code; it is reported as a
+#   final {"error": ...} line instead.
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+CHUNK_BYTES = 64 * 1024
+
+
+def wants_ndjson(accept, args):
+    return args.get('format') == 'ndjson' or NDJSON_MIMETYPE in (accept or '')
+
+
+def wants_gzip(accept_encoding, args):
+    return args.get('gzip', '1') not in ('0', 'false', 'no') and 'gzip' in (accept_encoding or '')
+
+
+def ndjson_chunks(records, chunk_bytes=CHUNK_BYTES):
+    """Encode an iterable of JSON-serializable records into NDJSON byte chunks."""
+    buf = []
+    size = 0
+    try:
+        for record in records:
+            line = json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+            buf.append(line)
+            size += len(line)
+            if size >= chunk_bytes:
+                yield b''.join(buf)
+                buf = []
+                size = 0
+    except Exception as e:
+        buf.append(json.dumps({'error': str(e)}).encode('utf-8') + b'\n')
+    if buf:
+        yield b''.join(buf)
+
+
+def ndjson_column_chunks(slices, index_name='index'):
+    """Encode (offset, {name: 1-d array}) slices as NDJSON rows, one byte chunk per slice.
+
+    Equivalent to ndjson_chunks over per-row dicts ({index_name: offset + i, name: value, ...}),
+    but formats whole columns at once, which is several times faster for numeric sweeps.
+    Non-finite values are written as null (JSON has no Infinity or NaN).
+    """
+    try:
+        for start, columns in slices:
+            names = list(columns)
+            template = '{"%s":%%d,' % index_name + ','.join('"%s":%%s' % n for n in names) + '}\n'
+            formatted = []
+            for n in names:
+                values = np.asarray(columns[n], dtype=np.float64)
+                fmt = float.__repr__ if np.isfinite(values).all() else _finite_or_null
+                formatted.append(list(map(fmt, values.tolist())))
+            count = len(formatted[0]) if formatted else 0
+            rows = zip(range(start, start + count), *formatted)
+            yield ''.join(template % row for row in rows).encode('utf-8')
+    except Exception as e:
+        yield json.dumps({'error': str(e)}).encode('utf-8') + b'\n'
+
+
+def _finite_or_null(value):
+    return float.__repr__(value) if math.isfinite(value) else 'null'
+
+
+def gzip_chunks(chunks):
+    """gzip a stream of byte chunks incrementally (sync flush after each chunk)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class NDJSONEncoder:
+    """Incremental form of ndjson_chunks + gzip_chunks for async producers (see asgi.py)."""
+
+    def __init__(self, gzip=False, chunk_bytes=CHUNK_BYTES):
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+        self.chunk_bytes = chunk_bytes
+        self._buf = []
+        self._size = 0
+
+    def add(self, record):
+        """Queue one record; returns bytes ready to send (possibly empty)."""
+        line = json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+        self._buf.append(line)
+        self._size += len(line)
+        return self.flush() if self._size >= self.chunk_bytes else b''
+
+    def flush(self):
+        data = b''.join(self._buf)
+        self._buf = []
+        self._size = 0
+        if self.compressor is not None and data:
+            return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        return data
+
+    def close(self):
+        data = self.flush()
+        if self.compressor is not None:
+            data += self.compressor.flush()
+        return data
@@ -0,0 +1,242 @@
+import asyncio
+import os
+import time
+
+import httpx
+
+from models import aio, metrics, outbound
+from models.geocache import get_water_cache
+from models.water_index import get_water_index
+from models.tsunami import (
+    GOOGLE_ELEVATION_URL,
+    NEARBY_SEARCH_DEADLINE_S,
+    NOMINATIM_HEADERS,
+    NOMINATIM_REVERSE_URL,
+    OVERPASS_HEADERS,
+    OVERPASS_URL,
+    _elevation_batches,
+    _first_below_sea_level,
+    _locations_param,
+    _network_fallback_enabled,
+    _nominatim_params,
+    _overpass_query,
+    _parse_elevation_response,
+    _parse_osm_water,
+    _parse_overpass_count,
+    _ring_points,
+    get_bathymetry_raster,
+)
+
+# Async counterparts of the water/land lookups in models.tsunami, for the ASGI server (asgi.py)
+# - Same decision order, caches (raster, geohash water cache) and response parsing as the sync
+#   versions; only the transport differs. Outbound calls go through models.aio, so a slow
+#   shoreline search parks a coroutine instead of holding a worker thread.
+# - The nearby-water search races each ring's probes as tasks; the first hit cancels the rest and
+#   the whole search is bounded by a deadline.
+# - Every upstream call goes through models.outbound (rate limits, coalescing, circuit breaker).
+
+
+async def get_google_elevations(points, api_key=None, timeout=10):
+    """Async models.tsunami.get_google_elevations."""
+    points = [(float(lat), float(lon)) for lat, lon in points]
+    api_key = api_key or os.getenv('GOOGLE_ELEVATION_API_KEY')
+    if not api_key or not points:
+        return [None] * len(points)
+
+    cache = get_water_cache()
+    elevations = [None] * len(points)
+    missing = []
+    for i, (lat, lon) in enumerate(points):
+        cached = cache.get('elevation', lat, lon)
+        if cached is not None:
+            elevations[i] = cached['elevation_m']
+        else:
+            missing.append(i)
+
+    batches = list(_elevation_batches([points[i] for i in missing]))
+    fetched = await asyncio.gather(*(_fetch_elevation_batch(b, api_key, timeout) for b in batches))
+    for i, elev in zip(missing, (e for batch in fetched for e in batch)):
+        elevations[i] = elev
+        if elev is not None:
+            cache.put('elevation', points[i][0], points[i][1], elevation_m=elev, provenance='google')
+    return elevations
+
+
+async def _fetch_elevation_batch(batch, api_key, timeout):
+    params = {'locations': _locations_param(batch), 'key': api_key}
+    try:
+        data = await outbound.acall(GOOGLE_ELEVATION_URL, params['locations'],
+                                    lambda: _get_json(GOOGLE_ELEVATION_URL, params=params, timeout=timeout),
+                                    max_wait=timeout, provider='google')
+        return _parse_elevation_response(data, len(batch))
+    except (httpx.HTTPError, outbound.OutboundError, ValueError):
+        return [None] * len(batch)
+
+
+async def _get_json(url, **kwargs):
+    return (await aio.get(url, **kwargs)).json()
+
+
+async def get_google_elevation(lat, lon, api_key=None, timeout=10):
+    return (await get_google_elevations([(lat, lon)], api_key=api_key, timeout=timeout))[0]
+
+
+async def osm_is_water(lat, lon, timeout=6):
+    """Async models.tsunami._osm_is_water: True/False, or None when Nominatim can't tell."""
+    index = get_water_index()
+    if index is not None and index.covers(lat, lon):
+        return index.contains(lat, lon)
+    cache = get_water_cache()
+    cached = cache.get('osm', lat, lon)
+    if cached is not None:
+        return cached['is_water']
+    params = _nominatim_params(lat, lon)
+    try:
+        data = await outbound.acall(
+            NOMINATIM_REVERSE_URL, (params['lat'], params['lon']),
+            lambda: _get_json(NOMINATIM_REVERSE_URL, params=params, headers=NOMINATIM_HEADERS, timeout=timeout),
+            max_wait=timeout, provider='nominatim')
+        result = _parse_osm_water(data)
+    except (httpx.HTTPError, outbound.OutboundError):
+        return None
+    cache.put('osm', lat, lon, is_water=result, provenance='osm')
+    return result
+
+
+async def overpass_has_water(lat, lon, radius=200, timeout=10):
+    """Async models.tsunami._overpass_has_water. Raises on request issues."""
+    index = get_water_index()
+    if index is not None and index.covers(lat, lon):
+        return index.any_within(lat, lon, radius)
+    cache = get_water_cache()
+    kind = f'overpass:{radius}'
+    cached = cache.get(kind, lat, lon)
+    if cached is not None:
+        return cached['is_water']
+    query = _overpass_query(lat, lon, radius, timeout)
+
+    async def post():
+        resp = await aio.post(OVERPASS_URL, content=query.encode('utf-8'), headers=OVERPASS_HEADERS, timeout=timeout)
+        return resp.json()
+
+    result = _parse_overpass_count(await outbound.acall(
+        OVERPASS_URL, (lat, lon, radius), post, max_wait=timeout, provider='overpass'))
+    cache.put(kind, lat, lon, is_water=result, provenance='overpass')
+    return result
+
+
+async def is_water_at_location(lat, lon, api_key=None, elevation_threshold_m=0.0):
+    """Async models.tsunami.is_water_at_location: (is_water, elevation_m), (None, None) if unknown."""
+    cache = get_water_cache()
+    kind = 'water' if elevation_threshold_m == 0.0 else f'water:{elevation_threshold_m}'
+    with metrics.span('tsunami.classify') as span:
+        cached = cache.get(kind, lat, lon)
+        if cached is not None:
+            span.set(cache='hit', provenance=cached['provenance'] or 'unknown')
+            return (cached['is_water'], cached['elevation_m'])
+
+        is_water, elev, provenance = await _classify_location(lat, lon, api_key, elevation_threshold_m)
+        span.set(cache='miss', provenance=provenance or 'unknown')
+    if is_water is not None and provenance != 'raster':
+        cache.put(kind, lat, lon, is_water=is_water, elevation_m=elev, provenance=provenance)
+    return (is_water, elev)
+
+
+async def _classify_location(lat, lon, api_key, elevation_threshold_m):
+    raster = get_bathymetry_raster()
+    if raster is not None:
+        raster_elev = raster.elevation(lat, lon)
+        if raster_elev is not None:
+            return (raster_elev <= elevation_threshold_m, raster_elev, 'raster')
+    if not _network_fallback_enabled():
+        return (None, None, None)
+
+    elev = await get_google_elevation(lat, lon, api_key=api_key)
+    if elev is None:
+        osm_water = await osm_is_water(lat, lon)
+        if osm_water is None:
+            return (None, None, None)
+        return (osm_water, None, 'osm')
+
+    if elev <= elevation_threshold_m:
+        return (True, elev, 'google')
+
+    if await osm_is_water(lat, lon):
+        return (True, elev, 'osm')
+
+    nearby = await find_nearby_water(lat, lon, api_key=api_key)
+    if nearby and nearby[0] is True:
+        return (True, nearby[1], 'nearby')
+
+    return (False, elev, 'google')
+
+
+@metrics.timed('tsunami.nearby_search')
+async def find_nearby_water(lat, lon, api_key=None, radii_m=(1000, 3000, 5000),
+                            bearings=(0, 45, 90, 135, 180, 225, 270, 315), deadline_s=None):
+    """Async models.tsunami._find_nearby_water; same return values and deadline semantics."""
+    deadline = time.monotonic() + (NEARBY_SEARCH_DEADLINE_S if deadline_s is None else deadline_s)
+    try:
+        rings = _ring_points(lat, lon, radii_m, bearings)
+        all_points = [p for ring in rings for p in ring]
+        all_elevs = await get_google_elevations(all_points, api_key=api_key, timeout=_remaining(deadline, 10))
+        ring_elevs = [all_elevs[i * len(bearings):(i + 1) * len(bearings)] for i in range(len(rings))]
+
+        probes = [_probe_exact_point(lat, lon, deadline)]
+        for ring, elevs in zip(rings, ring_elevs):
+            below_sea_level = _first_below_sea_level(ring, elevs)
+            if below_sea_level is not None:
+                found = await _first_hit(probes, deadline) if probes else None
+                return found if found not in (None, 'timeout') else below_sea_level
+            probes.extend(_probe_point(lat2, lon2, elev, deadline) for (lat2, lon2), elev in zip(ring, elevs))
+            found = await _first_hit(probes, deadline)
+            probes = []
+            if found == 'timeout':
+                return (None, None, None, None)
+            if found is not None:
+                return found
+        return (False, None, None, None)
+    except Exception:
+        return (None, None, None, None)
+
+
+async def _first_hit(coros, deadline):
+    """Run probes concurrently; return the first non-None result, 'timeout', or None."""
+    pending = {asyncio.ensure_future(c) for c in coros}
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return 'timeout'
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None and task.result() is not None:
+                    return task.result()
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def _remaining(deadline, default):
+    return max(0.1, min(default, deadline - time.monotonic()))
+
+
+async def _probe_exact_point(lat, lon, deadline):
+    try:
+        if await overpass_has_water(lat, lon, radius=200, timeout=_remaining(deadline, 10)):
+            return (True, None, lat, lon)
+    except Exception:
+        pass
+    return None
+
+
+async def _probe_point(lat, lon, elev, deadline):
+    if await osm_is_water(lat, lon, timeout=_remaining(deadline, 6)) is True:
+        return (True, elev, lat, lon)
+    try:
+        if await overpass_has_water(lat, lon, radius=200, timeout=_remaining(deadline, 10)):
+            return (True, elev, lat, lon)
+    except Exception:
+        pass
+    return None
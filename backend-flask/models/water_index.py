@@ -0,0 +1,319 @@
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+# Offline water-feature index (lakes, reservoirs, rivers, coastline)
+# - Loaded from a GeoJSON extract (e.g. OSM natural=water / waterway / coastline features
+#   exported with osmium or ogr2ogr) or from the compact form written by save(): an .npz file, or
+#   a directory of .npy arrays that load() memory-maps, so only the pages queries touch are read
+#   and processes on one host share them through the page cache.
+# - Geometry is array-backed: every ring and line is flattened into one table of edges
+#   (x0, y0, x1, y1 in degrees lon/lat). Polygons (with holes) are contiguous edge ranges.
+# - Two uniform grid buckets in CSR form map a cell to candidate polygons (by bounding box) and
+#   to candidate edges, so a query only looks at geometry near the point. Edges longer than a
+#   cell (coarse coastlines, lines across the antimeridian) are split into cell-sized pieces
+#   when an extract is loaded, so each piece's bounding box covers at most 2 x 2 cells.
+# - contains(lat, lon): the point lies inside a water polygon (even-odd rule, holes excluded).
+#   any_within(lat, lon, radius_m): inside a water polygon, or within radius_m of any water edge
+#   (polygon boundary, river or coastline line). Distances use a local equirectangular projection,
+#   fine for the few-hundred-meter radii the tsunami probes use.
+# - covers(lat, lon): the point lies inside the extract bounds; outside them the index has no
+#   opinion and callers fall back to the network services.
+
+METERS_PER_DEG = 111000.0
+DEFAULT_CELL_DEG = 0.05
+GEOMETRY_ARRAYS = ('ex0', 'ey0', 'ex1', 'ey1', 'edge_poly', 'poly_start', 'poly_end', 'poly_bbox')
+GRID_ARRAYS = ('edge_cells', 'edge_offsets', 'edge_ids', 'poly_cells', 'poly_offsets', 'poly_ids')
+META_FILE = 'meta.json'
+
+
+def _rings_of(geometry):
+    """Yield (kind, [ring, ...]) for each part of a GeoJSON geometry; kind is 'area' or 'line'."""
+    gtype = geometry['type']
+    coords = geometry.get('coordinates')
+    if gtype == 'Polygon':
+        yield 'area', coords
+    elif gtype == 'MultiPolygon':
+        for polygon in coords:
+            yield 'area', polygon
+    elif gtype == 'LineString':
+        yield 'line', [coords]
+    elif gtype == 'MultiLineString':
+        for line in coords:
+            yield 'line', [line]
+    elif gtype == 'GeometryCollection':
+        for sub in geometry['geometries']:
+            yield from _rings_of(sub)
+
+
+def _grid_csr(x0, y0, x1, y1, cell_deg):
+    """Bucket boxes into grid cells. Returns (cell keys sorted, offsets, item ids)."""
+    cx0 = np.floor((np.minimum(x0, x1) + 180.0) / cell_deg).astype(np.int64)
+    cx1 = np.floor((np.maximum(x0, x1) + 180.0) / cell_deg).astype(np.int64)
+    cy0 = np.floor((np.minimum(y0, y1) + 90.0) / cell_deg).astype(np.int64)
+    cy1 = np.floor((np.maximum(y0, y1) + 90.0) / cell_deg).astype(np.int64)
+    nx = cx1 - cx0 + 1
+    counts = nx * (cy1 - cy0 + 1)
+    items = np.repeat(np.arange(len(counts), dtype=np.int64), counts)
+    # position of each expanded entry within its item's box of cells
+    k = np.arange(items.size, dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+    cols = cx0[items] + k % nx[items]
+    rows = cy0[items] + k // nx[items]
+    keys = rows * _grid_cols(cell_deg) + cols
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    items = items[order]
+    cells, starts = np.unique(keys, return_index=True)
+    offsets = np.append(starts, keys.size).astype(np.int64)
+    return cells, offsets, items
+
+
+def _split_long_edges(x0, y0, x1, y1, edge_poly, max_deg):
+    """Split edges spanning more than max_deg in lon or lat into equal collinear pieces.
+
+    Returns the new edge arrays plus first, where first[i] is the index of old edge i's first
+    piece (first[n] = new edge count), for remapping edge ranges.
+    """
+    pieces = np.maximum(np.ceil(np.maximum(np.abs(x1 - x0), np.abs(y1 - y0)) / max_deg), 1).astype(np.int64)
+    first = np.concatenate([[0], np.cumsum(pieces)])
+    if first[-1] == len(pieces):
+        return x0, y0, x1, y1, edge_poly, first
+    edge = np.repeat(np.arange(len(pieces)), pieces)
+    k = np.arange(first[-1]) - first[edge]
+    t0 = k / pieces[edge]
+    t1 = (k + 1) / pieces[edge]
+    dx = (x1 - x0)[edge]
+    dy = (y1 - y0)[edge]
+    # the last piece ends exactly on the original vertex
+    last = k == pieces[edge] - 1
+    nx1 = np.where(last, x1[edge], x0[edge] + t1 * dx)
+    ny1 = np.where(last, y1[edge], y0[edge] + t1 * dy)
+    return x0[edge] + t0 * dx, y0[edge] + t0 * dy, nx1, ny1, edge_poly[edge], first
+
+
+def _grid_cols(cell_deg):
+    return int(math.ceil(360.0 / cell_deg)) + 1
+
+
+class WaterIndex:
+    """Grid-bucketed water polygons and lines answering contains / any_within queries."""
+
+    def __init__(self, arrays, cell_deg=DEFAULT_CELL_DEG, bounds=None):
+        # arrays: ex0, ey0, ex1, ey1 (edges), edge_poly (polygon id or -1 for lines),
+        # poly_start, poly_end (edge ranges), poly_bbox (n, 4: lon_min, lat_min, lon_max, lat_max)
+        self.ex0 = arrays['ex0']
+        self.ey0 = arrays['ey0']
+        self.ex1 = arrays['ex1']
+        self.ey1 = arrays['ey1']
+        self.edge_poly = arrays['edge_poly']
+        self.poly_start = arrays['poly_start']
+        self.poly_end = arrays['poly_end']
+        self.poly_bbox = arrays['poly_bbox'].reshape(-1, 4)
+        self.cell_deg = float(cell_deg)
+        self._ncols = _grid_cols(self.cell_deg)
+        if bounds is None and self.ex0.size:
+            bounds = (float(min(self.ex0.min(), self.ex1.min())), float(min(self.ey0.min(), self.ey1.min())),
+                      float(max(self.ex0.max(), self.ex1.max())), float(max(self.ey0.max(), self.ey1.max())))
+        self.bounds = tuple(bounds) if bounds is not None else (0.0, 0.0, 0.0, 0.0)
+
+        # the grid buckets are stored by save(), so loading does not have to rebuild them
+        if all(name in arrays for name in GRID_ARRAYS):
+            self._edge_cells, self._edge_offsets, self._edge_ids, \
+                self._poly_cells, self._poly_offsets, self._poly_ids = (arrays[name] for name in GRID_ARRAYS)
+        else:
+            self._edge_cells, self._edge_offsets, self._edge_ids = _grid_csr(
+                self.ex0, self.ey0, self.ex1, self.ey1, self.cell_deg)
+            b = self.poly_bbox
+            self._poly_cells, self._poly_offsets, self._poly_ids = _grid_csr(
+                b[:, 0], b[:, 1], b[:, 2], b[:, 3], self.cell_deg)
+
+    @classmethod
+    def from_geojson(cls, data, cell_deg=DEFAULT_CELL_DEG):
+        """Build from a GeoJSON FeatureCollection dict (Polygon/MultiPolygon/LineString parts)."""
+        features = data.get('features', [data] if data.get('type') == 'Feature' else [])
+        xs0, ys0, xs1, ys1, edge_poly = [], [], [], [], []
+        poly_start, poly_end, poly_bbox = [], [], []
+        n_edges = 0
+        for feature in features:
+            geometry = feature.get('geometry')
+            if not geometry:
+                continue
+            for kind, rings in _rings_of(geometry):
+                start = n_edges
+                pid = len(poly_start) if kind == 'area' else -1
+                for ring in rings:
+                    pts = np.asarray(ring, dtype=np.float64)[:, :2]
+                    if kind == 'area' and not np.array_equal(pts[0], pts[-1]):
+                        pts = np.vstack([pts, pts[:1]])
+                    if len(pts) < 2:
+                        continue
+                    xs0.append(pts[:-1, 0])
+                    ys0.append(pts[:-1, 1])
+                    xs1.append(pts[1:, 0])
+                    ys1.append(pts[1:, 1])
+                    edge_poly.append(np.full(len(pts) - 1, pid, dtype=np.int64))
+                    n_edges += len(pts) - 1
+                if kind == 'area':
+                    outer = np.asarray(rings[0], dtype=np.float64)[:, :2]
+                    poly_start.append(start)
+                    poly_end.append(n_edges)
+                    poly_bbox.append([outer[:, 0].min(), outer[:, 1].min(), outer[:, 0].max(), outer[:, 1].max()])
+
+        def cat(parts, dtype=np.float64):
+            return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+
+        ex0, ey0, ex1, ey1, edge_poly, first = _split_long_edges(
+            cat(xs0), cat(ys0), cat(xs1), cat(ys1), cat(edge_poly, np.int64), cell_deg)
+        arrays = {
+            'ex0': ex0, 'ey0': ey0, 'ex1': ex1, 'ey1': ey1, 'edge_poly': edge_poly,
+            'poly_start': first[np.asarray(poly_start, dtype=np.int64)],
+            'poly_end': first[np.asarray(poly_end, dtype=np.int64)],
+            'poly_bbox': np.asarray(poly_bbox, dtype=np.float64).reshape(-1, 4),
+        }
+        bbox = data.get('bbox')
+        bounds = tuple(bbox[:4]) if bbox else None
+        return cls(arrays, cell_deg=cell_deg, bounds=bounds)
+
+    @classmethod
+    def load(cls, path):
+        """Load a .geojson/.json extract, or an .npz file or directory written by save() (memory-mapped)."""
+        if os.path.isdir(path):
+            with open(os.path.join(path, META_FILE)) as f:
+                meta = json.load(f)
+            arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+                      for name in GEOMETRY_ARRAYS + GRID_ARRAYS}
+            return cls(arrays, cell_deg=meta['cell_deg'], bounds=meta['bounds'])
+        if path.endswith('.npz'):
+            with np.load(path) as z:
+                arrays = {name: z[name] for name in z.files if name not in ('cell_deg', 'bounds')}
+                return cls(arrays, cell_deg=float(z['cell_deg']), bounds=tuple(float(b) for b in z['bounds']))
+        with open(path) as f:
+            return cls.from_geojson(json.load(f))
+
+    def arrays(self):
+        """Geometry and grid bucket arrays by name, as stored by save()."""
+        grid = (self._edge_cells, self._edge_offsets, self._edge_ids,
+                self._poly_cells, self._poly_offsets, self._poly_ids)
+        return {**{name: getattr(self, name) for name in GEOMETRY_ARRAYS}, **dict(zip(GRID_ARRAYS, grid))}
+
+    def save(self, path):
+        """Write an .npz file (path ending in .npz) or a directory of memory-mappable .npy arrays."""
+        if path.endswith('.npz'):
+            np.savez(path, **self.arrays(), cell_deg=np.float64(self.cell_deg),
+                     bounds=np.asarray(self.bounds, dtype=np.float64))
+            return
+        os.makedirs(path, exist_ok=True)
+        for name, values in self.arrays().items():
+            np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(values))
+        with open(os.path.join(path, META_FILE), 'w') as f:
+            json.dump({'cell_deg': self.cell_deg, 'bounds': list(self.bounds)}, f)
+
+    @property
+    def polygons(self):
+        return len(self.poly_start)
+
+    @property
+    def edges(self):
+        return len(self.ex0)
+
+    def covers(self, lat, lon):
+        lon_min, lat_min, lon_max, lat_max = self.bounds
+        return lat_min <= lat <= lat_max and lon_min <= lon <= lon_max
+
+    def _candidates(self, cells, offsets, ids, lat_min, lat_max, lon_min, lon_max):
+        c = self.cell_deg
+        cx0 = int(math.floor((lon_min + 180.0) / c))
+        cx1 = int(math.floor((lon_max + 180.0) / c))
+        cy0 = int(math.floor((lat_min + 90.0) / c))
+        cy1 = int(math.floor((lat_max + 90.0) / c))
+        keys = (np.arange(cy0, cy1 + 1)[:, None] * self._ncols + np.arange(cx0, cx1 + 1)[None, :]).ravel()
+        pos = np.minimum(np.searchsorted(cells, keys), max(cells.size - 1, 0))
+        pos = pos[cells[pos] == keys] if cells.size else pos[:0]
+        if pos.size == 0:
+            return np.zeros(0, dtype=np.int64)
+        if pos.size == 1:
+            return ids[offsets[pos[0]]:offsets[pos[0] + 1]]
+        return np.unique(np.concatenate([ids[offsets[p]:offsets[p + 1]] for p in pos]))
+
+    def contains(self, lat, lon):
+        """True if (lat, lon) lies inside any water polygon."""
+        for pid in self._candidates(self._poly_cells, self._poly_offsets, self._poly_ids, lat, lat, lon, lon):
+            lon_min, lat_min, lon_max, lat_max = self.poly_bbox[pid]
+            if not (lon_min <= lon <= lon_max and lat_min <= lat <= lat_max):
+                continue
+            s, e = self.poly_start[pid], self.poly_end[pid]
+            x0, y0, x1, y1 = self.ex0[s:e], self.ey0[s:e], self.ex1[s:e], self.ey1[s:e]
+            # even-odd ray cast towards +lon; holes are just more rings of the same polygon
+            straddles = (y0 > lat) != (y1 > lat)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x_cross = x0 + (lat - y0) * (x1 - x0) / (y1 - y0)
+            if np.count_nonzero(straddles & (x_cross > lon)) % 2 == 1:
+                return True
+        return False
+
+    def distance_m(self, lat, lon, radius_m):
+        """Distance (m) to the nearest water edge within radius_m, or None if there is none."""
+        dlat = radius_m / METERS_PER_DEG
+        kx = METERS_PER_DEG * max(1e-6, math.cos(math.radians(lat)))
+        dlon = radius_m / kx
+        idx = self._candidates(self._edge_cells, self._edge_offsets, self._edge_ids,
+                               lat - dlat, lat + dlat, lon - dlon, lon + dlon)
+        if idx.size == 0:
+            return None
+        ax = (self.ex0[idx] - lon) * kx
+        ay = (self.ey0[idx] - lat) * METERS_PER_DEG
+        bx = (self.ex1[idx] - lon) * kx
+        by = (self.ey1[idx] - lat) * METERS_PER_DEG
+        dx = bx - ax
+        dy = by - ay
+        length2 = dx * dx + dy * dy
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.clip(np.where(length2 > 0, -(ax * dx + ay * dy) / length2, 0.0), 0.0, 1.0)
+        d = float(np.sqrt(np.min((ax + t * dx) ** 2 + (ay + t * dy) ** 2)))
+        return d if d <= radius_m else None
+
+    def any_within(self, lat, lon, radius_m):
+        """True if there is water at (lat, lon) or within radius_m of it."""
+        return self.contains(lat, lon) or self.distance_m(lat, lon, radius_m) is not None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_water_index():
+    """Return the index configured by WATER_INDEX_PATH (loaded once), or None."""
+    global _index
+    if _index is None:
+        path = os.getenv('WATER_INDEX_PATH')
+        if not path:
+            return None
+        with _index_lock:
+            if _index is None:
+                _index = WaterIndex.load(path)
+    return _index
+
+
+def set_water_index(index):
+    """Install (or clear with None) the index used by the tsunami water lookups."""
+    global _index
+    _index = index
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Convert a GeoJSON water extract to a compact index (.npz file, or a directory to memory-map).')
+    parser.add_argument('geojson')
+    parser.add_argument('out_path')
+    parser.add_argument('--cell-deg', type=float, default=DEFAULT_CELL_DEG)
+    args = parser.parse_args()
+
+    with open(args.geojson) as f:
+        index = WaterIndex.from_geojson(json.load(f), cell_deg=args.cell_deg)
+    index.save(args.out_path)
+    print(f'Wrote {index.polygons} polygons / {index.edges} edges to {args.out_path}')
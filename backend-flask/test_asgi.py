@@ -0,0 +1,113 @@
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+from models import aio
+
+
+@pytest.fixture(scope='module')
+def asgi_app():
+    with pytest.MonkeyPatch.context() as mp:
+        # importing asgi builds the Flask app; keep the feed refresher off in tests
+        mp.setenv('FEED_REFRESH_ENABLED', '0')
+        import asgi
+    return asgi.application
+
+
+def run(coro_fn):
+    async def main():
+        try:
+            return await coro_fn()
+        finally:
+            await aio.close()
+
+    return asyncio.run(main())
+
+
+def asgi_request(app, method, url, **kwargs):
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await client.request(method, url, **kwargs)
+
+    return run(send)
+
+
+def test_concurrent_cold_index_requests_share_one_build(stub_neo, stub_server, monkeypatch):
+    from models import impact
+
+    builds = []
+    build_index = impact.NEOIndex
+
+    def counting_index(neos):
+        builds.append(len(neos))
+        return build_index(neos)
+
+    monkeypatch.setattr(impact, 'NEOIndex', counting_index)
+    with stub_server.lock:
+        before = stub_server.calls['nasa']
+
+    async def requests():
+        return await asyncio.gather(*(stub_neo.aget_index('2024-06-01', '2024-06-07') for _ in range(8)))
+
+    indexes = run(requests)
+    assert builds == [7 * 12]
+    assert all(index is indexes[0] for index in indexes)
+    with stub_server.lock:
+        assert stub_server.calls['nasa'] - before == 1
+    assert run(lambda: stub_neo.aget_index('2024-06-01', '2024-06-07')) is indexes[0]
+
+
+def test_async_neo_route_matches_flask(asgi_app, client, stub_neo):
+    url = '/neo?start_date=2024-07-01&end_date=2024-07-09'
+    response = asgi_request(asgi_app, 'GET', url)
+    assert response.status_code == 200
+    assert response.headers['access-control-allow-origin'] == 'http://localhost:3000'
+    assert response.json() == client.get(url).get_json()
+
+    page = asgi_request(asgi_app, 'GET', url + '&sort=diameter&limit=3').json()
+    assert page == client.get(url + '&sort=diameter&limit=3').get_json()
+    assert asgi_request(asgi_app, 'GET', url + '&sort=mass').status_code == 400
+
+
+def test_async_tsunami_route_matches_flask(asgi_app, client, tmp_path, monkeypatch):
+    from models import geocache, tsunami
+    from models.raster import build_raster
+
+    grid = np.array([[-500.0, -500.0], [120.0, 120.0]], dtype=np.float32)
+    monkeypatch.setenv('TSUNAMI_NETWORK_FALLBACK', '0')
+    monkeypatch.setattr(tsunami, '_raster', build_raster(grid, 0.0, 1.0, 0.0, 1.0, str(tmp_path)))
+    monkeypatch.setattr(geocache, '_water_cache', geocache.WaterCache())
+    for lat in (0.0, 1.0, 5.0):
+        body = {'lat': lat, 'lon': 0.5, 'energy_megatons': 20.0}
+        response = asgi_request(asgi_app, 'POST', '/tsunami', json=body)
+        assert response.status_code == 200
+        assert response.json() == client.post('/tsunami', json=body).get_json()
+    assert asgi_request(asgi_app, 'POST', '/tsunami', content=b'{"lat": "x"}').status_code == 400
+
+
+def test_other_routes_fall_through_to_flask(asgi_app, client):
+    body = {'diameter_m': 120.0, 'relative_velocity_m_s': 18000.0, 'lead_time_days': 1000.0}
+    response = asgi_request(asgi_app, 'POST', '/deflect', json=body)
+    assert response.status_code == 200
+    assert response.json() == client.post('/deflect', json=body).get_json()
+
+
+def test_async_water_lookup_matches_sync(stub_server, monkeypatch):
+    from models import geocache, tsunami, tsunami_async
+
+    url = stub_server.env()['GOOGLE_ELEVATION_URL']
+    monkeypatch.setenv('TSUNAMI_NETWORK_FALLBACK', '1')
+    monkeypatch.setattr(tsunami, '_raster', None)
+    monkeypatch.setattr(tsunami, 'GOOGLE_ELEVATION_URL', url)
+    monkeypatch.setattr(tsunami_async, 'GOOGLE_ELEVATION_URL', url)
+    points = [(-30.0, -140.0), (10.0, -150.0), (-45.0, 60.0)]
+
+    monkeypatch.setattr(geocache, '_water_cache', geocache.WaterCache())
+    sync = tsunami.get_google_elevations(points, api_key='BENCH')
+    monkeypatch.setattr(geocache, '_water_cache', geocache.WaterCache())
+    result = run(lambda: tsunami_async.get_google_elevations(points, api_key='BENCH'))
+    assert result == sync
+    assert all(v is not None for v in result)
@@ -0,0 +1,245 @@
+import threading
+import time
+
+import pytest
+
+from bench.stubs import StubServer
+from models.cache import TieredCache
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class CountingLoader:
+    def __init__(self, delay_s=0.0):
+        self.calls = 0
+        self.delay_s = delay_s
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        time.sleep(self.delay_s)
+        return {'version': calls}
+
+
+def wait_for(predicate, timeout_s=5.0):
+    deadline = time.monotonic() + timeout_s
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.005)
+
+
+def test_fresh_entries_are_served_from_memory():
+    clock = Clock()
+    cache = TieredCache(ttl=10.0, clock=clock)
+    load = CountingLoader()
+    assert cache.get('k', load) == {'version': 1}
+    clock.now += 10.0
+    assert cache.get('k', load) == {'version': 1}
+    assert load.calls == 1
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_stale_entry_is_served_while_refreshing_in_background():
+    clock = Clock()
+    cache = TieredCache(ttl=10.0, stale_ttl=5.0, clock=clock)
+    load = CountingLoader()
+    cache.get('k', load)
+    clock.now += 12.0
+    assert cache.get('k', load) == {'version': 1}
+    wait_for(lambda: cache.stats()['refreshes'] == 1)
+    assert cache.stats()['stale_hits'] == 1
+    assert cache.get('k', load) == {'version': 2}
+
+
+def test_entry_past_stale_window_is_reloaded_inline():
+    clock = Clock()
+    cache = TieredCache(ttl=10.0, stale_ttl=5.0, clock=clock)
+    load = CountingLoader()
+    cache.get('k', load)
+    clock.now += 15.1
+    assert cache.get('k', load) == {'version': 2}
+    assert cache.stats()['stale_hits'] == 0
+
+
+def test_per_key_ttl():
+    clock = Clock()
+    cache = TieredCache(ttl=lambda key: 100.0 if key.startswith('past') else 1.0, clock=clock)
+    load = CountingLoader()
+    cache.get('past:1', load)
+    cache.get('today:1', load)
+    clock.now += 50.0
+    cache.get('past:1', load)
+    cache.get('today:1', load)
+    assert load.calls == 3
+
+
+def test_loader_errors_are_not_cached():
+    cache = TieredCache(ttl=10.0)
+
+    def fail():
+        raise RuntimeError('upstream down')
+
+    with pytest.raises(RuntimeError):
+        cache.get('k', fail)
+    assert cache.get('k', lambda: 'ok') == 'ok'
+
+
+def test_persistent_tier_survives_a_new_instance(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    clock = Clock()
+    TieredCache(path=path, ttl=10.0, clock=clock).get('k', lambda: [1, 2, 3])
+    cache = TieredCache(path=path, ttl=10.0, clock=clock)
+    assert cache.get('k', CountingLoader()) == [1, 2, 3]
+    assert cache.stats()['disk_hits'] == 1
+    assert cache.age('k') == 0.0
+
+
+def test_persistent_tier_sweeps_expired_rows(tmp_path):
+    clock = Clock()
+    cache = TieredCache(path=str(tmp_path / 'cache.sqlite'), ttl=10.0, stale_ttl=5.0, clock=clock)
+    cache.store.sweep_every = 4
+    for k in range(3):
+        cache.get(f'old:{k}', CountingLoader())
+    clock.now += 16.0
+    cache.get('new:0', CountingLoader())
+    assert len(cache.store) == 1
+    assert cache.store.get('old:0') is None
+    assert cache.store.get('new:0') is not None
+
+
+def test_persistent_tier_is_capped_at_max_rows(tmp_path):
+    clock = Clock()
+    cache = TieredCache(path=str(tmp_path / 'cache.sqlite'), ttl=1e9, clock=clock, max_rows=10)
+    cache.store.sweep_every = 5
+    for k in range(25):
+        clock.now += 1.0
+        cache.get(f'k{k}', CountingLoader())
+    assert len(cache.store) == 10
+    assert cache.store.get('k14') is None
+    assert cache.store.get('k15') is not None
+
+
+def test_store_adds_expiry_column_to_existing_tables(tmp_path):
+    import sqlite3
+
+    from models.cache import SQLiteStore
+
+    path = str(tmp_path / 'old.sqlite')
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)')
+        conn.execute("INSERT INTO cache VALUES ('k', '1', 5.0)")
+    store = SQLiteStore(path, max_rows=1)
+    assert store.get('k') == (1, 5.0)
+    store.set('k2', 2, stored_at=6.0, expires_at=7.0)
+    assert store.sweep(now=6.5) == 1
+    assert store.get('k') is None
+    assert store.sweep(now=8.0) == 1
+    assert len(store) == 0
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TieredCache(ttl=10.0)
+    load = CountingLoader(delay_s=0.1)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(cache.get('k', load))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert load.calls == 1
+    assert results == [{'version': 1}] * 8
+    assert cache.stats()['shared_loads'] == 7
+
+
+@pytest.fixture(scope='module')
+def stubs():
+    server = StubServer({'nasa': 0.05}).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def neo_client(stubs, monkeypatch):
+    from models.impact import NEO
+
+    for name, value in stubs.env().items():
+        monkeypatch.setenv(name, value)
+
+    def make(clock):
+        from models.impact import STALE_TTL_S, _ttl_for_key
+
+        return NEO(cache=TieredCache(ttl=_ttl_for_key, stale_ttl=STALE_TTL_S, clock=clock, name='neo'))
+    return make
+
+
+def nasa_calls(stubs):
+    with stubs.lock:
+        return stubs.calls['nasa']
+
+
+def test_neo_feed_is_fetched_once_per_window(stubs, neo_client):
+    neo = neo_client(Clock(time.time()))
+    before = nasa_calls(stubs)
+    first = neo.get_neos('2024-01-01', '2024-01-07')
+    assert neo.get_neos('2024-01-01', '2024-01-07') == first
+    assert len(first) == 7 * 12
+    assert nasa_calls(stubs) - before == 1
+
+
+def test_neo_feed_concurrent_requests_share_one_fetch(stubs, neo_client):
+    neo = neo_client(Clock(time.time()))
+    before = nasa_calls(stubs)
+    barrier = threading.Barrier(6)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(len(neo.get_neos('2024-02-01', '2024-02-07')))
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [7 * 12] * 6
+    assert nasa_calls(stubs) - before == 1
+
+
+def test_neo_feed_stale_window_is_served_then_refreshed(stubs, neo_client):
+    from models.impact import PAST_DAY_TTL_S
+
+    clock = Clock(time.time())
+    neo = neo_client(clock)
+    before = nasa_calls(stubs)
+    neo.get_neos('2024-03-01', '2024-03-07')
+    clock.now += PAST_DAY_TTL_S + 60.0
+    assert len(neo.get_neos('2024-03-01', '2024-03-07')) == 7 * 12
+    wait_for(lambda: neo.cache.stats()['refreshes'] == 1)
+    assert nasa_calls(stubs) - before == 2
+
+
+def test_neo_route_serves_repeat_windows_from_the_cache(client, stub_server, stub_neo):
+    before = nasa_calls(stub_server)
+    first = client.get('/neo?start_date=2024-04-01&end_date=2024-04-03')
+    second = client.get('/neo?start_date=2024-04-01&end_date=2024-04-03')
+    assert first.status_code == second.status_code == 200
+    assert first.get_json() == second.get_json()
+    assert len(first.get_json()) == 3 * 12
+    assert nasa_calls(stub_server) - before == 1
+    stats = client.get('/neo/cache').get_json()
+    assert stats['hits'] == 1 and stats['misses'] == 1
@@ -0,0 +1,107 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from models import campaign
+from models.campaign import MAX_VEHICLES, axis_values, optimize_campaign, pareto_mask, resolve_vehicles
+
+
+def brute_force_pareto(cost, launches, miss):
+    c, n, m = (np.asarray(a, dtype=np.float64) for a in (cost, launches, miss))
+    no_worse = (c[:, None] <= c[None, :]) & (n[:, None] <= n[None, :]) & (m[:, None] >= m[None, :])
+    better = (c[:, None] < c[None, :]) | (n[:, None] < n[None, :]) | (m[:, None] > m[None, :])
+    return ~(no_worse & better).any(axis=0)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_pareto_sweep_matches_pairwise_dominance(seed):
+    rng = np.random.default_rng(seed)
+    size = 400
+    # few distinct values, so ties and exact duplicates are common
+    cost = rng.integers(0, 20, size) * 1e6
+    launches = rng.integers(1, 10, size)
+    miss = rng.integers(0, 15, size).astype(np.float64)
+    miss[rng.random(size) < 0.05] = -np.inf
+    np.testing.assert_array_equal(pareto_mask(cost, launches, miss), brute_force_pareto(cost, launches, miss))
+
+
+def test_pareto_of_duplicates_and_empty_input():
+    assert pareto_mask([1.0, 1.0], [2, 2], [3.0, 3.0]).tolist() == [True, True]
+    assert pareto_mask([], [], []).tolist() == []
+
+
+def test_front_is_sorted_and_non_dominated():
+    result = optimize_campaign(300.0, 3650.0, max_launches=20)
+    front = result['pareto_front']
+    assert front and result['feasible_groups'] >= len(front)
+    costs = [c['estimated_cost_usd'] for c in front]
+    assert costs == sorted(costs)
+    for a in front:
+        for b in front:
+            assert not (b['estimated_cost_usd'] <= a['estimated_cost_usd'] and b['launches'] <= a['launches']
+                        and b['miss_distance_m'] > a['miss_distance_m'])
+    cheapest = result['cheapest_deflection']
+    assert cheapest['deflects'] and cheapest['miss_distance_m'] >= result['distance_shift_m']
+    assert all(not c['deflects'] for c in front if c['estimated_cost_usd'] < cheapest['estimated_cost_usd'])
+
+
+def test_pool_and_inline_searches_agree(monkeypatch):
+    kwargs = dict(max_launches=30, launch_days={'start': 0, 'stop': 3000, 'num': 400})
+    inline = optimize_campaign(500.0, 4000.0, **kwargs)
+    monkeypatch.setattr(campaign, 'CHUNK_CANDIDATES', 20_000)
+    monkeypatch.setattr(campaign, 'POOL_MIN_CANDIDATES', 0)
+    with ThreadPoolExecutor(2) as pool:
+        assert optimize_campaign(500.0, 4000.0, pool=pool, **kwargs) == inline
+
+
+def test_vehicle_tables():
+    assert set(resolve_vehicles()) == set(campaign.VEHICLES)
+    custom = resolve_vehicles({'falcon_9': {'cost_per_launch_usd': 1.0}, 'cheap': {'payload_kg': 1000.0,
+                                                                                     'cost_per_launch_usd': 2.0}})
+    assert custom['falcon_9']['payload_kg'] == campaign.VEHICLES['falcon_9']['payload_kg']
+    assert custom['cheap']['ready_days'] == 0.0
+    with pytest.raises(ValueError, match='At most'):
+        resolve_vehicles({f'v{k}': {'payload_kg': 1.0, 'cost_per_launch_usd': 1.0} for k in range(MAX_VEHICLES + 1)})
+    with pytest.raises(ValueError):
+        resolve_vehicles(['saturn_v'])
+    with pytest.raises(ValueError):
+        resolve_vehicles({'x': {'payload_kg': 1.0}})
+
+
+def test_axis_values():
+    assert axis_values(5.0, 'a').tolist() == [5.0]
+    assert axis_values({'start': 0, 'stop': 1, 'num': 3}, 'a').tolist() == [0.0, 0.5, 1.0]
+    # the size check runs before the array is allocated
+    with pytest.raises(ValueError, match='more than'):
+        axis_values({'start': 0, 'stop': 1, 'num': 10 ** 12}, 'a')
+    with pytest.raises(ValueError):
+        axis_values({'start': 0, 'stop': 1, 'num': 0}, 'a')
+    with pytest.raises(ValueError):
+        axis_values({'start': 0, 'stop': 1, 'step': 0.1}, 'a')
+
+
+def test_optimize_route(client):
+    body = {'diameter_m': 300.0, 'warning_time_days': 3650.0, 'max_launches': 10,
+            'vehicles': ['falcon_9', 'falcon_heavy'], 'impactor_velocity_m_s': [6000.0, 10000.0]}
+    result = client.post('/deflect/optimize', json=body).get_json()
+    direct = optimize_campaign(300.0, 3650.0, max_launches=10, vehicles=['falcon_9', 'falcon_heavy'],
+                               impactor_velocity_m_s=[6000.0, 10000.0])
+    assert result['pareto_front'] == direct['pareto_front']
+    assert result['candidates_evaluated'] == 2 * 10 * campaign.DEFAULT_LAUNCH_DAY_POINTS * 2
+    assert client.post('/deflect/optimize', json={**body, 'workers': 8}).get_json() == result
+
+
+@pytest.mark.parametrize('body', [
+    {'diameter_m': 300.0},
+    {'diameter_m': 300.0, 'warning_time_days': 3650.0, 'speed': 1},
+    {'diameter_m': 300.0, 'warning_time_days': -1},
+    {'diameter_m': 300.0, 'warning_time_days': 3650.0, 'max_launches': 1000},
+    {'diameter_m': 300.0, 'warning_time_days': 3650.0, 'launch_days': {'start': 0, 'stop': 1, 'num': 10 ** 9}},
+    {'diameter_m': 300.0, 'warning_time_days': 3650.0,
+     'vehicles': {f'v{k}': {'payload_kg': 1.0, 'cost_per_launch_usd': 1.0} for k in range(MAX_VEHICLES + 1)}},
+])
+def test_optimize_route_rejects_bad_requests(client, body):
+    response = client.post('/deflect/optimize', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
@@ -1,8 +1,118 @@
-from models.deflection import estimate_deflection
+import itertools
+import json
+
+import numpy as np
+import pytest
+
+from models.deflection import (
+    deflection_parameter_grid,
+    estimate_deflection,
+    estimate_deflection_batch,
+    iter_deflection_grid,
+)
+
+BATCH_KEYS = ('asteroid_mass_kg', 'required_delta_v_m_s', 'impactor_mass_kg', 'launches_required',
+              'estimated_cost_usd')
+
+
+def test_batch_matches_scalar_bit_for_bit():
+    axes = {
+        'diameter_m': [10.0, 73.5, 150.0, 1000.0],
+        'lead_time_days': [0.0, 0.5, 30.0, 3650.0],
+        'impactor_velocity_m_s': [3000.0, 10000.0],
+        'beta': [1.0, 2.7],
+        'density_kg_m3': [1500.0, 2700.0],
+    }
+    grid, shape = deflection_parameter_grid(**axes)
+    batch = estimate_deflection_batch(relative_velocity_m_s=20000.0, **grid)
+    assert shape == (4, 4, 2, 2, 2)
+    for k, combo in enumerate(itertools.product(*axes.values())):
+        scalar = estimate_deflection(relative_velocity_m_s=20000.0, **dict(zip(axes, combo)))
+        for key in BATCH_KEYS:
+            assert batch[key][k] == scalar[key], (combo, key)
+
+
+def test_batch_broadcasts_scalars_and_arrays():
+    batch = estimate_deflection_batch(diameter_m=np.array([[50.0], [100.0]]), relative_velocity_m_s=20000.0,
+                                      lead_time_days=np.array([365.0, 730.0, 3650.0]))
+    assert batch['launches_required'].shape == (2, 3)
+    scalar = estimate_deflection(100.0, 20000.0, 730.0)
+    assert batch['launches_required'][1, 1] == scalar['launches_required']
+
+
+def test_batch_infinite_instead_of_overflow():
+    batch = estimate_deflection_batch(diameter_m=100.0, relative_velocity_m_s=20000.0, lead_time_days=365.0,
+                                      beta=np.array([0.0, 1.0]), payload_per_launch_kg=np.array([22800.0, 0.0]))
+    assert np.isinf(batch['launches_required']).all()
+
+
+def test_grid_slices_cover_the_grid_in_order():
+    axes = {'diameter_m': [1.0, 2.0, 3.0], 'beta': [1.0, 2.0], 'lead_time_days': [10.0, 20.0, 30.0, 40.0]}
+    grid, _ = deflection_parameter_grid(**axes)
+    slices = list(iter_deflection_grid(axes, chunk_size=5))
+    assert [start for start, _ in slices] == [0, 5, 10, 15, 20]
+    for name in axes:
+        np.testing.assert_array_equal(np.concatenate([s[name] for _, s in slices]), grid[name])
+
+
+def test_batch_route_columns_match_scalar_route(client):
+    body = {'columns': {'diameter_m': [50.0, 100.0, 400.0]}, 'relative_velocity_m_s': 20000.0,
+            'lead_time_days': 3650.0, 'beta': 2.0}
+    batch = client.post('/deflect/batch', json=body).get_json()
+    assert batch['count'] == 3
+    for k, diameter in enumerate(body['columns']['diameter_m']):
+        scalar = client.post('/deflect', json={'diameter_m': diameter, 'relative_velocity_m_s': 20000.0,
+                                               'lead_time_days': 3650.0, 'beta': 2.0}).get_json()
+        for key in BATCH_KEYS:
+            assert batch['results'][key][k] == scalar[key]
+
+
+def test_batch_route_grid_layout(client):
+    body = {'grid': {'diameter_m': [50.0, 100.0], 'lead_time_days': [365.0, 730.0, 3650.0]}}
+    response = client.post('/deflect/batch', json=body).get_json()
+    assert response['axes'] == ['diameter_m', 'lead_time_days']
+    assert response['shape'] == [2, 3]
+    assert response['count'] == 6
+    launches = np.array(response['results']['launches_required']).reshape(2, 3)
+    assert launches[1, 0] == estimate_deflection(100.0, 0.0, 365.0)['launches_required']
+
+
+def test_batch_route_overflow_is_null(client):
+    body = {'columns': {'diameter_m': [100.0, 1e120]}, 'lead_time_days': 365.0}
+    response = client.post('/deflect/batch', json=body)
+    assert response.status_code == 200
+    assert b'Infinity' not in response.data and b'NaN' not in response.data
+    results = response.get_json()['results']
+    assert results['launches_required'][0] > 0
+    assert results['launches_required'][1] is None
+
+
+@pytest.mark.parametrize('body', [
+    {'grid': {'diameter_m': list(range(2000)), 'lead_time_days': list(range(1, 1001))}},
+    {'columns': {'beta': [1.0, 0.0]}},
+    {'payload_per_launch_kg': -1.0},
+    {'columns': {'diameter_m': [1.0]}, 'grid': {'beta': [1.0]}},
+    {'mass': 1.0},
+])
+def test_batch_route_rejects_bad_requests(client, body):
+    response = client.post('/deflect/batch', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_batch_route_streams_ndjson(client):
+    body = {'grid': {'diameter_m': [100.0, 200.0], 'beta': [1.0, 2.0]}, 'lead_time_days': 365.0}
+    response = client.post('/deflect/batch', json=body, headers={'Accept': 'application/x-ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['X-Total-Count'] == '4'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['index'] for row in rows] == [0, 1, 2, 3]
+    plain = client.post('/deflect/batch', json=body).get_json()
+    assert [row['launches_required'] for row in rows] == plain['results']['launches_required']
+
 
 if __name__ == '__main__':
     # Example: 100-meter diameter, relative speed 20 km/s, lead time 10 years
     res = estimate_deflection(diameter_m=100.0, relative_velocity_m_s=20000.0, lead_time_days=365*10,
                               impactor_velocity_m_s=11000.0, beta=2.0, cost_per_launch_usd=50_000_000)
-    import json
     print(json.dumps(res, indent=2))
@@ -0,0 +1,172 @@
+import base64
+import gzip
+import math
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from models import effects
+from models.effects import TILE_SIZE
+
+LAT, LON, ENERGY_MT = 40.7, -74.0, 100.0
+
+
+def read_png(data):
+    """(pixels, chunk types) of an unfiltered 8-bit PNG as written by models.png."""
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    pos, chunks = 8, {}
+    while pos < len(data):
+        length, = struct.unpack('>I', data[pos:pos + 4])
+        kind = data[pos + 4:pos + 8]
+        chunks[kind] = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+    width, height = struct.unpack('>II', chunks[b'IHDR'][:8])
+    rows = np.frombuffer(zlib.decompress(chunks[b'IDAT']), dtype=np.uint8).reshape(height, width + 1)
+    assert not rows[:, 0].any()
+    return rows[:, 1:], set(chunks)
+
+
+def tile_for(lat, lon, z):
+    n = 2 ** z
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return x, y
+
+
+@pytest.fixture
+def s():
+    return effects.scenario(ENERGY_MT, LAT, LON)
+
+
+def test_scenario_derives_the_impactor():
+    s = effects.scenario(1.0, 10.0, 190.0)
+    assert s['lon'] == pytest.approx(-170.0)
+    mass = 2.0 * s['energy_j'] / s['velocity_m_s'] ** 2
+    assert effects.DEFAULT_IMPACTOR_DENSITY * math.pi / 6.0 * s['impactor_diameter_m'] ** 3 == pytest.approx(mass)
+    given = effects.scenario(1.0, 10.0, 0.0, diameter_m=s['impactor_diameter_m'])
+    assert given['velocity_m_s'] == pytest.approx(effects.DEFAULT_VELOCITY_M_S)
+    for bad in ({'energy_megatons': 0.0, 'lat': 0.0, 'lon': 0.0}, {'energy_megatons': 1.0, 'lat': 91.0, 'lon': 0.0}):
+        with pytest.raises(ValueError):
+            effects.scenario(**bad)
+
+
+def test_ring_radii_hit_their_thresholds(s):
+    rings = effects.ring_radii(s)
+    for label, threshold in effects.OVERPRESSURE_RINGS_PA:
+        assert effects.overpressure_pa(rings['overpressure'][label], s) == pytest.approx(threshold, rel=1e-6)
+    radii = list(rings['overpressure'].values())
+    assert radii == sorted(radii, reverse=True)
+    assert rings['crater']['final_crater_radius'] == s['final_crater_m'] / 2.0
+
+
+def test_quantize_and_decode(s):
+    spec = effects.LAYERS['overpressure']
+    values = np.array([spec['min'] / 2, spec['min'], 1e5, spec['max'], spec['max'] * 10])
+    codes = effects.quantize(values, 'overpressure')
+    assert codes[0] == 0 and codes[1] == 1 and codes[3] == 255 and codes[4] == 255
+    scale = effects.scale_info('overpressure')
+    decoded = 10 ** (scale['log10_min'] + (codes[2] - 1) / 254 * (scale['log10_max'] - scale['log10_min']))
+    step = (scale['log10_max'] - scale['log10_min']) / 254
+    assert abs(math.log10(decoded) - 5.0) <= step
+
+
+def test_tile_matches_the_layer_function(s):
+    z = 8
+    x, y = tile_for(LAT, LON, z)
+    codes = effects.render_tile(s, 'overpressure', z, x, y)
+    assert codes.shape == (TILE_SIZE, TILE_SIZE)
+    south, north, west, east = effects.tile_bounds(z, x, y)
+    # pixel (row, col) centre
+    row, col = 100, 37
+    lon = west + (col + 0.5) / TILE_SIZE * (east - west)
+    n = 2 ** z
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * (y + (row + 0.5) / TILE_SIZE) / n))))
+    expected = effects.quantize(effects.overpressure_pa(effects.haversine_m(LAT, LON, lat, lon), s), 'overpressure')
+    assert codes[row, col] == expected
+
+
+def test_far_tiles_are_empty(s):
+    assert effects.render_tile(s, 'overpressure', 10, *tile_for(-40.0, 100.0, 10)) is None
+    with pytest.raises(ValueError):
+        effects.render_tile(s, 'overpressure', 3, 8, 0)
+
+
+def test_tiles_are_cached_and_encoded(s):
+    z = 6
+    x, y = tile_for(LAT, LON, z)
+    png = effects.get_tile(s, 'thermal', z, x, y, 'png')
+    assert effects.get_tile(s, 'thermal', z, x, y, 'png') is png
+    pixels, chunks = read_png(png)
+    assert {b'PLTE', b'tRNS'} <= chunks
+    raw = np.frombuffer(effects.get_tile(s, 'thermal', z, x, y, 'u8'), dtype=np.uint8).reshape(TILE_SIZE, TILE_SIZE)
+    np.testing.assert_array_equal(pixels, raw)
+    np.testing.assert_array_equal(raw, effects.render_tile(s, 'thermal', z, x, y))
+    with pytest.raises(ValueError):
+        effects.get_tile(s, 'radiation', z, x, y)
+
+
+def test_grid_and_default_bounds(s):
+    bounds = effects.default_bounds(s, ['overpressure'])
+    grid = effects.render_grid(s, ['overpressure'], bounds, 41, 61)['overpressure']
+    # the box fits the visible radius, so its edges are below the floor
+    assert effects.quantize(grid[0], 'overpressure').max() == 0
+    assert effects.quantize(grid[:, 0], 'overpressure').max() == 0
+    assert grid[20, 30] == grid.max()
+    assert effects.grid_shape_for_zoom(bounds, 4) < effects.grid_shape_for_zoom(bounds, 6)
+
+
+BODY = {'lat': LAT, 'lon': LON, 'energy_megatons': ENERGY_MT}
+
+
+def test_field_route_encodings(client, s):
+    bounds = {'lat_min': 40.0, 'lat_max': 41.5, 'lon_min': -75.0, 'lon_max': -73.0}
+    field = client.post('/impact/field', json={**BODY, 'bounds': bounds, 'rows': 30, 'cols': 40,
+                                                'layers': ['overpressure', 'crater'], 'encoding': 'float32'}).get_json()
+    assert field['shape'] == [30, 40] and set(field['layers']) == {'overpressure', 'crater'}
+    values = np.frombuffer(base64.b64decode(field['layers']['overpressure']['data']), dtype='<f4').reshape(30, 40)
+    direct = effects.render_grid(s, ['overpressure'], bounds, 30, 40)['overpressure']
+    np.testing.assert_allclose(values, direct, rtol=1e-6)
+
+    png = client.post('/impact/field', json={**BODY, 'bounds': bounds, 'rows': 30, 'cols': 40}).get_json()
+    pixels, _ = read_png(base64.b64decode(png['layers']['thermal']['data']))
+    assert pixels.shape == (30, 40)
+    assert png['rings'] == field['rings']
+    zoomed = client.post('/impact/field', json={**BODY, 'zoom': 5, 'layers': ['crater']}).get_json()
+    assert zoomed['shape'] == list(effects.grid_shape_for_zoom(zoomed['bounds'], 5))
+
+
+@pytest.mark.parametrize('body', [
+    {'lat': LAT, 'lon': LON},
+    {**BODY, 'rows': 5000},
+    {**BODY, 'layers': ['radiation']},
+    {**BODY, 'encoding': 'jpeg'},
+    {**BODY, 'bounds': {'lat_min': 41.0, 'lat_max': 40.0, 'lon_min': -75.0, 'lon_max': -73.0}},
+    {**BODY, 'bounds': {'lat_min': 40.0}},
+    {**BODY, 'energy_megatons': -1.0},
+])
+def test_field_route_rejects_bad_requests(client, body):
+    response = client.post('/impact/field', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_tile_route(client, s):
+    z = 7
+    x, y = tile_for(LAT, LON, z)
+    query = f'lat={LAT}&lon={LON}&energy_megatons={ENERGY_MT}'
+    png = client.get(f'/impact/field/{z}/{x}/{y}.png?{query}')
+    assert png.mimetype == 'image/png' and 'immutable' in png.headers['Cache-Control']
+    assert png.get_data() == effects.get_tile(s, 'overpressure', z, x, y, 'png')
+    assert client.get(f'/impact/field/{z}/{x}/{y}.png?{query}',
+                      headers={'If-None-Match': png.headers['ETag']}).status_code == 304
+
+    u8 = client.get(f'/impact/field/{z}/{x}/{y}.u8?{query}&layer=crater', headers={'Accept-Encoding': 'gzip'})
+    assert u8.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(u8.get_data()) == effects.get_tile(s, 'crater', z, x, y, 'u8')
+    assert client.get('/impact/cache').get_json()['tiles'] >= 2
+
+    assert client.get(f'/impact/field/{z}/{x}/{y}.jpg?{query}').status_code == 400
+    assert client.get(f'/impact/field/2/9/0.png?{query}').status_code == 400
+    assert client.get(f'/impact/field/{z}/{x}/{y}.png?lat={LAT}').status_code == 400
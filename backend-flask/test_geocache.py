@@ -0,0 +1,92 @@
+import json
+
+import numpy as np
+import pytest
+
+from models.geocache import WaterCache, geohash_encode
+from models.raster import synthetic_elevation
+
+
+def test_geohash_encode():
+    assert geohash_encode(57.64911, 10.40744, 11) == 'u4pruydqqvj'
+    assert geohash_encode(57.64911, 10.40744, 5) == 'u4pru'
+
+
+def test_points_in_one_cell_share_an_entry():
+    cache = WaterCache(precision=7)
+    cache.put('water', 40.00010, -70.00010, is_water=True, elevation_m=-30.0, provenance='google')
+    assert cache.get('water', 40.00012, -70.00012)['elevation_m'] == -30.0
+    assert cache.get('osm', 40.00010, -70.00010) is None
+    assert cache.get('water', 40.01, -70.01) is None
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 2 and stats['stores'] == 1
+
+
+def test_persistent_cells_survive_a_new_instance(tmp_path):
+    path = str(tmp_path / 'cells.sqlite')
+    WaterCache(path=path).put('water', 10.0, 20.0, is_water=False, elevation_m=12.0, provenance='google')
+    cache = WaterCache(path=path)
+    assert cache.get('water', 10.0, 20.0)['is_water'] is False
+    assert cache.stats()['disk_hits'] == 1
+
+
+def test_persistent_cells_are_capped(tmp_path):
+    cache = WaterCache(path=str(tmp_path / 'cells.sqlite'), max_rows=5)
+    cache.store.sweep_every = 10
+    for k in range(30):
+        cache.put('water', 0.01 * k, 0.0, is_water=True)
+    assert len(cache.store) == 5
+
+
+def test_prewarm_exact_and_coarse_cells(tmp_path):
+    path = tmp_path / 'prewarm.ndjson'
+    records = [
+        {'lat': 40.0, 'lon': -70.0, 'is_water': True, 'elevation_m': -50.0},
+        {'geohash': 'dr5', 'is_water': False, 'provenance': 'coarse'},
+        {'geohash': 'dr5r', 'is_water': True, 'provenance': 'finer'},
+        {'geohash': geohash_encode(41.0, -71.0, 9), 'is_water': True, 'kind': 'osm'},
+    ]
+    path.write_text('\n'.join(json.dumps(r) for r in records) + '\n')
+    cache = WaterCache(precision=7)
+    assert cache.prewarm(str(path)) == 4
+    assert cache.get('water', 40.0, -70.0)['elevation_m'] == -50.0
+    assert cache.get('osm', 41.0, -71.0)['is_water'] is True
+    # the longest matching prefix answers for every cell under it
+    lat, lon = 40.75, -73.98
+    assert geohash_encode(lat, lon, 4) == 'dr5r'
+    assert cache.get('water', lat, lon)['provenance'] == 'finer'
+    assert geohash_encode(40.0, -74.0, 4) == 'dr57'
+    assert cache.get('water', 40.0, -74.0)['provenance'] == 'coarse'
+    assert cache.get('water', 10.0, 10.0) is None
+    assert cache.stats()['prefix_hits'] == 2
+    assert cache.stats()['prefix_cells'] == 2
+
+
+@pytest.fixture
+def network_water(stub_server, monkeypatch):
+    from models import geocache, tsunami
+
+    monkeypatch.setenv('TSUNAMI_NETWORK_FALLBACK', '1')
+    monkeypatch.setattr(tsunami, '_raster', None)
+    monkeypatch.setattr(tsunami, 'GOOGLE_ELEVATION_URL', stub_server.env()['GOOGLE_ELEVATION_URL'])
+    monkeypatch.setattr(geocache, '_water_cache', WaterCache())
+    monkeypatch.setenv('GOOGLE_ELEVATION_API_KEY', 'BENCH')
+    return stub_server
+
+
+def test_network_answers_are_cached_per_cell(client, network_water):
+    lats, lons = np.meshgrid(np.arange(-50.0, 51.0, 10.0), np.arange(-170.0, 171.0, 20.0))
+    elevations = synthetic_elevation(lats.ravel(), lons.ravel())
+    k = int(np.argmin(elevations))
+    lat, lon = float(lats.ravel()[k]), float(lons.ravel()[k])
+    with network_water.lock:
+        before = network_water.calls['google']
+    first = client.post('/tsunami', json={'lat': lat, 'lon': lon, 'energy_megatons': 50.0}).get_json()
+    again = client.post('/tsunami', json={'lat': lat + 1e-5, 'lon': lon, 'energy_megatons': 50.0}).get_json()
+    with network_water.lock:
+        assert network_water.calls['google'] - before == 1
+    assert first['is_water'] is True and again['is_water'] is True
+    assert again['elevation_m'] == first['elevation_m']
+    stats = client.get('/tsunami/cache').get_json()
+    assert stats['hits'] == 1
+    assert 'estimate_memo' in stats
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from models import metrics
+from models.metrics import SamplingProfiler
+
+
+def test_spans_are_rendered_as_prometheus_histograms():
+    with metrics.span('test.work', provider='unit'):
+        pass
+    with pytest.raises(RuntimeError):
+        with metrics.span('test.work', provider='unit'):
+            raise RuntimeError('boom')
+    text = metrics.render_prometheus(['extra_line 1'])
+    assert 'backend_span_seconds_count{span="test.work",outcome="ok",provider="unit"}' in text
+    assert 'backend_span_seconds_count{span="test.work",outcome="error",provider="unit"}' in text
+    assert text.endswith('extra_line 1\n')
+
+
+def test_collected_spans_include_worker_threads():
+    def inner():
+        with metrics.span('test.inner'):
+            pass
+
+    token = metrics.start_collecting()
+    try:
+        with metrics.span('test.outer'):
+            worker = threading.Thread(target=metrics.run_in_context(inner))
+            worker.start()
+            worker.join()
+        collected = metrics.collected()
+    finally:
+        metrics.stop_collecting(token)
+    assert collected['test.outer'][1] == 1 and collected['test.inner'][1] == 1
+    header = metrics.server_timing_header(collected, 0.5)
+    assert header.startswith('test.') and header.endswith('total;dur=500.00')
+
+
+def test_server_timing_is_opt_in(client, stub_neo):
+    url = '/neo?start_date=2024-09-01&end_date=2024-09-03&sort=energy'
+    assert 'Server-Timing' not in client.get(url).headers
+    timing = client.get(url + '&server_timing=1').headers['Server-Timing']
+    assert 'neo_index.NEOIndex.query;dur=' in timing and 'total;dur=' in timing
+    assert 'Server-Timing' in client.get(url, headers={'X-Server-Timing': '1'}).headers
+    assert 'backend_request_seconds_count{method="GET",route="/neo",status="200"}' in client.get('/metrics').get_data(
+        as_text=True)
+
+
+def test_profiler_collects_collapsed_stacks():
+    profiler = SamplingProfiler(interval_s=0.001)
+    stop = threading.Event()
+    busy = threading.Thread(target=stop.wait)
+    busy.start()
+    profiler.start()
+    try:
+        time.sleep(0.05)
+    finally:
+        profiler.stop()
+        stop.set()
+        busy.join()
+    assert profiler.status()['samples'] > 0 and not profiler.running
+    top = profiler.collapsed(1)
+    assert top.count('\n') == 1 and int(top.split()[-1]) > 0
+    profiler.reset()
+    assert profiler.collapsed() == ''
+
+
+def test_profiler_rejects_intervals_below_a_millisecond():
+    with pytest.raises(ValueError):
+        SamplingProfiler(interval_s=0.0001)
+    profiler = SamplingProfiler()
+    with pytest.raises(ValueError):
+        profiler.start(0.0)
+    assert not profiler.running
+
+
+def test_profiler_route_is_off_by_default(client, monkeypatch):
+    monkeypatch.delenv('PROFILER_ROUTE_ENABLED', raising=False)
+    assert client.get('/profiler').status_code == 404
+    assert client.post('/profiler', json={'enabled': True}).status_code == 404
+    assert not metrics.profiler.running
+
+
+@pytest.fixture
+def profiler_route(monkeypatch):
+    monkeypatch.setenv('PROFILER_ROUTE_ENABLED', '1')
+    monkeypatch.setattr(metrics, 'profiler', SamplingProfiler())
+    yield metrics.profiler
+    metrics.profiler.stop()
+
+
+def test_profiler_route_controls_the_profiler(client, profiler_route):
+    status = client.post('/profiler', json={'enabled': True, 'interval_ms': 2}).get_json()
+    assert status['running'] and status['interval_s'] == 0.002
+    time.sleep(0.02)
+    assert client.get('/profiler?format=json').get_json()['samples'] > 0
+    assert client.get('/profiler?limit=3').mimetype == 'text/plain'
+    assert not client.post('/profiler', json={'enabled': False}).get_json()['running']
+    assert client.post('/profiler', json={'reset': True}).get_json()['samples'] == 0
+
+
+@pytest.mark.parametrize('body', [{'interval_ms': 0}, {'interval_ms': 0.5}, {'interval_ms': 'nan'},
+                                  {'interval_ms': 'fast'}])
+def test_profiler_route_rejects_bad_intervals(client, profiler_route, body):
+    response = client.post('/profiler', json={'enabled': True, **body})
+    assert response.status_code == 400
+    assert not profiler_route.running
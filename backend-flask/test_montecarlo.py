@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from models.montecarlo import run_monte_carlo
+
+
+def test_monte_carlo_same_seed_same_result():
+    assert run_monte_carlo(20_000, seed=7) == run_monte_carlo(20_000, seed=7)
+    assert run_monte_carlo(20_000, seed=7) != run_monte_carlo(20_000, seed=8)
+
+
+def test_monte_carlo_pool_gives_identical_results():
+    inline = run_monte_carlo(50_000, seed=3, batch_size=10_000)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        pooled = run_monte_carlo(50_000, seed=3, batch_size=10_000, pool=pool)
+    assert pooled == inline
+
+
+def test_monte_carlo_rejects_non_physical_draws():
+    result = run_monte_carlo(10_000, seed=0, params={'diameter_m': {'dist': 'normal', 'mean': 50, 'std': 60}})
+    rejected = result['rejected_samples']
+    assert 0 < rejected < 10_000
+    assert result['damage_level_samples'] == 10_000 - rejected
+    assert result['shore_wave_height_m']['non_finite'] == rejected
+    assert sum(result['damage_level_probability'].values()) == pytest.approx(1.0)
+    # about a fifth of the draws are negative; they must not show up as catastrophic
+    assert result['damage_level_probability']['catastrophic'] < 0.2
+
+
+def test_montecarlo_route_is_reproducible(client):
+    body = {'n_samples': 20_000, 'seed': 11, 'params': {'beta': {'dist': 'lognormal', 'median': 2, 'sigma': 0.3}}}
+    first = client.post('/montecarlo', json=body)
+    assert first.status_code == 200
+    assert first.get_json() == client.post('/montecarlo', json=body).get_json()
+    assert first.get_json() == run_monte_carlo(20_000, seed=11, params=body['params'])
+    # "workers" is accepted but no longer sizes anything per request
+    assert client.post('/montecarlo', json={**body, 'workers': 64}).get_json() == first.get_json()
+
+
+def test_montecarlo_route_samples_the_neo_diameter(client):
+    block = {'estimated_diameter_min': 0.1, 'estimated_diameter_max': 0.2}
+    body = client.post('/montecarlo', json={'n_samples': 5_000, 'estimated_diameter_km': block}).get_json()
+    params = {'diameter_m': {'dist': 'uniform', 'low': 100.0, 'high': 200.0}}
+    assert body == run_monte_carlo(5_000, params=params)
+
+
+@pytest.mark.parametrize('body', [
+    {'n_samples': 0},
+    {'n_samples': 10 ** 9},
+    {'params': {'diameter_m': {'dist': 'cauchy'}}},
+    {'params': {'mass_kg': 1.0}},
+])
+def test_montecarlo_route_rejects_bad_requests(client, body):
+    response = client.post('/montecarlo', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
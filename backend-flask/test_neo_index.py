@@ -0,0 +1,80 @@
+from datetime import date
+
+import pytest
+
+from bench import stubs
+from models.deflection import estimate_deflection
+from models.impact import parse_feed
+from models.neo_index import NEOIndex
+
+TODAY = date(2024, 1, 1)
+
+
+@pytest.fixture(scope='module')
+def neos():
+    return parse_feed(stubs.feed('2024-01-01', '2024-01-07'))
+
+
+@pytest.fixture(scope='module')
+def index(neos):
+    return NEOIndex(neos, today=TODAY)
+
+
+def test_derived_fields_match_the_scalar_model(neos, index):
+    for k, neo in enumerate(neos):
+        lead = max((date.fromisoformat(neo['close_approach_date'][:10]) - TODAY).days, 1)
+        scalar = estimate_deflection(float(neo['estimated_diameter_km']['estimated_diameter_max']) * 1000.0,
+                                     float(neo['relative_velocity_kps']) * 1000.0, lead)
+        derived = index.records[k]['derived']
+        assert derived['lead_time_days'] == lead
+        assert derived['launches_required'] == scalar['launches_required']
+        assert derived['estimated_cost_usd'] == scalar['estimated_cost_usd']
+
+
+@pytest.mark.parametrize('sort,column', [('energy', 'energy_megatons'), ('miss_distance', 'miss_distance_km'),
+                                         ('diameter', 'diameter_m'), ('date', 'approach_day')])
+def test_sorted_pages_match_a_full_sort(index, sort, column):
+    values = getattr(index, column)
+    position = {record['id']: k for k, record in enumerate(index.records)}
+    descending = sort in ('energy', 'diameter')
+    expected = sorted(values.tolist(), reverse=descending)[:20]
+    pages = index.query(sort=sort, limit=10)['items'] + index.query(sort=sort, limit=10, offset=10)['items']
+    assert [values[position[item['id']]] for item in pages] == expected
+    ascending = index.query(sort=sort, order='asc', limit=5)['items']
+    assert [values[position[item['id']]] for item in ascending] == sorted(values.tolist())[:5]
+
+
+def test_range_filters_and_dates(neos, index):
+    page = index.query(min_diameter_m=500, max_velocity_kps=12, approach_from='2024-01-03',
+                       approach_to='2024-01-04', limit=1000)
+    expected = {
+        neo['id'] for neo in neos
+        if float(neo['estimated_diameter_km']['estimated_diameter_max']) * 1000.0 >= 500
+        and float(neo['relative_velocity_kps']) <= 12
+        and '2024-01-03' <= neo['close_approach_date'][:10] <= '2024-01-04'
+    }
+    assert page['total'] == len(expected)
+    assert {item['id'] for item in page['items']} == expected
+
+
+def test_bad_queries_raise(index):
+    with pytest.raises(ValueError):
+        index.query(sort='mass')
+    with pytest.raises(ValueError):
+        index.query(min_mass=1)
+    assert index.query(limit=10 ** 6)['limit'] == 1000
+
+
+def test_neo_route_serves_index_pages(client, stub_neo, stub_server):
+    url = '/neo?start_date=2024-05-01&end_date=2024-05-07&sort=energy&limit=5'
+    page = client.get(url).get_json()
+    assert page['total'] == 7 * stubs.NEOS_PER_DAY
+    assert len(page['items']) == 5
+    energies = [item['derived']['energy_megatons'] for item in page['items']]
+    assert energies == sorted(energies, reverse=True)
+    with stub_server.lock:
+        calls = stub_server.calls['nasa']
+    assert client.get(url + '&offset=5').get_json()['offset'] == 5
+    with stub_server.lock:
+        assert stub_server.calls['nasa'] == calls
+    assert client.get('/neo?start_date=2024-05-01&end_date=2024-05-07&sort=mass').status_code == 400
@@ -0,0 +1,106 @@
+import json
+from datetime import date
+
+import numpy as np
+import pytest
+
+from models.orbit import AU, MU_SUN, elements_to_state, encounter_states, propagate, solve_kepler
+
+ELEMENTS = {'a_au': 1.3, 'e': 0.2, 'i_deg': 5.0, 'raan_deg': 40.0, 'argp_deg': 80.0, 'M_deg': 10.0,
+            'epoch_jd': 2460600.5}
+
+
+def test_kepler_solution_satisfies_the_equation():
+    M = np.linspace(-10, 10, 201)
+    for e in (0.0, 0.3, 0.8, 0.97):
+        E = solve_kepler(M, e)
+        np.testing.assert_allclose(E - e * np.sin(E), np.mod(M, 2 * np.pi), atol=1e-12)
+
+
+def test_propagation_matches_mean_anomaly_advance():
+    a, e = 1.3 * AU, 0.2
+    angles = np.radians([5.0, 40.0, 80.0])
+    r0, v0 = elements_to_state(a, e, *angles, 0.3)
+    n = np.sqrt(MU_SUN / a ** 3)
+    for dt in (86400.0, 30 * 86400.0, 400 * 86400.0, -200 * 86400.0):
+        r, v = propagate(r0, v0, dt)
+        r_ref, v_ref = elements_to_state(a, e, *angles, 0.3 + n * dt)
+        np.testing.assert_allclose(r, r_ref, rtol=1e-9, atol=1.0)
+        np.testing.assert_allclose(v, v_ref, rtol=1e-9, atol=1e-6)
+
+
+def test_propagation_round_trip_and_determinism():
+    r0, v0 = encounter_states(ELEMENTS)
+    dt = np.array([10.0, 3650.0]) * 86400.0
+    r1, v1 = propagate(r0, v0, dt)
+    r2, v2 = propagate(r1, v1, -dt)
+    np.testing.assert_allclose(r2, np.broadcast_to(r0, r2.shape), rtol=1e-9)
+    np.testing.assert_allclose(v2, np.broadcast_to(v0, v2.shape), rtol=1e-9)
+    again = propagate(r0, v0, dt)
+    np.testing.assert_array_equal(again[0], r1)
+    np.testing.assert_array_equal(again[1], v1)
+
+
+def test_vectorized_propagation_matches_one_at_a_time():
+    r0, v0 = encounter_states([ELEMENTS, {**ELEMENTS, 'e': 0.6, 'M_deg': 200.0}])
+    dt = np.array([5.0, 500.0]) * 86400.0
+    r, v = propagate(r0, v0, dt)
+    for k in range(2):
+        rk, vk = propagate(r0[k], v0[k], dt[k])
+        np.testing.assert_allclose(r[k], rk, rtol=1e-12)
+        np.testing.assert_allclose(v[k], vk, rtol=1e-12)
+
+
+def strict_json(response):
+    """Parse a response body, failing on the non-standard NaN/Infinity tokens."""
+    def reject(token):
+        raise AssertionError(f'{token} in JSON output')
+
+    return json.loads(response.get_data(as_text=True), parse_constant=reject)
+
+
+def test_deflect_orbit_route(client):
+    body = {'elements': [ELEMENTS, {**ELEMENTS, 'a_au': 2.1, 'e': 0.5}], 'lead_time_days': 3650,
+            'delta_v_m_s': [0.0, 0.01], 'diameter_m': 150.0}
+    response = client.post('/deflect_orbit', json=body)
+    assert response.status_code == 200
+    result = strict_json(response)
+    assert result['count'] == 2
+    assert np.shape(result['miss_shift_m']) == (2, 2)
+    assert result['miss_shift_m'][0][0] == 0.0
+    assert result['miss_shift_m'][0][1] > 0
+    assert all(dv > 0 for dv in result['required_delta_v_m_s'])
+    assert len(result['mission']['launches_required']) == 2
+
+
+@pytest.mark.parametrize('direction', [[0, 0, 0], [1, 0], [[1, 0, 0]], 'along', [1, 0, 1e400]])
+def test_deflect_orbit_route_rejects_bad_directions(client, direction):
+    response = client.post('/deflect_orbit', json={'elements': ELEMENTS, 'direction': direction})
+    assert response.status_code == 400
+    assert 'direction' in response.get_json()['error']
+
+
+def test_deflect_orbit_route_rejects_co_orbital_encounters(client):
+    earth_like = {'a_au': 1.0, 'e': 0.0, 'i_deg': 0.0, 'M_deg': 0.0, 'epoch_jd': 2460600.5}
+    response = client.post('/deflect_orbit', json={'elements': [ELEMENTS, earth_like]})
+    assert response.status_code == 400
+    assert 'element set(s) [1]' in response.get_json()['error']
+
+
+def test_deflect_orbit_route_writes_null_for_non_finite_values(client, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, 'deflection_sensitivity', lambda r, v, lead, direction: np.zeros(len(r)))
+    response = client.post('/deflect_orbit', json={'elements': ELEMENTS, 'diameter_m': 100.0})
+    assert response.status_code == 200
+    result = strict_json(response)
+    assert result['required_delta_v_m_s'] == [None]
+    assert result['mission']['launches_required'] == [None]
+
+
+def test_deflect_orbit_route_looks_up_neo_ids(client, stub_neo):
+    neo_id = f'{date(2024, 1, 1).toordinal()}03'
+    result = strict_json(client.post('/deflect_orbit', json={'neo_id': neo_id}))
+    assert result['count'] == 1
+    assert result['encounter_jd'] is not None
+    assert client.post('/deflect_orbit', json={'neo_id': '../feed'}).status_code == 400
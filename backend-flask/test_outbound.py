@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from models import outbound
+from models.outbound import CircuitBreaker, CircuitOpenError, RateLimitedError, TokenBucket
+
+
+class Clock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f'HTTP {status_code}')
+        self.response = type('Response', (), {'status_code': status_code})()
+
+
+@pytest.fixture(autouse=True)
+def fresh_policies(monkeypatch):
+    monkeypatch.setenv('OUTBOUND_LIMITS', '{"limited.test": [10, 2]}')
+    outbound.reset()
+    yield
+    outbound.reset()
+
+
+def test_token_bucket_queues_past_the_burst():
+    clock = Clock()
+    bucket = TokenBucket(rate=10.0, burst=2, clock=clock)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.1)
+    assert bucket.reserve() == pytest.approx(0.2)
+    with pytest.raises(RateLimitedError):
+        bucket.reserve(max_wait=0.25)
+    clock.now += 1.0
+    assert bucket.reserve(max_wait=0.0) == 0.0
+
+
+def test_circuit_breaker_opens_and_half_opens():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30.0, clock=clock)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+    clock.now += 30.0
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+    assert not breaker.allow()  # one trial call at a time
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    clock.now += 30.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+
+def test_concurrent_identical_calls_are_coalesced():
+    calls = []
+    barrier = threading.Barrier(5)
+    results = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return {'ok': True}
+
+    def worker():
+        barrier.wait()
+        results.append(outbound.call('http://unlimited.test/x', 'same', fetch))
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [{'ok': True}] * 5
+    assert outbound.stats()['unlimited.test']['coalesced'] == 4
+
+
+def test_rate_limited_callers_fail_fast_past_their_deadline():
+    for _ in range(2):
+        outbound.call('http://limited.test/', object(), lambda: 1, max_wait=0.0)
+    with pytest.raises(RateLimitedError):
+        outbound.call('http://limited.test/', object(), lambda: 1, max_wait=0.01)
+    assert outbound.stats()['limited.test']['rate_limited'] == 1
+
+
+def test_server_errors_open_the_circuit_but_client_errors_do_not():
+    outbound.policy_for('http://flaky.test/').breaker.failure_threshold = 2
+
+    def fail(status):
+        def fn():
+            raise HTTPError(status)
+        return fn
+
+    for _ in range(3):
+        with pytest.raises(HTTPError):
+            outbound.call('http://flaky.test/', object(), fail(404))
+    assert outbound.stats()['flaky.test']['circuit'] == 'closed'
+    for _ in range(2):
+        with pytest.raises(HTTPError):
+            outbound.call('http://flaky.test/', object(), fail(503))
+    with pytest.raises(CircuitOpenError):
+        outbound.call('http://flaky.test/', object(), lambda: 1)
+    stats = outbound.stats()['flaky.test']
+    assert stats['circuit'] == 'open' and stats['failures'] == 2 and stats['circuit_open'] == 1
+
+
+def test_async_calls_share_the_policy():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'body'
+
+    async def main():
+        return await asyncio.gather(*(outbound.acall('http://unlimited.test/a', 'k', fetch) for _ in range(4)))
+
+    assert asyncio.run(main()) == ['body'] * 4
+    assert len(calls) == 1
+    assert outbound.stats()['unlimited.test']['coalesced'] == 3
+
+
+def test_outbound_route_reports_policies(client):
+    outbound.call('http://limited.test/', 'k', lambda: 1)
+    stats = client.get('/outbound').get_json()
+    assert stats['limited.test']['calls'] == 1
+    assert stats['limited.test']['rate_per_s'] == 10.0
+    assert stats['limited.test']['circuit'] == 'closed'
+    assert 'backend_outbound_circuit_open{host="limited.test"} 0' in client.get('/metrics').get_data(as_text=True)
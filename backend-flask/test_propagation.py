@@ -0,0 +1,105 @@
+import base64
+import math
+
+import numpy as np
+import pytest
+
+from models.propagation import SWE_MAX_STEPS, swe_field, tsunami_field
+from models.raster import build_raster
+from models.tsunami import G, estimate_tsunami_from_impact
+
+
+def test_flat_ocean_ray_field():
+    field = tsunami_field(0.0, 0.0, 100.0, half_width_km=300.0, rows=61, cols=61, depth_m=4000.0)
+    arrival, amplitude = field['arrival_time_s'], field['max_amplitude_m']
+    assert field['source']['initial_wave_height_m'] == estimate_tsunami_from_impact(100.0, 4000.0)['initial_wave_height_m']
+    # straight rays over constant depth: t = r / sqrt(g d)
+    dy = field['cell_size_m']['dy']
+    assert arrival[30, 60] == pytest.approx(30 * dy / math.sqrt(G * 4000.0), rel=1e-3)
+    np.testing.assert_allclose(arrival, arrival[::-1, ::-1], rtol=1e-5)
+    row = amplitude[30, 30:]
+    assert np.all(np.diff(row[3:]) < 0)
+    assert np.isfinite(arrival).all()
+
+
+def test_land_shadows_rays(tmp_path):
+    # 1 degree cells; a land strip east of the source at 0N 0E
+    grid = np.full((21, 21), -3000.0, dtype=np.float32)
+    grid[5:16, 12:15] = 100.0
+    raster = build_raster(grid, -10.0, 10.0, -10.0, 10.0, str(tmp_path))
+    field = tsunami_field(0.0, 0.0, 100.0, half_width_km=900.0, rows=81, cols=81, raster=raster)
+    arrival = field['arrival_time_s']
+    assert np.isfinite(arrival[40, 20])  # open water to the west
+    assert np.isnan(arrival[40, 80])  # behind the strip
+    with pytest.raises(ValueError):
+        tsunami_field(0.0, 3.0, 100.0, half_width_km=100.0, rows=11, cols=11, raster=raster)
+
+
+def test_swe_arrival_agrees_with_rays():
+    kwargs = dict(half_width_km=200.0, rows=41, cols=41, depth_m=4000.0)
+    ray = tsunami_field(10.0, 10.0, 1000.0, method='ray', **kwargs)
+    swe = tsunami_field(10.0, 10.0, 1000.0, method='swe', **kwargs)
+    assert swe['arrival_time_s'][20, 38] == pytest.approx(ray['arrival_time_s'][20, 38], rel=0.25)
+    assert np.nanmax(swe['max_amplitude_m']) <= swe['source']['initial_wave_height_m'] * 1.01
+
+
+def test_swe_step_cap():
+    elevation = np.full((50, 50), -4000.0)
+    with pytest.raises(ValueError, match='time steps'):
+        swe_field(elevation, 10.0, 10.0, 25, 25, 1.0, 100.0, duration_s=1e6)
+    # a shallow source in a deep box needs many small steps
+    elevation[20:30, 20:30] = -1.0
+    with pytest.raises(ValueError, match=f'max {SWE_MAX_STEPS}'):
+        swe_field(elevation, 1000.0, 1000.0, 25, 25, 1.0, 3000.0, duration_s=1.5 * 25000.0 / math.sqrt(G))
+
+
+@pytest.fixture
+def shallow_source_raster(tmp_path, monkeypatch):
+    from models import tsunami
+
+    grid = np.full((61, 61), -8000.0, dtype=np.float32)
+    grid[28:33, 28:33] = -1.0
+    monkeypatch.setattr(tsunami, '_raster', build_raster(grid, -30.0, 30.0, -30.0, 30.0, str(tmp_path)))
+
+
+def test_field_route_rejects_swe_runs_past_the_step_cap(client, shallow_source_raster):
+    body = {'lat': 0.0, 'lon': 0.0, 'energy_megatons': 10.0, 'method': 'swe', 'rows': 41, 'cols': 41,
+            'half_width_km': 2000.0}
+    response = client.post('/tsunami/field', json=body)
+    assert response.status_code == 400
+    assert 'time steps' in response.get_json()['error']
+
+
+@pytest.fixture
+def no_raster(monkeypatch):
+    from models import tsunami
+
+    monkeypatch.delenv('BATHYMETRY_RASTER_DIR', raising=False)
+    monkeypatch.setattr(tsunami, '_raster', None)
+
+
+def test_field_route_encodings(client, no_raster):
+    body = {'lat': 0.0, 'lon': 0.0, 'energy_megatons': 100.0, 'half_width_km': 300.0, 'rows': 21, 'cols': 31}
+    field = client.post('/tsunami/field', json=body).get_json()
+    assert field['shape'] == [21, 31] and field['encoding'] == 'base64-float32-le'
+    arrival = np.frombuffer(base64.b64decode(field['arrival_time_s']), dtype='<f4').reshape(21, 31)
+    direct = tsunami_field(0.0, 0.0, 100.0, half_width_km=300.0, rows=21, cols=31)
+    np.testing.assert_array_equal(arrival, direct['arrival_time_s'])
+
+    listed = client.post('/tsunami/field', json={**body, 'encoding': 'list'}).get_json()
+    assert np.allclose(np.array(listed['arrival_time_s'], dtype=float), arrival)
+
+
+@pytest.mark.parametrize('body', [
+    {'half_width_km': 0},
+    {'half_width_km': 'nan'},
+    {'half_width_km': 1e6},
+    {'rows': 5000},
+    {'method': 'fem'},
+    {'encoding': 'hex'},
+    {'rows': 2},
+])
+def test_field_route_rejects_bad_requests(client, no_raster, body):
+    response = client.post('/tsunami/field', json={'lat': 0.0, 'lon': 0.0, 'energy_megatons': 10.0, **body})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from models.raster import ElevationRaster, build_raster, build_synthetic_raster, synthetic_elevation
+
+
+@pytest.fixture(scope='module')
+def raster(tmp_path_factory):
+    return build_synthetic_raster(str(tmp_path_factory.mktemp('raster')))
+
+
+def node(lat, lon):
+    return float(np.float32(synthetic_elevation(np.array([lat]), np.array([lon]))[0]))
+
+
+def test_nodes_return_the_stored_values(raster):
+    for lat, lon in [(0, 0), (40, -74), (-33, 151), (89, 179), (-90, -180)]:
+        assert raster.elevation(lat, lon) == pytest.approx(node(lat, lon), abs=1e-9)
+
+
+def test_bilinear_between_nodes(raster):
+    lat, lon = 12.25, -30.75
+    z00, z01 = node(12, -31), node(12, -30)
+    z10, z11 = node(13, -31), node(13, -30)
+    fy, fx = 0.25, 0.25
+    expected = z00 * (1 - fx) * (1 - fy) + z01 * fx * (1 - fy) + z10 * (1 - fx) * fy + z11 * fx * fy
+    assert raster.elevation(lat, lon) == pytest.approx(expected, rel=1e-12)
+
+
+def test_interpolation_across_tile_boundaries(raster):
+    # 64-cell tiles: longitude -116 is the edge between the first and second tile column
+    for lon in (-116.5, -116.0, -115.5):
+        expected = 0.5 * (node(10, np.floor(lon)) + node(10, np.floor(lon) + 1)) if lon % 1 else node(10, lon)
+        assert raster.elevation(10.0, lon) == pytest.approx(expected, rel=1e-12)
+
+
+def test_sample_matches_point_lookups(raster):
+    rng = np.random.default_rng(0)
+    lats = rng.uniform(-90, 90, 500)
+    lons = rng.uniform(-180, 180, 500)
+    expected = [raster.elevation(lat, lon) for lat, lon in zip(lats, lons)]
+    np.testing.assert_allclose(raster.sample(lats, lons), expected, rtol=1e-12)
+
+
+def test_global_raster_wraps_longitude(raster):
+    assert raster.elevation(20.0, 190.0) == pytest.approx(raster.elevation(20.0, -170.0), rel=1e-12)
+
+
+def test_outside_coverage_and_nodata(tmp_path):
+    grid = np.array([[-100.0, -200.0, -300.0],
+                     [-300.0, -400.0, -500.0],
+                     [-500.0, -600.0, -9999.0]], dtype=np.float32)
+    raster = build_raster(grid, 0.0, 2.0, 0.0, 2.0, str(tmp_path), nodata=-9999.0)
+    assert raster.elevation(0.5, 0.5) == pytest.approx(-250.0)
+    assert raster.elevation(1.5, 1.5) is None
+    assert raster.elevation(2.5, 0.5) is None
+    assert np.isnan(raster.sample([1.5, 2.5], [1.5, 0.5])).all()
+    assert ElevationRaster(str(tmp_path)).grid(0.0, 0.0, 0.0, 1.0, 1, 3).tolist() == [[-100.0, -150.0, -200.0]]
+
+
+@pytest.fixture
+def offline_raster(raster, monkeypatch):
+    from models import geocache, tsunami
+
+    monkeypatch.setenv('TSUNAMI_NETWORK_FALLBACK', '0')
+    monkeypatch.setattr(tsunami, '_raster', raster)
+    monkeypatch.setattr(geocache, '_water_cache', geocache.WaterCache())
+    return raster
+
+
+def test_tsunami_route_answers_from_the_raster(client, offline_raster):
+    lats, lons = np.meshgrid(np.arange(-60.0, 61.0, 10.0), np.arange(-170.0, 171.0, 20.0))
+    elevations = offline_raster.sample(lats.ravel(), lons.ravel())
+    ocean = np.argmin(elevations)
+    land = np.argmax(elevations)
+    assert elevations[ocean] < 0 < elevations[land]
+    for k, is_water in ((ocean, True), (land, False)):
+        body = client.post('/tsunami', json={'lat': lats.ravel()[k], 'lon': lons.ravel()[k],
+                                             'energy_megatons': 100.0}).get_json()
+        assert body['is_water'] is is_water
+        assert body['elevation_m'] == pytest.approx(elevations[k], rel=1e-12)
+        assert (body['tsunami'] is not None) is is_water
+
+
+def test_tsunami_route_outside_raster_coverage_is_unknown(client, tmp_path, monkeypatch):
+    from models import geocache, tsunami
+
+    grid = np.full((3, 3), -100.0, dtype=np.float32)
+    monkeypatch.setenv('TSUNAMI_NETWORK_FALLBACK', '0')
+    monkeypatch.setattr(tsunami, '_raster', build_raster(grid, 0.0, 2.0, 0.0, 2.0, str(tmp_path)))
+    monkeypatch.setattr(geocache, '_water_cache', geocache.WaterCache())
+    body = client.post('/tsunami', json={'lat': 1.0, 'lon': 1.0, 'energy_megatons': 10.0}).get_json()
+    assert body['is_water'] is True and body['elevation_m'] == -100.0
+    body = client.post('/tsunami', json={'lat': 10.0, 'lon': 10.0, 'energy_megatons': 10.0}).get_json()
+    assert body['is_water'] is None and body['tsunami'] is None
+    assert client.post('/tsunami', json={'lat': 'north'}).status_code == 400
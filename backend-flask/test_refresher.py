@@ -0,0 +1,91 @@
+import json
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from models import providers
+from models.refresher import FeedRefresher
+
+
+def nasa_calls(stub_server):
+    with stub_server.lock:
+        return stub_server.calls['nasa']
+
+
+def test_refresh_publishes_the_default_windows(stub_neo):
+    refresher = FeedRefresher(stub_neo, days_ahead=1)
+    snapshots = refresher.refresh()
+    today = date.today()
+    assert list(snapshots) == [stub_neo.resolve_range(today.isoformat()),
+                               stub_neo.resolve_range((today + timedelta(days=1)).isoformat())]
+    snapshot = refresher.get()
+    assert snapshot is snapshots[stub_neo.resolve_range()]
+    assert json.loads(snapshot.body) == snapshot.neos == stub_neo.get_neos()
+    assert len(snapshot.index.records) == len(snapshot.neos)
+    assert refresher.get('2001-01-01', '2001-01-02') is None
+    status = refresher.status()
+    assert status['refreshes'] == 1 and [w['count'] for w in status['windows']] == [len(s.neos) for s in snapshots.values()]
+
+
+def test_old_snapshots_are_not_served(stub_neo):
+    refresher = FeedRefresher(stub_neo, days_ahead=0, max_age_s=0.0)
+    refresher.refresh()
+    time.sleep(0.01)
+    assert refresher.get() is None
+
+
+def test_a_failed_refresh_keeps_the_previous_snapshots(stub_neo, monkeypatch):
+    refresher = FeedRefresher(stub_neo, days_ahead=0)
+    refresher.refresh()
+    previous = refresher.get()
+    monkeypatch.setattr(stub_neo, 'get_neos', lambda *args: None)
+    with pytest.raises(RuntimeError, match='unavailable'):
+        refresher.refresh()
+    assert refresher.get() is previous
+
+
+def test_background_thread_refreshes_and_retries(stub_neo, monkeypatch):
+    refresher = FeedRefresher(stub_neo, interval_s=0.05, retry_s=0.01, days_ahead=0)
+    get_neos = stub_neo.get_neos
+    calls = []
+
+    def fail_once(*args):
+        calls.append(args)
+        return None if len(calls) == 1 else get_neos(*args)
+
+    monkeypatch.setattr(stub_neo, 'get_neos', fail_once)
+    refresher.start()
+    try:
+        deadline = time.time() + 5.0
+        while refresher.refreshes < 2 and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        refresher.stop()
+    assert refresher.failures == 1 and refresher.refreshes >= 2
+    assert refresher.last_error is None and not refresher.running
+    assert refresher.get() is not None
+
+
+def test_neo_route_serves_the_snapshot(client, stub_neo, stub_server):
+    client.post('/neo/snapshot')
+    calls = nasa_calls(stub_server)
+    response = client.get('/neo')
+    assert 'X-Snapshot-Age' in response.headers
+    assert response.get_json() == providers.feed_refresher().get().neos
+    page = client.get('/neo?sort=energy&limit=5')
+    assert 'X-Snapshot-Age' in page.headers and len(page.get_json()['items']) == 5
+    assert nasa_calls(stub_server) == calls
+    # ranges outside the refreshed windows go to the feed client as before
+    assert 'X-Snapshot-Age' not in client.get('/neo?start_date=2001-01-01&end_date=2001-01-03').headers
+
+
+def test_snapshot_route(client, stub_neo, monkeypatch):
+    status = client.get('/neo/snapshot').get_json()
+    assert status['refreshes'] == 0 and status['windows'] == [] and not status['running']
+    status = client.post('/neo/snapshot').get_json()
+    assert status['refreshes'] == 1 and status['windows'][0]['count'] > 0
+    monkeypatch.setattr(stub_neo, 'get_neos', lambda *args: None)
+    response = client.post('/neo/snapshot')
+    assert response.status_code == 502 and 'unavailable' in response.get_json()['error']
+    assert len(client.get('/neo/snapshot').get_json()['windows']) == len(status['windows'])
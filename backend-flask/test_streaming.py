@@ -0,0 +1,101 @@
+import gzip
+import json
+import zlib
+
+import numpy as np
+import pytest
+
+from bench import stubs
+from models.streaming import (
+    NDJSON_MIMETYPE,
+    NDJSONEncoder,
+    gzip_chunks,
+    ndjson_chunks,
+    ndjson_column_chunks,
+    wants_gzip,
+    wants_ndjson,
+)
+
+
+def lines(data):
+    return [json.loads(line) for line in data.decode('utf-8').splitlines()]
+
+
+def test_content_negotiation():
+    assert wants_ndjson(NDJSON_MIMETYPE + ', application/json', {})
+    assert wants_ndjson(None, {'format': 'ndjson'})
+    assert not wants_ndjson('application/json', {})
+    assert wants_gzip('gzip, deflate', {})
+    assert not wants_gzip('gzip', {'gzip': '0'})
+    assert not wants_gzip(None, {})
+
+
+def test_records_are_grouped_into_chunks():
+    records = [{'id': k, 'name': 'x' * 50} for k in range(100)]
+    chunks = list(ndjson_chunks(records, chunk_bytes=1000))
+    assert len(chunks) > 1
+    assert all(chunk.endswith(b'\n') for chunk in chunks)
+    assert lines(b''.join(chunks)) == records
+
+
+def test_a_failing_producer_ends_with_an_error_line():
+    def records():
+        yield {'id': 1}
+        raise ValueError('feed went away')
+
+    assert lines(b''.join(ndjson_chunks(records()))) == [{'id': 1}, {'error': 'feed went away'}]
+
+
+def test_column_chunks_match_row_records():
+    a = np.array([1.5, 2.0, 1e300])
+    b = np.array([3, 4, 5])
+    rows = lines(b''.join(ndjson_column_chunks([(10, {'a': a, 'b': b}), (13, {'a': a[:1], 'b': b[:1]})])))
+    expected = [{'index': 10 + k, 'a': float(a[k]), 'b': float(b[k])} for k in range(3)]
+    assert rows == expected + [{'index': 13, 'a': 1.5, 'b': 3.0}]
+
+
+def test_column_chunks_write_non_finite_values_as_null():
+    data = b''.join(ndjson_column_chunks([(0, {'v': np.array([1.0, np.inf, np.nan, -np.inf])})], index_name='i'))
+    assert lines(data) == [{'i': 0, 'v': 1.0}, {'i': 1, 'v': None}, {'i': 2, 'v': None}, {'i': 3, 'v': None}]
+
+
+def test_gzip_is_flushed_per_chunk():
+    chunks = [b'{"a":1}\n', b'{"a":2}\n']
+    compressed = list(gzip_chunks(iter(chunks)))
+    assert gzip.decompress(b''.join(compressed)) == b''.join(chunks)
+    # the first chunk decodes on its own, before the stream has ended
+    assert zlib.decompressobj(31).decompress(compressed[0]) == chunks[0]
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_incremental_encoder_matches_the_generators(compress):
+    records = [{'id': k} for k in range(50)]
+    encoder = NDJSONEncoder(gzip=compress, chunk_bytes=100)
+    data = b''.join(encoder.add(record) for record in records) + encoder.close()
+    if compress:
+        data = gzip.decompress(data)
+    assert data == b''.join(ndjson_chunks(records))
+
+
+def test_neo_route_streams_ndjson(client, stub_neo):
+    url = '/neo?start_date=2024-08-01&end_date=2024-08-10'
+    response = client.get(url, headers={'Accept': NDJSON_MIMETYPE})
+    assert response.mimetype == NDJSON_MIMETYPE
+    assert response.headers['Cache-Control'] == 'no-cache'
+    # records come out in window completion order
+    streamed = sorted(lines(response.get_data()), key=lambda neo: neo['id'])
+    assert len(streamed) == 10 * stubs.NEOS_PER_DAY
+    assert streamed == sorted(client.get(url).get_json(), key=lambda neo: neo['id'])
+
+    zipped = client.get(url + '&format=ndjson', headers={'Accept-Encoding': 'gzip'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert sorted(lines(gzip.decompress(zipped.get_data())), key=lambda neo: neo['id']) == streamed
+
+
+def test_neo_route_streams_index_pages(client, stub_neo):
+    url = '/neo?start_date=2024-08-01&end_date=2024-08-03&sort=energy&limit=7&format=ndjson'
+    response = client.get(url)
+    page = client.get(url.replace('&format=ndjson', '')).get_json()
+    assert response.headers['X-Total-Count'] == str(page['total'])
+    assert lines(response.get_data()) == page['items']
+    assert client.get('/neo?format=ndjson&start_date=2024-08-03&end_date=2024-08-01').status_code == 400
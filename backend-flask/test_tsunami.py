@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from models.tsunami import (
+    ARRAY_RTOL,
+    DAMAGE_LEVELS,
+    classify_damage,
+    estimate_tsunami_array,
+    estimate_tsunami_from_impact,
+    shore_wave_height,
+)
+
+NUMERIC_KEYS = ('initial_wave_height_m', 'shore_wave_height_m', 'wave_energy_megatons', 'inundation_m',
+                'coupled_energy_joules')
+
+
+def test_array_kernel_matches_scalar():
+    rng = np.random.default_rng(0)
+    energy = 10 ** rng.uniform(-3, 5, 2000)
+    depth = np.concatenate([[0.0, 0.5, 1.0, 50.0], rng.uniform(0, 8000, 1996)])
+    coupling = rng.uniform(0.01, 0.2, 2000)
+    arrays = estimate_tsunami_array(energy, depth, coupling)
+    for k in range(energy.size):
+        scalar = estimate_tsunami_from_impact(energy[k], depth[k], coupling[k])
+        for key in NUMERIC_KEYS:
+            assert arrays[key][k] == pytest.approx(scalar[key], rel=ARRAY_RTOL, abs=0), key
+        assert arrays['damage_level'][k] == scalar['damage_level']
+
+
+def test_grid_broadcast_matches_columns():
+    energy = np.array([0.1, 10.0, 1000.0, 1e5])
+    depth = np.array([10.0, 200.0, 4000.0])
+    grid = estimate_tsunami_array(energy[:, None], depth[None, :])
+    e, d = np.meshgrid(energy, depth, indexing='ij')
+    columns = estimate_tsunami_array(e.ravel(), d.ravel())
+    for key in NUMERIC_KEYS:
+        np.testing.assert_allclose(grid[key].ravel(), columns[key], rtol=ARRAY_RTOL)
+    np.testing.assert_array_equal(grid['damage_level'].ravel(), columns['damage_level'])
+
+
+def test_damage_thresholds():
+    thresholds = [threshold for _, threshold in DAMAGE_LEVELS]
+    heights = np.array([0.0, 0.19, 0.2, 0.99, 1.0, 3.0, 9.99, 10.0, 1e6])
+    names = [DAMAGE_LEVELS[i][0] for i in classify_damage(heights)]
+    assert names == ['negligible', 'negligible', 'minor', 'minor', 'moderate', 'severe', 'severe',
+                     'catastrophic', 'catastrophic']
+    assert thresholds == sorted(thresholds)
+
+
+def test_shore_wave_height_helper():
+    assert shore_wave_height(50.0, 4000.0) == pytest.approx(
+        estimate_tsunami_from_impact(50.0, 4000.0)['shore_wave_height_m'], rel=ARRAY_RTOL)
+
+
+def test_scalar_memo_returns_independent_dicts():
+    first = estimate_tsunami_from_impact(123.0, 456.0)
+    first['damage_level'] = 'edited'
+    assert estimate_tsunami_from_impact(123.0, 456.0)['damage_level'] != 'edited'
+
+
+def test_batch_route_columns_match_the_scalar_model(client):
+    energy, depth = [0.5, 20.0, 3000.0], [100.0, 4000.0, 0.0]
+    body = client.post('/tsunami/batch', json={'columns': {'energy_megatons': energy, 'water_depth_m': depth},
+                                               'coupling_efficiency': 0.08}).get_json()
+    assert body['count'] == 3
+    for k in range(3):
+        scalar = estimate_tsunami_from_impact(energy[k], depth[k], 0.08)
+        for key in NUMERIC_KEYS:
+            assert body['results'][key][k] == pytest.approx(scalar[key], rel=ARRAY_RTOL), key
+        assert body['results']['damage_level'][k] == scalar['damage_level']
+
+
+def test_batch_route_grid_layout(client):
+    energy, depth = [1.0, 100.0], [10.0, 500.0, 5000.0]
+    body = client.post('/tsunami/batch', json={'grid': {'energy_megatons': energy, 'water_depth_m': depth}}).get_json()
+    axes = {'energy_megatons': energy, 'water_depth_m': depth}
+    assert body['shape'] == [len(axes[name]) for name in body['axes']]
+    heights = np.array(body['results']['shore_wave_height_m']).reshape(body['shape'])
+    for index in np.ndindex(*body['shape']):
+        point = {name: axes[name][i] for name, i in zip(body['axes'], index)}
+        assert heights[index] == pytest.approx(shore_wave_height(**point), rel=ARRAY_RTOL)
+
+
+@pytest.mark.parametrize('body', [
+    {'columns': {'energy_megatons': [1.0]}},
+    {'columns': {'energy_megatons': [1.0, 2.0], 'water_depth_m': [1.0, 2.0, 3.0]}},
+    {'columns': {'energy_megatons': [-1.0], 'water_depth_m': [1.0]}},
+    {'columns': {'energy_megatons': [1.0], 'water_depth_m': [1.0]}, 'grid': {'energy_megatons': [1.0]}},
+    {'energy_megatons': 1.0, 'water_depth_m': 1.0, 'radius_km': 3},
+    {'grid': {'energy_megatons': list(range(3000)), 'water_depth_m': list(range(2000))}},
+])
+def test_batch_route_rejects_bad_requests(client, body):
+    response = client.post('/tsunami/batch', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_cache_route_reports_the_estimate_memo(client):
+    before = client.get('/tsunami/cache').get_json()['estimate_memo']
+    estimate_tsunami_from_impact(7.0, 777.0)
+    estimate_tsunami_from_impact(7.0, 777.0)
+    after = client.get('/tsunami/cache').get_json()['estimate_memo']
+    assert after['hits'] - before['hits'] >= 1 and after['size'] <= after['maxsize']
@@ -0,0 +1,110 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from models.water_index import WaterIndex
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'water_fixture.geojson')
+
+# Fixture Lake: centred on (42, -5), ~5 km radius, with a ~1 km island in the middle
+LAKE = (42.0, -5.03)
+ISLAND = (42.0, -5.0)
+EAST_OF_LAKE = (42.0, -4.9)
+OCEAN = (42.5, -9.0)
+RIVER = (42.2, -4.5)
+RESERVOIR = (44.0, -2.0)
+
+
+@pytest.fixture(scope='module')
+def index():
+    return WaterIndex.load(FIXTURE)
+
+
+def test_contains(index):
+    assert index.contains(*LAKE)
+    assert index.contains(*OCEAN)
+    assert index.contains(*RESERVOIR)
+    assert not index.contains(*EAST_OF_LAKE)
+    assert not index.contains(*RIVER)
+
+
+def test_island_is_a_hole(index):
+    assert not index.contains(*ISLAND)
+    assert not index.any_within(*ISLAND, 200)
+    # the island's shore is ~1 km from its centre
+    assert index.any_within(*ISLAND, 1500)
+    assert index.distance_m(*ISLAND, 1500) == pytest.approx(1000, rel=0.05)
+
+
+def test_any_within(index):
+    assert index.any_within(*LAKE, 1)
+    assert index.any_within(*RIVER, 50)
+    assert not index.any_within(*EAST_OF_LAKE, 200)
+    # the lake's east shore is at -4.939 degrees, ~3.2 km away
+    assert index.any_within(*EAST_OF_LAKE, 5000)
+    assert index.distance_m(*EAST_OF_LAKE, 200) is None
+
+
+def test_covers(index):
+    assert index.covers(*LAKE)
+    assert not index.covers(10.0, 10.0)
+
+
+@pytest.mark.parametrize('name', ['index.npz', 'index_dir'])
+def test_saved_index_answers_the_same(index, tmp_path, name):
+    path = str(tmp_path / name)
+    index.save(path)
+    loaded = WaterIndex.load(path)
+    rng = np.random.default_rng(0)
+    lon_min, lat_min, lon_max, lat_max = index.bounds
+    for lat, lon in zip(rng.uniform(lat_min, lat_max, 300), rng.uniform(lon_min, lon_max, 300)):
+        assert loaded.contains(lat, lon) == index.contains(lat, lon)
+        assert loaded.any_within(lat, lon, 500) == index.any_within(lat, lon, 500)
+
+
+def test_cell_size_does_not_change_answers(index):
+    with open(FIXTURE) as f:
+        data = json.load(f)
+    fine = WaterIndex.from_geojson(data, cell_deg=0.005)
+    rng = np.random.default_rng(1)
+    for lat, lon in zip(rng.uniform(41.9, 42.1, 300), rng.uniform(-5.1, -4.9, 300)):
+        assert fine.contains(lat, lon) == index.contains(lat, lon)
+        assert fine.any_within(lat, lon, 300) == index.any_within(lat, lon, 300)
+
+
+def test_long_edges_stay_cheap_to_bucket():
+    line = {'type': 'Feature', 'geometry': {'type': 'LineString', 'coordinates': [[-179.9, -80.0], [179.9, 80.0]]}}
+    index = WaterIndex.from_geojson({'type': 'FeatureCollection', 'features': [line]})
+    assert index.arrays()['edge_ids'].size < 50_000
+    assert index.any_within(0.0, 0.0, 1000)
+    assert not index.any_within(10.0, 0.0, 1000)
+
+
+@pytest.fixture
+def indexed_water(index, stub_server, monkeypatch):
+    from models import geocache, tsunami, water_index
+
+    # no elevation key: the classifier falls through to the OSM lookup, which the index answers
+    monkeypatch.setenv('TSUNAMI_NETWORK_FALLBACK', '1')
+    monkeypatch.delenv('GOOGLE_ELEVATION_API_KEY', raising=False)
+    monkeypatch.setattr(tsunami, '_raster', None)
+    monkeypatch.setattr(tsunami, 'NOMINATIM_REVERSE_URL', stub_server.env()['NOMINATIM_REVERSE_URL'])
+    monkeypatch.setattr(geocache, '_water_cache', geocache.WaterCache())
+    monkeypatch.setattr(water_index, '_index', index)
+    return stub_server
+
+
+def test_tsunami_route_uses_the_index_inside_its_coverage(client, indexed_water):
+    with indexed_water.lock:
+        before = indexed_water.calls['nominatim']
+    lake = client.post('/tsunami', json={'lat': LAKE[0], 'lon': LAKE[1], 'energy_megatons': 5.0}).get_json()
+    land = client.post('/tsunami', json={'lat': ISLAND[0], 'lon': ISLAND[1], 'energy_megatons': 5.0}).get_json()
+    assert lake['is_water'] is True and lake['tsunami'] is not None
+    assert land['is_water'] is False and land['tsunami'] is None
+    with indexed_water.lock:
+        assert indexed_water.calls['nominatim'] == before
+    client.post('/tsunami', json={'lat': 10.0, 'lon': 10.0, 'energy_megatons': 5.0})
+    with indexed_water.lock:
+        assert indexed_water.calls['nominatim'] == before + 1
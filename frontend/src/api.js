@@ -10,3 +10,99 @@ export async function fetchNEOs() {
     return [];
   }
 }
+
+// Server-side filtered/sorted page of NEOs, e.g. { sort: "energy", limit: 20, min_diameter_m: 100 }
+export async function queryNEOs(params = {}) {
+  try {
+    const query = new URLSearchParams(params).toString();
+    const res = await fetch(`${API_BASE}/neo?${query}`);
+    if (!res.ok) throw new Error("Failed to query NEOs");
+    return await res.json();
+  } catch (err) {
+    console.error(err);
+    return { total: 0, offset: 0, limit: 0, items: [] };
+  }
+}
+
+// Stream newline-delimited JSON records, calling onRecord(record) as each one arrives so the UI can
+// render before the whole response is in. Works with /neo and /deflect/batch (format=ndjson).
+// Resolves to the number of records received; response headers (e.g. X-Total-Count) are passed to
+// onHeaders if given.
+export async function streamNDJSON(path, { onRecord, onHeaders, ...init } = {}) {
+  const res = await fetch(`${API_BASE}${path}`, {
+    ...init,
+    headers: { Accept: "application/x-ndjson", ...(init.headers || {}) },
+  });
+  if (!res.ok) throw new Error(`Request failed: ${res.status}`);
+  if (onHeaders) onHeaders(res.headers);
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let count = 0;
+  const emit = (line) => {
+    if (!line.trim()) return;
+    const record = JSON.parse(line);
+    if (record.error) throw new Error(record.error);
+    count += 1;
+    onRecord(record);
+  };
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split("\n");
+    buffer = lines.pop();
+    lines.forEach(emit);
+  }
+  emit(buffer + decoder.decode());
+  return count;
+}
+
+// Stream NEOs for a date range, e.g. streamNEOs({ start_date, end_date }, (neo) => rows.push(neo))
+export function streamNEOs(params, onRecord) {
+  const query = new URLSearchParams(params).toString();
+  return streamNDJSON(`/neo?${query}`, { onRecord });
+}
+
+// Decode a base64 little-endian float32 raster from the backend into a Float32Array
+function decodeFloat32(b64) {
+  const bytes = Uint8Array.from(atob(b64), (c) => c.charCodeAt(0));
+  return new Float32Array(bytes.buffer);
+}
+
+// Regional tsunami propagation: arrival-time and max-amplitude rasters (row 0 = south, NaN on land)
+export async function fetchTsunamiField({ lat, lon, energyMegatons, halfWidthKm = 500, rows = 200, cols = 200, method = "ray" }) {
+  try {
+    const res = await fetch(`${API_BASE}/tsunami/field`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        lat,
+        lon,
+        energy_megatons: energyMegatons,
+        half_width_km: halfWidthKm,
+        rows,
+        cols,
+        method,
+      }),
+    });
+    if (!res.ok) throw new Error("Failed to fetch tsunami field");
+    const field = await res.json();
+    return {
+      ...field,
+      arrival_time_s: decodeFloat32(field.arrival_time_s),
+      max_amplitude_m: decodeFloat32(field.max_amplitude_m),
+    };
+  } catch (err) {
+    console.error(err);
+    return null;
+  }
+}
+
+// XYZ tile URL template for an impact effect overlay (layer: "overpressure" | "thermal" | "crater").
+// Tiles are rendered and cached by the backend, so panning and zooming never recompute a tile twice.
+export function impactFieldTileUrl({ lat, lon, energyMegatons, layer = "overpressure" }) {
+  const query = new URLSearchParams({ lat, lon, energy_megatons: energyMegatons, layer });
+  return `${API_BASE}/impact/field/{z}/{x}/{y}.png?${query}`;
+}
@@ -1,6 +1,7 @@
 import React, { useEffect } from 'react';
 import { MapContainer, TileLayer, Circle, useMap } from 'react-leaflet';
 import MapLegend from './MapLegend';
+import { impactFieldTileUrl } from '../api';
 import 'leaflet/dist/leaflet.css';
 
 // Helper component to update map view when props change
@@ -37,6 +38,17 @@ function ImpactMap({ impactLocation, impactResults, onMapClick, mapZoom }) {
       />
       {impactLocation && impactResults && (
         <>
+          {/* Blast overpressure field rendered as map tiles by the backend */}
+          {impactResults.energy_megatons > 0 && (
+            <TileLayer
+              url={impactFieldTileUrl({
+                lat: impactLocation[0],
+                lon: impactLocation[1],
+                energyMegatons: impactResults.energy_megatons,
+              })}
+              opacity={0.6}
+            />
+          )}
           {/* Red Circle: Evacuation Zone */}
           <Circle
             center={impactLocation}